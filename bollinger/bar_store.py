@@ -0,0 +1,204 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Stockage colonnaire des barres OHLCV (un .npy par colonne, ouvert en np.memmap).
+Usage:
+    python bar_store.py import EURUSD "PEPPERSTONE_EURUSD, 60.csv"
+    python bar_store.py import-dir exports/
+    python bar_store.py info
+"""
+
+import argparse
+import os
+import struct
+
+import numpy as np
+import pandas as pd
+
+from test_calculator import ALL_SYMBOLS
+
+STORE_ROOT = "bars"
+TIME_COLUMN = "time"                       # int64, secondes Unix UTC (ouverture de barre)
+PRICE_COLUMNS = ("open", "high", "low", "close", "volume")  # float64
+
+# En-tête .npy v1.0 de taille fixe : l'ajout de barres ne réécrit que la forme
+# dans l'en-tête, jamais les données existantes.
+_MAGIC = b"\x93NUMPY\x01\x00"
+_HEADER_SIZE = 128
+
+
+def _header(dtype: np.dtype, length: int) -> bytes:
+    text = "{'descr': '%s', 'fortran_order': False, 'shape': (%d,), }" % (dtype.str, length)
+    body_len = _HEADER_SIZE - len(_MAGIC) - 2
+    return _MAGIC + struct.pack("<H", body_len) + text.ljust(body_len - 1).encode("latin1") + b"\n"
+
+
+def _append_column(path: str, values: np.ndarray, dtype):
+    dtype = np.dtype(dtype)
+    values = np.ascontiguousarray(values, dtype=dtype)
+    if not os.path.exists(path):
+        with open(path, "wb") as f:
+            f.write(_header(dtype, 0))
+    with open(path, "r+b") as f:
+        f.seek(0, os.SEEK_END)
+        size = f.tell()
+        f.write(values.tobytes())
+        length = (size - _HEADER_SIZE) // dtype.itemsize + len(values)
+        f.seek(0)
+        f.write(_header(dtype, length))
+
+
+def _column_length(path: str) -> int:
+    if not os.path.exists(path):
+        return 0
+    with open(path, "rb") as f:
+        np.lib.format.read_magic(f)
+        shape, _, _ = np.lib.format.read_array_header_1_0(f)
+    return shape[0]
+
+
+def _truncate_column(path: str, length: int, dtype):
+    dtype = np.dtype(dtype)
+    with open(path, "r+b") as f:
+        f.truncate(_HEADER_SIZE + length * dtype.itemsize)
+        f.seek(0)
+        f.write(_header(dtype, length))
+
+
+def _column_paths(d: str) -> list:
+    return [(os.path.join(d, f"{col}.npy"), dtype)
+            for col, dtype in [(c, np.float64) for c in PRICE_COLUMNS] + [(TIME_COLUMN, np.int64)]]
+
+
+def repair_columns(d: str) -> int:
+    """Ramène toutes les colonnes à la longueur de la plus courte (ajout interrompu entre deux
+    fichiers). Sans cela, le prochain ajout décalerait définitivement OHLC par rapport à time."""
+    paths = [(path, dtype) for path, dtype in _column_paths(d) if os.path.exists(path)]
+    if not paths:
+        return 0
+    lengths = [_column_length(path) for path, _ in paths]
+    n = min(lengths) if len(paths) == len(_column_paths(d)) else 0
+    for (path, dtype), length in zip(paths, lengths):
+        if length != n:
+            _truncate_column(path, n, dtype)
+    return n
+
+
+def symbol_dir(symbol: str, root: str = STORE_ROOT) -> str:
+    return os.path.join(root, symbol)
+
+
+def read_csv_bars(path: str) -> pd.DataFrame:
+    """Export CSV TradingView -> DataFrame trié (time en secondes Unix ou ISO 8601)."""
+    df = pd.read_csv(path)
+    df.columns = [str(c).strip().lower() for c in df.columns]
+    if pd.api.types.is_numeric_dtype(df[TIME_COLUMN]):
+        df[TIME_COLUMN] = df[TIME_COLUMN].astype("int64")
+    else:
+        # as_unit("s") : pandas >= 3 ne stocke plus forcément en nanosecondes
+        df[TIME_COLUMN] = pd.to_datetime(df[TIME_COLUMN], utc=True).dt.as_unit("s").astype("int64")
+    if "volume" not in df.columns:
+        df["volume"] = np.nan
+    df = df.sort_values(TIME_COLUMN).drop_duplicates(TIME_COLUMN, keep="last")
+    return df[[TIME_COLUMN, *PRICE_COLUMNS]].reset_index(drop=True)
+
+
+def last_time(symbol: str, root: str = STORE_ROOT):
+    bars = open_symbol(symbol, root)
+    return int(bars[TIME_COLUMN][-1]) if len(bars[TIME_COLUMN]) else None
+
+
+def append_bars(symbol: str, df: pd.DataFrame, root: str = STORE_ROOT) -> int:
+    """Ajoute les barres plus récentes que la dernière stockée. Renvoie le nombre de barres ajoutées."""
+    d = symbol_dir(symbol, root)
+    os.makedirs(d, exist_ok=True)
+    repair_columns(d)
+    last = last_time(symbol, root)
+    if last is not None:
+        df = df[df[TIME_COLUMN] > last]
+    if df.empty:
+        return 0
+    for col in PRICE_COLUMNS:
+        values = df[col].to_numpy(dtype=np.float64) if col in df.columns else np.full(len(df), np.nan)
+        _append_column(os.path.join(d, f"{col}.npy"), values, np.float64)
+    # time en dernier : sa longueur fait foi pour les lecteurs concurrents
+    _append_column(os.path.join(d, f"{TIME_COLUMN}.npy"), df[TIME_COLUMN].to_numpy(dtype=np.int64), np.int64)
+    return len(df)
+
+
+def import_csv(symbol: str, csv_path: str, root: str = STORE_ROOT) -> int:
+    return append_bars(symbol, read_csv_bars(csv_path), root)
+
+
+def open_symbol(symbol: str, root: str = STORE_ROOT) -> dict:
+    """Colonnes du symbole en np.memmap lecture seule (aucune copie, aucun chargement)."""
+    d = symbol_dir(symbol, root)
+    n = _column_length(os.path.join(d, f"{TIME_COLUMN}.npy"))
+    out = {}
+    for col, dtype in [(TIME_COLUMN, np.int64)] + [(c, np.float64) for c in PRICE_COLUMNS]:
+        path = os.path.join(d, f"{col}.npy")
+        if n == 0:
+            out[col] = np.empty(0, dtype=dtype)
+        else:
+            out[col] = np.load(path, mmap_mode="r")[:n]
+    return out
+
+
+def open_symbols(symbols=None, root: str = STORE_ROOT) -> dict:
+    symbols = list_symbols(root) if symbols is None else symbols
+    return {s: open_symbol(s, root) for s in symbols}
+
+
+def list_symbols(root: str = STORE_ROOT) -> list:
+    if not os.path.isdir(root):
+        return []
+    return sorted(s for s in os.listdir(root) if os.path.exists(os.path.join(root, s, f"{TIME_COLUMN}.npy")))
+
+
+def _symbol_from_filename(name: str):
+    upper = name.upper()
+    for s in ALL_SYMBOLS:
+        if s in upper:
+            return s
+    return None
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Stockage colonnaire des barres OHLCV")
+    parser.add_argument('--root', default=STORE_ROOT, help=f'Répertoire du stockage (défaut: {STORE_ROOT})')
+    sub = parser.add_subparsers(dest='command', required=True)
+    p_import = sub.add_parser('import', help='Importer un export CSV pour un symbole')
+    p_import.add_argument('symbol')
+    p_import.add_argument('csv')
+    p_dir = sub.add_parser('import-dir', help='Importer tous les CSV d\'un dossier (symbole déduit du nom)')
+    p_dir.add_argument('directory')
+    sub.add_parser('info', help='Afficher le contenu du stockage')
+    args = parser.parse_args()
+
+    if args.command == 'import':
+        added = import_csv(args.symbol, args.csv, args.root)
+        print(f"✅ {args.symbol}: {added:,} barres ajoutées")
+    elif args.command == 'import-dir':
+        for name in sorted(os.listdir(args.directory)):
+            if not name.lower().endswith(".csv"):
+                continue
+            symbol = _symbol_from_filename(name)
+            if symbol is None:
+                print(f"⚠️  {name}: symbole non reconnu, ignoré")
+                continue
+            added = import_csv(symbol, os.path.join(args.directory, name), args.root)
+            print(f"✅ {symbol}: {added:,} barres ajoutées depuis {name}")
+    else:
+        symbols = list_symbols(args.root)
+        if not symbols:
+            print(f"❌ Aucun symbole dans {args.root}/")
+            return
+        for s in symbols:
+            t = open_symbol(s, args.root)[TIME_COLUMN]
+            first = pd.to_datetime(int(t[0]), unit="s", utc=True)
+            last = pd.to_datetime(int(t[-1]), unit="s", utc=True)
+            print(f"{s:8s} {len(t):>9,} barres  {first:%Y-%m-%d %H:%M} → {last:%Y-%m-%d %H:%M} UTC")
+
+
+if __name__ == "__main__":
+    main()
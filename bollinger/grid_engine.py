@@ -0,0 +1,236 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Évaluation vectorisée de toute la grille ATR x RR x Vol en une seule passe sur les barres.
+Usage: python grid_engine.py --symbol EURUSD [--csv EURUSD.csv] --level FULL [--output EURUSD_full.xlsx]
+"""
+
+import argparse
+import itertools
+import time
+
+import numpy as np
+import pandas as pd
+
+import bar_store
+import local_engine
+from local_engine import EXPECTED_COLS
+from test_calculator import TEST_LEVELS
+
+
+def grid_axes(atr_values, rr_values, vol_values):
+    """Combos dans l'ordre des boucles du runner (ATR, puis RR, puis Vol)."""
+    combos = np.array(list(itertools.product(atr_values, rr_values, vol_values)), dtype=np.float64)
+    return combos[:, 0], combos[:, 1], combos[:, 2]
+
+
+def simulate_grid(ctx: dict, atr_mult, rr, vol_mult) -> dict:
+    """Même logique que local_engine.simulate, mais chaque combo est une position sur l'axe P."""
+    p = ctx["params"]
+    o, h, l, c = ctx["open"], ctx["high"], ctx["low"], ctx["close"]
+    atr, rr_scale = ctx["atr"], ctx["rr_scale"]
+    long_base, short_base = ctx["long_base"], ctx["short_base"]
+    atr_mult = np.asarray(atr_mult, dtype=np.float64)
+    rr = np.asarray(rr, dtype=np.float64)
+    vol_mult = np.asarray(vol_mult, dtype=np.float64)
+    P, n = atr_mult.size, len(c)
+    offset = p["entryOffsetPips"] * ctx["mintick"]
+    cool = p["coolDownBars"]
+    timeout = p["limitOrderTimeout"]
+    use_limit = p["useLimitOrders"]
+    risk = p["riskPercent"] / 100.0
+    vol_filter = p["enableVolatilityFilter"]
+    static_vol = local_engine.volatility_condition(ctx, 1.0) if p["volatilityMode"] == "Static" else None
+
+    # Position ouverte
+    pos = np.zeros(P, dtype=np.int8)
+    entry = np.zeros(P)
+    sl = np.zeros(P)
+    tp = np.zeros(P)
+    qty = np.zeros(P)
+    # Ordres en attente (long / short)
+    pl = np.zeros(P, dtype=bool)
+    pl_price, pl_sl, pl_tp, pl_qty, pl_bar = (np.zeros(P) for _ in range(5))
+    ps = np.zeros(P, dtype=bool)
+    ps_price, ps_sl, ps_tp, ps_qty, ps_bar = (np.zeros(P) for _ in range(5))
+    # Comptabilité
+    equity = np.full(P, float(p["initialCapital"]))
+    peak = equity.copy()
+    max_dd = np.zeros(P)
+    last_trade_bar = np.full(P, -cool * 2, dtype=np.int64)
+    n_trades = np.zeros(P, dtype=np.int64)
+    n_wins = np.zeros(P, dtype=np.int64)
+    gross_profit = np.zeros(P)
+    gross_loss = np.zeros(P)
+
+    mode = np.zeros(P, dtype=np.int8)  # 0 = déjà en position, 1 = rempli à l'ouverture, 2 = au prix limite
+    signal_bars = np.flatnonzero(long_base | short_base)
+    busy = False
+    t = 0
+    while t < n:
+        if not busy:
+            k = np.searchsorted(signal_bars, t)
+            if k >= signal_bars.size:
+                break
+            t = int(signal_bars[k])
+        ot, ht, lt, ct = o[t], h[t], l[t], c[t]
+        up = (ht - ot) < (ot - lt)
+
+        # 1) Remplissage des ordres en attente (un ordre n'existe que si le combo est flat)
+        pend = np.flatnonzero(pl | ps) if busy else ()
+        if len(pend):
+            has_l, has_s = pl[pend], ps[pend]
+            if use_limit:
+                lo = has_l & (ot <= pl_price[pend])
+                ll = has_l & ~lo & (lt <= pl_price[pend])
+                so = has_s & (ot >= ps_price[pend])
+                sli = has_s & ~so & (ht >= ps_price[pend])
+            else:
+                lo, ll = has_l, np.zeros(len(pend), dtype=bool)
+                so, sli = has_s, np.zeros(len(pend), dtype=bool)
+            long_fill, short_fill = lo | ll, so | sli
+            # Les deux côtés touchés : le premier atteint sur le chemin intrabar l'emporte
+            long_prio = np.where(lo, 0, 1 if up else 0)
+            short_prio = np.where(so, 0, 0 if up else 1)
+            take_long = long_fill & ~(short_fill & (short_prio <= long_prio))
+            take_short = short_fill & ~take_long
+            if take_long.any():
+                j = pend[take_long]
+                pos[j] = 1
+                entry[j] = np.where(lo[take_long], ot, pl_price[j])
+                sl[j], tp[j], qty[j] = pl_sl[j], pl_tp[j], pl_qty[j]
+                mode[j] = np.where(lo[take_long], 1, 2)
+            if take_short.any():
+                j = pend[take_short]
+                pos[j] = -1
+                entry[j] = np.where(so[take_short], ot, ps_price[j])
+                sl[j], tp[j], qty[j] = ps_sl[j], ps_tp[j], ps_qty[j]
+                mode[j] = np.where(so[take_short], 1, 2)
+            filled = pend[take_long | take_short]
+            pl[filled] = False
+            ps[filled] = False
+
+        # 2) Sorties stop / objectif
+        held = np.flatnonzero(pos) if busy else ()
+        if len(held):
+            side, e_sl, e_tp, md = pos[held], sl[held], tp[held], mode[held]
+            is_long = side > 0
+            hit_sl = np.where(is_long, lt <= e_sl, ht >= e_sl)
+            hit_tp = np.where(is_long, ht >= e_tp, lt <= e_tp)
+            fav_first = is_long == up
+            price = np.where(hit_sl & hit_tp, np.where(fav_first, e_tp, e_sl),
+                             np.where(hit_sl, e_sl, np.where(hit_tp, e_tp, np.nan)))
+            gap = (md == 0) & (np.where(is_long, ot <= e_sl, ot >= e_sl) | np.where(is_long, ot >= e_tp, ot <= e_tp))
+            price = np.where(gap, ot, price)
+            # Rempli au prix limite en cours de barre : seul le reste du chemin compte
+            late_tp = (is_long != up) & hit_tp
+            price = np.where(md == 2, np.where(hit_sl, e_sl, np.where(late_tp, e_tp, np.nan)), price)
+            mode[held] = 0
+            out = ~np.isnan(price)
+            if out.any():
+                j = held[out]
+                pnl = side[out] * qty[j] * (price[out] - entry[j])
+                equity[j] += pnl
+                n_trades[j] += 1
+                n_wins[j] += pnl > 0
+                gross_profit[j] += np.where(pnl > 0, pnl, 0.0)
+                gross_loss[j] -= np.where(pnl < 0, pnl, 0.0)
+                pos[j] = 0
+                pk = np.maximum(peak[j], equity[j])
+                peak[j] = pk
+                max_dd[j] = np.maximum(max_dd[j], (pk - equity[j]) / pk)
+            j = held[~out]
+            if j.size:
+                marks = equity[j] + side[~out] * qty[j] * (ct - entry[j])
+                pk = np.maximum(peak[j], marks)
+                peak[j] = pk
+                max_dd[j] = np.maximum(max_dd[j], (pk - marks) / pk)
+
+        # 3) Signaux à la clôture
+        if long_base[t] or short_base[t]:
+            if not vol_filter:
+                vol_ok = True
+            elif static_vol is not None:
+                vol_ok = bool(static_vol[t])
+            else:
+                vol_ok = ctx["atr_pct"][t] >= ctx["vol_baseline"][t] * vol_mult
+            can = np.flatnonzero((pos == 0) & ((t - last_trade_bar) >= cool) & vol_ok)
+            if can.size:
+                sd = atr[t] * atr_mult[can]
+                rr_eff = rr[can] * rr_scale[t]
+                size = equity[can] * risk / sd
+                if long_base[t]:
+                    pl[can] = True
+                    pl_price[can] = (ct - offset) if use_limit else np.nan
+                    pl_sl[can], pl_tp[can], pl_qty[can], pl_bar[can] = ct - sd, ct + sd * rr_eff, size, t
+                if short_base[t]:
+                    ps[can] = True
+                    ps_price[can] = (ct + offset) if use_limit else np.nan
+                    ps_sl[can], ps_tp[can], ps_qty[can], ps_bar[can] = ct + sd, ct - sd * rr_eff, size, t
+                last_trade_bar[can] = t
+
+        # 4) Expiration des ordres limite
+        pend = np.flatnonzero(pl | ps)
+        if pend.size:
+            pl[pend] &= (t - pl_bar[pend]) < timeout
+            ps[pend] &= (t - ps_bar[pend]) < timeout
+            busy = True
+        else:
+            busy = len(held) > 0 and bool(pos.any())
+        t += 1
+
+    with np.errstate(divide="ignore", invalid="ignore"):
+        win_rate = np.where(n_trades > 0, n_wins / n_trades * 100.0, np.nan)
+        profit_factor = np.where(gross_loss > 0, gross_profit / gross_loss, np.nan)
+    net = gross_profit - gross_loss
+    return {
+        "Net Profit": net,
+        "Net Profit Clean": net,
+        "Win Rate": win_rate,
+        "drawdown": max_dd * 100.0,
+        "Total Trades": n_trades,
+        "Profit Factor": profit_factor,
+    }
+
+
+def evaluate_grid(bars, atr_values, rr_values, vol_values, symbol="", params=None, mintick=None,
+                  ctx=None, store_root=None) -> pd.DataFrame:
+    """Indicateurs calculés une fois par symbole, puis toute la grille simulée d'un coup."""
+    if ctx is None:
+        ctx = local_engine.prepare(bars, params=params, mintick=mintick, symbol=symbol, store_root=store_root)
+    atr_mult, rr, vol_mult = grid_axes(atr_values, rr_values, vol_values)
+    metrics = simulate_grid(ctx, atr_mult, rr, vol_mult)
+    df = pd.DataFrame({
+        "Symbol": symbol,
+        "ATR Multiplier": atr_mult,
+        "RR": rr,
+        "Vol Multiplier": vol_mult,
+        **metrics,
+    })
+    return df[EXPECTED_COLS]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Balayage local de la grille ATR x RR x Vol")
+    parser.add_argument('--csv', help='Export OHLC TradingView (défaut: stockage colonnaire bar_store)')
+    parser.add_argument('--symbol', default='', help='Symbole (sert à déduire le mintick, ex: EURUSD)')
+    parser.add_argument('--store', default=bar_store.STORE_ROOT, help='Répertoire du stockage de barres')
+    parser.add_argument('--level', choices=['COARSE', 'FINE', 'FULL'], default='FULL')
+    parser.add_argument('--output', help='Fichier Excel où écrire la feuille {SYMBOL}_Results')
+    args = parser.parse_args()
+
+    config = TEST_LEVELS[args.level]
+    bars = local_engine.load_bars(args.symbol, args.csv, args.store)
+    t0 = time.perf_counter()
+    df = evaluate_grid(bars, config['ATR_MULTIPLIERS'], config['RR_VALUES'], config['VOL_MULTIPLIERS'],
+                       symbol=args.symbol, store_root=None if args.csv else args.store)
+    dt = time.perf_counter() - t0
+    print(f"⚡ {len(df):,} combos x {len(bars['close']):,} barres en {dt:.2f}s ({dt/len(df)*1000:.2f} ms/combo)")
+    print(df.sort_values("Net Profit Clean", ascending=False).head(10).to_string(index=False))
+    if args.output:
+        df.to_excel(args.output, index=False, sheet_name=f"{args.symbol or 'GRID'}_Results")
+        print(f"✅ Résultats écrits dans {args.output}")
+
+
+if __name__ == "__main__":
+    main()
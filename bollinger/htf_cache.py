@@ -0,0 +1,213 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+request.security(syminfo.tickerid, trendTF, ta.sma(close, bbLength)) de bollinger-strat.jl, sans
+lookahead : les barres sont regroupées une fois par trendTF, la série HTF alignée est rangée à côté des
+barres (bars/SYMBOLE/htf/TF/) et n'est recalculée que si de nouvelles barres arrivent.
+Usage: python htf_cache.py --symbol EURUSD --tf 240 D [--length 10 20 50] [--store bars]
+"""
+
+import argparse
+import os
+import time
+
+import numpy as np
+
+import bar_store
+import indicators
+import session_masks
+
+HTF_DIR = "htf"
+WEEK_ANCHOR_SEC = 4 * 86400  # 5 janvier 1970 : premier lundi, début des barres W
+CACHE_SIZE = 64              # séries HTF gardées en mémoire (les plus anciennes sont oubliées)
+
+_cache = {}
+
+
+def parse_timeframe(tf: str):
+    """Chaîne input.timeframe -> (unité, multiple) : '60' -> ('S', 3600), '1D' -> ('D', 1), 'M' -> ('M', 1).
+    '' désigne le timeframe du graphique -> (None, 0)."""
+    tf = str(tf).strip().upper()
+    if not tf:
+        return None, 0
+    unit = tf[-1] if tf[-1] in "SDWM" else ""
+    digits = tf[:-1] if unit else tf
+    count = int(digits) if digits else 1
+    if unit == "":
+        return "S", count * 60
+    if unit == "S":
+        return "S", count
+    return unit, count
+
+
+def period_ids(times, tf: str) -> np.ndarray:
+    """Numéro de la barre HTF qui contient chaque barre (intraday et D alignés sur minuit UTC,
+    W sur le lundi, M sur le mois civil)."""
+    times = np.asarray(times, dtype=np.int64)
+    unit, count = parse_timeframe(tf)
+    if unit == "S":
+        return times // count
+    if unit == "D":
+        return times // (86400 * count)
+    if unit == "W":
+        return (times - WEEK_ANCHOR_SEC) // (7 * 86400 * count)
+    months = times.astype("datetime64[s]").astype("datetime64[M]").astype(np.int64)
+    return months // count
+
+
+def period_end(period_id: int, tf: str) -> int:
+    """Heure de fin (secondes UTC) de la barre HTF period_id."""
+    unit, count = parse_timeframe(tf)
+    if unit == "S":
+        return (period_id + 1) * count
+    if unit == "D":
+        return (period_id + 1) * 86400 * count
+    if unit == "W":
+        return (period_id + 1) * 7 * 86400 * count + WEEK_ANCHOR_SEC
+    month = np.datetime64((period_id + 1) * count, "M")
+    return int(month.astype("datetime64[s]").astype(np.int64))
+
+
+def resample(times, close, tf: str):
+    """(closes HTF, indice HTF de chaque barre). Une barre HTF n'est publiée que sur la dernière barre
+    du graphique qu'elle contient, comme request.security avec barmerge.lookahead_off sur l'historique :
+    avant, la barre voit la barre HTF précédente (indice -1 : aucune barre HTF terminée)."""
+    times = np.asarray(times, dtype=np.int64)
+    close = np.asarray(close, dtype=np.float64)
+    n = len(times)
+    if not n:
+        return np.empty(0), np.empty(0, dtype=np.int64)
+    base_tf = session_masks.bar_timeframe(times)
+    unit, count = parse_timeframe(tf)
+    if unit is None:
+        return close.copy(), np.arange(n, dtype=np.int64)
+    if unit == "S" and count < base_tf:
+        raise ValueError(f"trendTF {tf} is lower than the chart timeframe ({base_tf}s)")
+    ids = period_ids(times, tf)
+    closes_period = np.empty(n, dtype=bool)
+    closes_period[:-1] = ids[1:] != ids[:-1]
+    # Dernière barre de l'historique : la barre HTF n'est terminée que si son heure de fin est atteinte
+    closes_period[-1] = times[-1] + base_tf >= period_end(int(ids[-1]), tf)
+    return close[closes_period], np.cumsum(closes_period) - 1
+
+
+def _entry_dir(symbol: str, tf: str, store_root: str) -> str:
+    return os.path.join(bar_store.symbol_dir(symbol, store_root), HTF_DIR, str(tf).strip().upper() or "CHART")
+
+
+def _span(times) -> np.ndarray:
+    # Nombre de barres et bornes : toute nouvelle barre invalide la série HTF
+    return np.array([len(times), times[0], times[-1]] if len(times) else [0, 0, 0], dtype=np.int64)
+
+
+def _load(path: str, span: np.ndarray):
+    try:
+        if not np.array_equal(np.load(os.path.join(path, "span.npy")), span):
+            return None
+        return np.load(os.path.join(path, "close.npy")), np.load(os.path.join(path, "index.npy"))
+    except (OSError, ValueError):
+        return None
+
+
+def _save(path: str, span: np.ndarray, htf_close: np.ndarray, index: np.ndarray):
+    # Écriture atomique (fichier temporaire puis os.replace) : plusieurs processus du pool
+    # peuvent rééchantillonner le même symbole en même temps ; span.npy en dernier fait foi.
+    os.makedirs(path, exist_ok=True)
+    for name, values in (("close", htf_close), ("index", index), ("span", span)):
+        tmp = os.path.join(path, f"{name}.{os.getpid()}.tmp.npy")
+        np.save(tmp, values)
+        os.replace(tmp, os.path.join(path, f"{name}.npy"))
+
+
+def htf_series(times, close, tf: str, symbol: str = "", store_root=None):
+    """(closes HTF, indice HTF par barre) depuis la mémoire, puis le disque (si store_root et le
+    symbole y est stocké), sinon rééchantillonnés et rangés aux deux endroits."""
+    times = np.asarray(times, dtype=np.int64)
+    span = _span(times)
+    key = (symbol, str(tf).strip().upper(), tuple(span))
+    if key in _cache:
+        return _cache[key]
+    path = _entry_dir(symbol, tf, store_root) if store_root and symbol and \
+        os.path.isdir(bar_store.symbol_dir(symbol, store_root)) else None
+    series = _load(path, span) if path else None
+    if series is None:
+        series = resample(times, close, tf)
+        if path:
+            _save(path, span, *series)
+    for values in series:
+        values.setflags(write=False)
+    if len(_cache) >= CACHE_SIZE:
+        del _cache[next(iter(_cache))]
+    _cache[key] = series
+    return series
+
+
+def align(htf_values, index) -> np.ndarray:
+    """Valeur HTF vue par chaque barre du graphique (NaN avant la première barre HTF terminée)."""
+    out = np.full(len(index), np.nan)
+    ok = index >= 0
+    out[ok] = np.asarray(htf_values, dtype=np.float64)[index[ok]]
+    return out
+
+
+def htf_basis(times, close, tf: str, length: int, symbol: str = "", store_root=None) -> np.ndarray:
+    """htf_basis du script : une SMA sur la série HTF en cache, réalignée sur les barres."""
+    htf_close, index = htf_series(times, close, tf, symbol, store_root)
+    return align(indicators.sma(htf_close, length), index)
+
+
+def clear_cache():
+    _cache.clear()
+
+
+# --- Benchmark : pandas resample + SMA + réalignement à chaque combo ---
+
+def _pandas_htf_basis(times, close, tf: str, length: int) -> np.ndarray:
+    import pandas as pd
+
+    ids = period_ids(times, tf)
+    s = pd.Series(close)
+    htf = s.groupby(ids).last()
+    done = pd.Series(ids).shift(-1) != pd.Series(ids)
+    done.iloc[-1] = times[-1] + session_masks.bar_timeframe(times) >= period_end(int(ids[-1]), tf)
+    basis = htf[done.groupby(ids).any()].rolling(length).mean()
+    seen = pd.Series(np.where(done, ids, np.nan)).ffill()
+    return seen.map(basis).to_numpy(dtype=np.float64)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Séries HTF (request.security) en cache à côté des barres")
+    parser.add_argument('--symbol', required=True)
+    parser.add_argument('--store', default=bar_store.STORE_ROOT, help='Répertoire du stockage de barres')
+    parser.add_argument('--tf', nargs='+', default=['240', 'D', 'W'], help='Valeurs de trendTF')
+    parser.add_argument('--length', type=int, nargs='+', default=[10, 20, 30, 50], help='Valeurs de bbLength')
+    args = parser.parse_args()
+
+    bars = bar_store.open_symbol(args.symbol, args.store)
+    if not len(bars["time"]):
+        print(f"❌ Aucune barre pour {args.symbol} dans {args.store}/")
+        return
+    times, close = np.asarray(bars["time"]), np.asarray(bars["close"])
+    n_combos = len(args.tf) * len(args.length)
+    print(f"⏱️ {args.symbol}: {len(times):,} barres, {len(args.tf)} trendTF x {len(args.length)} bbLength")
+
+    t0 = time.perf_counter()
+    naive = {(tf, n): _pandas_htf_basis(times, close, tf, n) for tf in args.tf for n in args.length}
+    slow = time.perf_counter() - t0
+    for label in ("1er passage", "cache disque"):
+        clear_cache()
+        t0 = time.perf_counter()
+        fast = {(tf, n): htf_basis(times, close, tf, n, args.symbol, args.store) for tf in args.tf for n in args.length}
+        dt = time.perf_counter() - t0
+        # Même SMA à l'arrondi près (indicators.sma vs rolling().mean()), NaN aux mêmes barres
+        same = all(np.allclose(fast[k], naive[k], rtol=0, atol=1e-9, equal_nan=True) for k in naive)
+        print(f"   {label:13s} {dt * 1000:7.1f}ms vs pandas par combo {slow * 1000:7.1f}ms "
+              f"({slow / dt:5.1f}x)   {'✅' if same else '❌'}")
+    for tf in args.tf:
+        htf_close, _ = htf_series(times, close, tf, args.symbol, args.store)
+        print(f"   {tf:>4s}: {len(htf_close):,} barres HTF → {_entry_dir(args.symbol, tf, args.store)}/")
+    print(f"   {n_combos} combos : une SMA par série HTF, aucun rééchantillonnage")
+
+
+if __name__ == "__main__":
+    main()
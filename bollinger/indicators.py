@@ -0,0 +1,291 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Indicateurs Pine (ta.sma, ta.stdev, ta.rma, ta.tr, ta.atr, ta.rsi, ADX manuel de bollinger-strat.jl)
+calculés sur des tableaux NumPy entiers en O(n), avec les mêmes NaN de démarrage que Pine.
+Usage (benchmark contre pandas rolling()): python indicators.py [--bars 200000] [--repeat 5]
+"""
+
+import argparse
+import math
+import time
+
+import numpy as np
+import pandas as pd
+
+try:
+    from scipy.signal import lfilter  # optionnel : récursion RMA en C
+except ImportError:
+    lfilter = None
+
+# Les sommes cumulées repartent de zéro tous les CHUNK_BARS (valeurs décalées sur la tranche) :
+# leur magnitude, donc l'erreur d'arrondi des différences, reste bornée sur les longs historiques
+CHUNK_BARS = 4096
+# Erreur relative tolérée sur la variance par sommes cumulées ; au-delà (fenêtre quasi plate),
+# la fenêtre est recalculée en deux passes
+STDEV_REL_TOL = 1e-7
+PINE_ZERO = 1e-10  # tolérance de ta.stdev sur les écarts à la moyenne
+# Bloc de la récursion RMA sans scipy : (1 - alpha)^-k reste sous cette borne
+RMA_BLOCK_GROWTH = 1e6
+
+
+def _as_float(x) -> np.ndarray:
+    return np.asarray(x, dtype=np.float64)
+
+
+def _window_sums(v: np.ndarray, n: int) -> np.ndarray:
+    """Somme de chaque fenêtre de n valeurs se terminant en i (len(v) - n + 1 valeurs)."""
+    c = np.cumsum(v)
+    out = c[n - 1:].copy()
+    out[1:] -= c[:-n]
+    return out
+
+
+def _rolling(x, n: int, kernel) -> np.ndarray:
+    """kernel(y, n, ref) -> valeurs des fenêtres de la tranche, avec y = x - ref.
+    NaN tant que la fenêtre n'a pas n valeurs, ou si elle contient un NaN (na en Pine)."""
+    x = _as_float(x)
+    out = np.full(len(x), np.nan)
+    if n < 1 or len(x) < n:
+        return out
+    missing = np.isnan(x)
+    # Les NaN valent 0 ici : seules les fenêtres qui en contiennent les voient, et elles sont remises à NaN
+    filled = np.where(missing, 0.0, x) if missing.any() else x
+    for s in range(n - 1, len(x), CHUNK_BARS):
+        e = min(len(x), s + CHUNK_BARS)
+        seg = filled[s - n + 1:e]
+        ref = seg[np.argmin(missing[s - n + 1:e])]
+        out[s:e] = kernel(seg - ref, n, ref)
+    if missing.any():
+        out[n - 1:][_window_sums(missing, n) > 0] = np.nan
+    return out
+
+
+def _sma_kernel(y, n, ref):
+    return _window_sums(y, n) / n + ref
+
+
+def _stdev_kernel(y, n, ref):
+    y2 = y * y
+    s1 = _window_sums(y, n)
+    var = (_window_sums(y2, n) - s1 * s1 / n) / n
+    # Borne de l'erreur d'arrondi : ~ eps * |somme cumulée de y²| / n
+    err = 4.0 * np.finfo(np.float64).eps * np.cumsum(y2)[n - 1:] / n
+    redo = np.flatnonzero(var * STDEV_REL_TOL <= err)
+    if redo.size:
+        windows = np.lib.stride_tricks.sliding_window_view(y, n)[redo]
+        dev = windows - windows.mean(axis=1, keepdims=True)
+        dev[np.abs(dev) <= PINE_ZERO] = 0.0  # comme ta.stdev : écarts sous 1e-10 comptés nuls
+        var[redo] = (dev * dev).mean(axis=1)
+    return np.sqrt(np.maximum(var, 0.0))
+
+
+def sma(x, n: int) -> np.ndarray:
+    """ta.sma par sommes cumulées."""
+    return _rolling(x, n, _sma_kernel)
+
+
+def stdev(x, n: int) -> np.ndarray:
+    """ta.stdev(biased=true) : écart-type de population, par sommes cumulées de x et x² ; les
+    fenêtres mal conditionnées (quasi plates) sont recalculées en deux passes."""
+    return _rolling(x, n, _stdev_kernel)
+
+
+def _rma_run(x: np.ndarray, prev: float, alpha: float) -> np.ndarray:
+    """y[i] = alpha * x[i] + (1 - alpha) * y[i-1], y[-1] = prev."""
+    decay = 1.0 - alpha
+    if decay == 0.0 or len(x) == 0:
+        return x.copy()
+    if lfilter is not None:
+        return lfilter([alpha], [1.0, -decay], x, zi=[decay * prev])[0]
+    # Sans scipy : chaque bloc est résolu depuis 0 en fermé, z[j] = alpha * decay^j * cumsum(x[k] * decay^-k),
+    # puis la valeur de sortie du bloc précédent est propagée : y[j] = z[j] + decay^(j+1) * y_prev
+    block = max(1, min(len(x), int(math.log(RMA_BLOCK_GROWTH) / -math.log(decay))))
+    n_blocks = -(-len(x) // block)
+    xb = np.zeros(n_blocks * block)
+    xb[:len(x)] = x
+    xb = xb.reshape(n_blocks, block)
+    k = np.arange(block)
+    z = decay ** k * (alpha * np.cumsum(xb * decay ** -k, axis=1))
+    starts = np.empty(n_blocks)
+    carry = decay ** block
+    for b, z_last in enumerate(z[:, -1].tolist()):
+        starts[b] = prev
+        prev = z_last + carry * prev
+    return (z + decay ** (k + 1) * starts[:, None]).ravel()[:len(x)]
+
+
+def rma(x, n: int) -> np.ndarray:
+    """ta.rma : amorcée par ta.sma(x, n), puis alpha = 1/n. Un NaN casse la récursion,
+    qui repart de ta.sma dès que la fenêtre n'en contient plus."""
+    x = _as_float(x)
+    out = np.full(len(x), np.nan)
+    seed = sma(x, n)
+    seeds = np.flatnonzero(np.isfinite(seed))
+    nans = np.flatnonzero(np.isnan(x))
+    alpha = 1.0 / n
+    i = 0
+    while True:
+        k = np.searchsorted(seeds, i)
+        if k >= seeds.size:
+            break
+        s = int(seeds[k])
+        j = np.searchsorted(nans, s + 1)
+        stop = int(nans[j]) if j < nans.size else len(x)
+        out[s] = seed[s]
+        out[s + 1:stop] = _rma_run(x[s + 1:stop], seed[s], alpha)
+        i = stop + 1
+    return out
+
+
+def true_range(high, low, close) -> np.ndarray:
+    """ta.tr(true) : high - low sur la première barre."""
+    high, low, close = _as_float(high), _as_float(low), _as_float(close)
+    prev_close = np.concatenate(([np.nan], close[:-1]))
+    tr = np.fmax(high - low, np.fmax(np.abs(high - prev_close), np.abs(low - prev_close)))
+    if len(tr):
+        tr[0] = high[0] - low[0]
+    return tr
+
+
+def atr(high, low, close, n: int) -> np.ndarray:
+    """ta.atr = ta.rma(ta.tr(true), n)."""
+    return rma(true_range(high, low, close), n)
+
+
+def rsi(close, n: int) -> np.ndarray:
+    """ta.rsi : 100 si la moyenne des baisses est nulle, 0 si celle des hausses l'est."""
+    close = _as_float(close)
+    change = np.concatenate(([np.nan], np.diff(close)))
+    up = rma(np.where(np.isnan(change), np.nan, np.maximum(change, 0.0)), n)
+    down = rma(np.where(np.isnan(change), np.nan, -np.minimum(change, 0.0)), n)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        out = 100.0 - 100.0 / (1.0 + up / down)
+    out = np.where(down == 0, 100.0, np.where(up == 0, 0.0, out))
+    out[np.isnan(up) | np.isnan(down)] = np.nan
+    return out
+
+
+def adx(high, low, close, n: int) -> np.ndarray:
+    """ADX manuel de bollinger-strat.jl (plusDM/minusDM, rma, dx)."""
+    high, low, close = _as_float(high), _as_float(low), _as_float(close)
+    up_move = np.concatenate(([np.nan], np.diff(high)))
+    down_move = np.concatenate(([np.nan], -np.diff(low)))
+    # Comparaisons avec na fausses en Pine : DM = 0 sur la première barre
+    plus_dm = np.where((up_move > down_move) & (up_move > 0), up_move, 0.0)
+    minus_dm = np.where((down_move > up_move) & (down_move > 0), down_move, 0.0)
+    trur = rma(true_range(high, low, close), n)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        plus_di = 100.0 * rma(plus_dm, n) / trur
+        minus_di = 100.0 * rma(minus_dm, n) / trur
+        dx = 100.0 * np.abs(plus_di - minus_di) / (plus_di + minus_di)
+    return rma(dx, n)
+
+
+# --- Benchmark : implémentations naïves (pandas rolling() et boucle par barre) ---
+
+def _naive_rma(x, n):
+    seed = pd.Series(x).rolling(n).mean().to_numpy()
+    out = np.full(len(x), np.nan)
+    alpha = 1.0 / n
+    prev = np.nan
+    for i in range(len(x)):
+        if prev != prev:
+            prev = seed[i]
+        else:
+            prev = alpha * x[i] + (1.0 - alpha) * prev
+        out[i] = prev
+    return out
+
+
+def _naive_rsi(close, n):
+    change = pd.Series(close).diff()
+    up = _naive_rma(change.clip(lower=0).to_numpy(), n)
+    down = _naive_rma((-change).clip(lower=0).to_numpy(), n)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        out = 100.0 - 100.0 / (1.0 + up / down)
+    out = np.where(down == 0, 100.0, np.where(up == 0, 0.0, out))
+    out[np.isnan(up) | np.isnan(down)] = np.nan
+    return out
+
+
+def _naive_tr(high, low, close):
+    prev_close = pd.Series(close).shift(1)
+    tr = pd.concat([pd.Series(high - low), (pd.Series(high) - prev_close).abs(),
+                    (pd.Series(low) - prev_close).abs()], axis=1).max(axis=1).to_numpy(copy=True)
+    tr[0] = high[0] - low[0]
+    return tr
+
+
+def _naive_adx(high, low, close, n):
+    up_move = pd.Series(high).diff().to_numpy()
+    down_move = -pd.Series(low).diff().to_numpy()
+    plus_dm = np.where((up_move > down_move) & (up_move > 0), up_move, 0.0)
+    minus_dm = np.where((down_move > up_move) & (down_move > 0), down_move, 0.0)
+    trur = _naive_rma(_naive_tr(high, low, close), n)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        plus_di = 100.0 * _naive_rma(plus_dm, n) / trur
+        minus_di = 100.0 * _naive_rma(minus_dm, n) / trur
+        dx = 100.0 * np.abs(plus_di - minus_di) / (plus_di + minus_di)
+    return _naive_rma(dx, n)
+
+
+def _best_time(fn, repeat: int) -> float:
+    best = math.inf
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - t0)
+    return best
+
+
+def benchmark(bars: int = 200_000, repeat: int = 5, seed: int = 0) -> pd.DataFrame:
+    """Temps (meilleur de `repeat`) de chaque noyau contre sa version naïve, et écart maximal."""
+    rng = np.random.default_rng(seed)
+    c = 1.1 * np.exp(np.cumsum(rng.normal(0.0, 0.001, bars)))
+    o = np.concatenate(([c[0]], c[:-1]))
+    h = np.maximum(o, c) * (1 + np.abs(rng.normal(0.0, 0.0005, bars)))
+    l = np.minimum(o, c) * (1 - np.abs(rng.normal(0.0, 0.0005, bars)))
+    cases = {
+        "sma(20)": (lambda: sma(c, 20), lambda: pd.Series(c).rolling(20).mean().to_numpy()),
+        "stdev(20)": (lambda: stdev(c, 20), lambda: pd.Series(c).rolling(20).std(ddof=0).to_numpy()),
+        "sma(200)": (lambda: sma(c, 200), lambda: pd.Series(c).rolling(200).mean().to_numpy()),
+        "rma(14)": (lambda: rma(c, 14), lambda: _naive_rma(c, 14)),
+        "tr": (lambda: true_range(h, l, c), lambda: _naive_tr(h, l, c)),
+        "atr(14)": (lambda: atr(h, l, c, 14), lambda: _naive_rma(_naive_tr(h, l, c), 14)),
+        "rsi(14)": (lambda: rsi(c, 14), lambda: _naive_rsi(c, 14)),
+        "adx(14)": (lambda: adx(h, l, c, 14), lambda: _naive_adx(h, l, c, 14)),
+    }
+    rows = []
+    for name, (fast, naive) in cases.items():
+        a, b = fast(), naive()
+        same_nan = bool(np.array_equal(np.isnan(a), np.isnan(b)))
+        ok = ~np.isnan(a) & ~np.isnan(b)
+        rows.append({
+            "indicateur": name,
+            "noyau_ms": _best_time(fast, repeat) * 1000,
+            "naif_ms": _best_time(naive, repeat) * 1000,
+            "ecart_max": float(np.max(np.abs(a[ok] - b[ok]))) if ok.any() else 0.0,
+            "nan_identiques": same_nan,
+        })
+    df = pd.DataFrame(rows).set_index("indicateur")
+    df["gain"] = df["naif_ms"] / df["noyau_ms"]
+    return df
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark des indicateurs O(n) contre pandas rolling()")
+    parser.add_argument('--bars', type=int, default=200_000, help='Nombre de barres synthétiques')
+    parser.add_argument('--repeat', type=int, default=5, help='Mesures par indicateur (meilleur temps retenu)')
+    args = parser.parse_args()
+
+    print(f"⏱️ {args.bars:,} barres, meilleur de {args.repeat} (RMA: {'scipy lfilter' if lfilter else 'NumPy par blocs'})")
+    df = benchmark(args.bars, args.repeat)
+    print(df.to_string(formatters={
+        "noyau_ms": "{:.2f}".format, "naif_ms": "{:.2f}".format,
+        "ecart_max": "{:.1e}".format, "gain": "x{:.1f}".format,
+    }))
+
+
+if __name__ == "__main__":
+    main()
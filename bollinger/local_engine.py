@@ -0,0 +1,434 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Moteur de backtest local (NumPy) reproduisant bollinger-strat.jl sans navigateur.
+Usage: python local_engine.py --symbol EURUSD [--csv EURUSD.csv] --atr 1.2 --rr 2.7 --vol 0.8
+"""
+
+import argparse
+import math
+import time
+
+import numpy as np
+
+import bar_store
+import htf_cache
+import indicators
+import pivots
+import session_masks
+from results_store import EXPECTED_COLS  # disposition commune des lignes de résultats
+
+# Inputs Pine par défaut (mêmes noms que dans bollinger-strat.jl)
+DEFAULT_PARAMS = {
+    "bbLength": 20,
+    "bbStdDev": 2.0,
+    "rsiLength": 14,
+    "rsiOversold": 30.0,
+    "rsiOverbought": 70.0,
+    "atrLength": 14,
+    "atrMultiplier": 1.2,
+    "riskReward": 2.7,
+    "useSessionFilter": False,
+    "useADXFilter": False,
+    "adxLength": 14,
+    "adxThreshold": 30.0,
+    "useTrendFilter": False,
+    "trendTF": "60",
+    "useCandleFilter": False,
+    "useRSIDivergence": False,
+    "useDynamicRR": False,
+    "useLimitOrders": True,
+    "entryOffsetPips": 10.0,
+    "limitOrderTimeout": 3,
+    "enableHybridMode": False,
+    "trendADXMin": 25.0,
+    "bandwidthThreshold": 0.05,
+    "enableBreakeven": False,
+    "enableSRFilter": False,
+    "pivotLen": 10,
+    "srThresholdATR": 1.0,
+    "enableVolatilityFilter": True,
+    "volatilityMode": "Dynamic",
+    "volatilityThreshold": 0.5,
+    "volatilityLookback": 200,
+    "volatilityMultiplier": 0.8,
+    "londonSessionStart": 7,
+    "londonSessionEnd": 16,
+    "nySessionStart": 13,
+    "nySessionEnd": 22,
+    "enableNoTradeWindow": True,
+    "noTradeSession": "2300-0000",
+    "noTradeTZ": "Europe/Paris",
+    "coolDownBars": 5,
+    "riskPercent": 0.25,
+    "initialCapital": 10000.0,
+}
+
+# Options du script Pine pas encore émulées localement
+UNSUPPORTED_PARAMS = ("enableBreakeven",)
+
+BAR_COLUMNS = ("open", "high", "low", "close")
+
+
+def default_mintick(symbol: str) -> float:
+    """syminfo.mintick des paires PEPPERSTONE (5 décimales, 3 pour les croix JPY)."""
+    return 0.001 if str(symbol).upper().endswith("JPY") else 0.00001
+
+
+def resolve_params(params=None) -> dict:
+    p = dict(DEFAULT_PARAMS)
+    if params:
+        unknown = [k for k in params if k not in DEFAULT_PARAMS]
+        if unknown:
+            raise ValueError(f"Unknown strategy inputs: {unknown}")
+        p.update(params)
+    enabled = [k for k in UNSUPPORTED_PARAMS if p[k]]
+    if enabled:
+        raise ValueError(f"Inputs not supported by the local engine: {enabled}")
+    return p
+
+
+def as_bar_arrays(bars) -> dict:
+    """Accepte un DataFrame ou un mapping de colonnes (time, open, high, low, close)."""
+    out = {}
+    for col in BAR_COLUMNS:
+        out[col] = np.ascontiguousarray(np.asarray(bars[col], dtype=np.float64))
+    out["time"] = np.asarray(bars["time"], dtype=np.int64)
+    return out
+
+
+def load_bars_csv(path: str) -> dict:
+    """Lit un export CSV TradingView (time en secondes Unix ou ISO 8601)."""
+    return as_bar_arrays(bar_store.read_csv_bars(path))
+
+
+def load_bars(symbol: str = "", csv_path=None, store_root: str = bar_store.STORE_ROOT) -> dict:
+    """Barres d'un export CSV si fourni, sinon du stockage colonnaire (memmap, sans copie)."""
+    if csv_path:
+        return load_bars_csv(csv_path)
+    bars = bar_store.open_symbol(symbol, store_root)
+    if not len(bars["time"]):
+        raise FileNotFoundError(f"No bars for {symbol} in {store_root}/ (python bar_store.py import ...)")
+    return as_bar_arrays(bars)
+
+
+def prepare(bars, params=None, mintick=None, symbol="", store_root=None) -> dict:
+    """Calcule une fois les séries qui ne dépendent ni de l'ATR Multiplier, ni du RR, ni du Vol Multiplier.
+    store_root : stockage de barres où ranger les séries HTF de useTrendFilter (sinon cache mémoire seul)."""
+    p = resolve_params(params)
+    a = as_bar_arrays(bars)
+    o, h, l, c = a["open"], a["high"], a["low"], a["close"]
+    if mintick is None:
+        mintick = default_mintick(symbol)
+
+    basis = indicators.sma(c, p["bbLength"])
+    dev = p["bbStdDev"] * indicators.stdev(c, p["bbLength"])
+    upper, lower = basis + dev, basis - dev
+    rsi = indicators.rsi(c, p["rsiLength"])
+    atr = indicators.atr(h, l, c, p["atrLength"])
+    with np.errstate(divide="ignore", invalid="ignore"):
+        band_width = (upper - lower) / basis
+    need_adx = p["useADXFilter"] or p["enableHybridMode"]
+    adx = indicators.adx(h, l, c, p["adxLength"]) if need_adx else np.full(len(c), np.nan)
+
+    allowed, spread_ok = session_masks.session_masks(a["time"], p, symbol)
+    adx_cond = (adx < p["adxThreshold"]) if p["useADXFilter"] else True
+    if p["useTrendFilter"]:
+        # htf_basis = request.security(..., trendTF, ta.sma(close, bbLength)), sans lookahead
+        htf_basis = htf_cache.htf_basis(a["time"], c, p["trendTF"], p["bbLength"], symbol, store_root)
+        with np.errstate(invalid="ignore"):
+            trend_long, trend_short = c <= htf_basis, c >= htf_basis
+    else:
+        trend_long = trend_short = True
+
+    prev_c = np.concatenate(([np.nan], c[:-1]))
+    prev_o = np.concatenate(([np.nan], o[:-1]))
+    if p["useCandleFilter"]:
+        rng = h - l
+        bull = ((c > o) & (o <= prev_c) & (prev_o > prev_c) & (c >= prev_o)) | \
+               ((o - l > rng * 0.4) & (np.abs(c - o) < rng * 0.3))
+        bear = ((o > c) & (o >= prev_c) & (prev_o < prev_c) & (c <= prev_o)) | \
+               ((h - o > rng * 0.4) & (np.abs(o - c) < rng * 0.3))
+    else:
+        bull = bear = True
+    if p["useRSIDivergence"]:
+        prev_rsi = np.concatenate(([np.nan], rsi[:-1]))
+        bull_div = (l < np.concatenate(([np.nan], l[:-1]))) & (rsi > prev_rsi)
+        bear_div = (h > np.concatenate(([np.nan], h[:-1]))) & (rsi < prev_rsi)
+    else:
+        bull_div = bear_div = True
+
+    gate = allowed & spread_ok
+    long_revert = gate & adx_cond & trend_long & bull & bull_div & (c < lower) & (rsi < p["rsiOversold"])
+    short_revert = gate & adx_cond & trend_short & bear & bear_div & (c > upper) & (rsi > p["rsiOverbought"])
+    if p["enableHybridMode"]:
+        trending = (adx > p["trendADXMin"]) & (band_width > p["bandwidthThreshold"])
+        long_trend = gate & (c > upper) & (adx > p["trendADXMin"])
+        short_trend = gate & (c < lower) & (adx > p["trendADXMin"])
+        long_base = (~trending & long_revert) | (trending & long_trend)
+        short_base = (~trending & short_revert) | (trending & short_trend)
+    else:
+        long_base, short_base = long_revert, short_revert
+    if p["enableSRFilter"]:
+        # Distance au dernier pivot confirmé (ta.pivotlow / ta.pivothigh, retard de pivotLen barres)
+        last_support, last_resistance = pivots.support_resistance(h, l, p["pivotLen"])
+        with np.errstate(invalid="ignore"):
+            long_base = long_base & (np.abs(c - last_support) <= p["srThresholdATR"] * atr)
+            short_base = short_base & (np.abs(c - last_resistance) <= p["srThresholdATR"] * atr)
+    valid_atr = np.isfinite(atr) & (atr > 0)
+
+    with np.errstate(divide="ignore", invalid="ignore"):
+        atr_pct = atr / c * 100.0
+    baseline = indicators.sma(atr_pct, p["volatilityLookback"])
+    rr_scale = (1.0 + (band_width - 0.02)) if p["useDynamicRR"] else np.ones(len(c))
+
+    return {
+        "params": p,
+        "mintick": float(mintick),
+        "open": o, "high": h, "low": l, "close": c, "time": a["time"],
+        "atr": atr,
+        "atr_pct": atr_pct,
+        "vol_baseline": baseline,
+        "rr_scale": rr_scale,
+        "long_base": np.asarray(long_base & valid_atr, dtype=bool),
+        "short_base": np.asarray(short_base & valid_atr, dtype=bool),
+    }
+
+
+def volatility_condition(ctx: dict, vol_mult: float):
+    p = ctx["params"]
+    if not p["enableVolatilityFilter"]:
+        return np.ones(len(ctx["close"]), dtype=bool)
+    if p["volatilityMode"] == "Static":
+        return ctx["atr_pct"] >= p["volatilityThreshold"]
+    return ctx["atr_pct"] >= ctx["vol_baseline"] * vol_mult
+
+
+# --- Émulation du broker (ordres à la clôture, exécution sur les barres suivantes) ---
+
+def _up_first(o, h, l):
+    # Hypothèse du broker emulator : si le plus haut est plus proche de l'ouverture,
+    # le chemin intrabar est O -> H -> L -> C, sinon O -> L -> H -> C.
+    return (h - o) < (o - l)
+
+
+def _exit_on_bar(side, o, h, l, sl, tp, up_first, fill_mode):
+    """Prix de sortie sur la barre, ou nan. fill_mode: 0 = position déjà ouverte,
+    1 = remplie à l'ouverture, 2 = remplie au prix limite en cours de barre."""
+    if side > 0:
+        if fill_mode == 2:
+            if l <= sl:
+                return sl
+            if not up_first and h >= tp:
+                return tp
+            return math.nan
+        if fill_mode == 0:
+            if o <= sl:
+                return o
+            if o >= tp:
+                return o
+        hit_sl, hit_tp = l <= sl, h >= tp
+    else:
+        if fill_mode == 2:
+            if h >= sl:
+                return sl
+            if up_first and l <= tp:
+                return tp
+            return math.nan
+        if fill_mode == 0:
+            if o >= sl:
+                return o
+            if o <= tp:
+                return o
+        hit_sl, hit_tp = h >= sl, l <= tp
+    if hit_sl and hit_tp:
+        favourable_first = up_first if side > 0 else not up_first
+        return tp if favourable_first else sl
+    if hit_sl:
+        return sl
+    if hit_tp:
+        return tp
+    return math.nan
+
+
+def _first_exit_bar(ctx, side, start, sl, tp):
+    """Première barre >= start touchant le stop ou l'objectif (recherche par blocs croissants)."""
+    h, l = ctx["high"], ctx["low"]
+    n = len(h)
+    i, step = start, 64
+    while i < n:
+        j = min(n, i + step)
+        if side > 0:
+            hit = (l[i:j] <= sl) | (h[i:j] >= tp)
+        else:
+            hit = (h[i:j] >= sl) | (l[i:j] <= tp)
+        k = np.flatnonzero(hit)
+        if k.size:
+            return i + int(k[0])
+        i, step = j, step * 4
+    return n
+
+
+def simulate(ctx: dict, atr_mult: float, rr: float, vol_mult: float) -> dict:
+    """Rejoue la stratégie pour un combo (ATR Multiplier, RR, Vol Multiplier) et renvoie les métriques."""
+    p = ctx["params"]
+    o, h, l, c = ctx["open"], ctx["high"], ctx["low"], ctx["close"]
+    n = len(c)
+    vol_ok = volatility_condition(ctx, vol_mult)
+    long_ok = ctx["long_base"] & vol_ok
+    short_ok = ctx["short_base"] & vol_ok
+    candidates = np.flatnonzero(long_ok | short_ok)
+    stop_dist = ctx["atr"] * atr_mult
+    offset = p["entryOffsetPips"] * ctx["mintick"]
+    cool = p["coolDownBars"]
+    timeout = p["limitOrderTimeout"]
+    use_limit = p["useLimitOrders"]
+    risk = p["riskPercent"] / 100.0
+
+    equity = peak = float(p["initialCapital"])
+    max_dd = 0.0
+    pnls = []
+    last_trade_bar = -cool * 2
+    t = 0
+
+    def place(side, s):
+        sd = stop_dist[s]
+        rr_eff = rr * ctx["rr_scale"][s]
+        if side > 0:
+            price = c[s] - offset if use_limit else math.nan
+            return (price, c[s] - sd, c[s] + sd * rr_eff, equity * risk / sd, s)
+        price = c[s] + offset if use_limit else math.nan
+        return (price, c[s] + sd, c[s] - sd * rr_eff, equity * risk / sd, s)
+
+    while t < n:
+        # Flat, aucun ordre : saut direct au prochain signal hors cool-down
+        k = np.searchsorted(candidates, max(t, last_trade_bar + cool))
+        if k >= candidates.size:
+            break
+        s = int(candidates[k])
+        pend_long = place(1, s) if long_ok[s] else None
+        pend_short = place(-1, s) if short_ok[s] else None
+        last_trade_bar = s
+
+        # Ordres en attente : remplissage, remplacement ou expiration
+        side = 0
+        t = s + 1
+        while t < n and (pend_long or pend_short):
+            up = _up_first(o[t], h[t], l[t])
+            fills = []
+            if pend_long:
+                limit = pend_long[0]
+                if not use_limit or o[t] <= limit:
+                    fills.append((0, 1, o[t], 1))
+                elif l[t] <= limit:
+                    fills.append((0 if not up else 1, 1, limit, 2))
+            if pend_short:
+                limit = pend_short[0]
+                if not use_limit or o[t] >= limit:
+                    fills.append((0, -1, o[t], 1))
+                elif h[t] >= limit:
+                    fills.append((0 if up else 1, -1, limit, 2))
+            if fills:
+                fills.sort()
+                _, side, entry, fill_mode = fills[0]
+                order = pend_long if side > 0 else pend_short
+                break
+            if (t - last_trade_bar) >= cool and (long_ok[t] or short_ok[t]):
+                if long_ok[t]:
+                    pend_long = place(1, t)
+                if short_ok[t]:
+                    pend_short = place(-1, t)
+                last_trade_bar = t
+            if pend_long and t - pend_long[4] >= timeout:
+                pend_long = None
+            if pend_short and t - pend_short[4] >= timeout:
+                pend_short = None
+            t += 1
+        if not side:
+            continue
+
+        # Position ouverte sur la barre t : stop ATR / objectif RR figés au signal
+        _, sl, tp, qty, _ = order
+        f = t
+        exit_price = _exit_on_bar(side, o[f], h[f], l[f], sl, tp, _up_first(o[f], h[f], l[f]), fill_mode)
+        x = f
+        if exit_price != exit_price:
+            x = _first_exit_bar(ctx, side, f + 1, sl, tp)
+            if x >= n:
+                # Trade encore ouvert en fin d'historique : non compté (comme TradingView)
+                marks = equity + side * qty * (c[f:] - entry)
+                run_peak = np.maximum.accumulate(np.concatenate(([peak], marks)))[1:]
+                max_dd = max(max_dd, float(np.max((run_peak - marks) / run_peak)))
+                break
+            exit_price = _exit_on_bar(side, o[x], h[x], l[x], sl, tp, _up_first(o[x], h[x], l[x]), 0)
+            marks = equity + side * qty * (c[f:x] - entry)
+            run_peak = np.maximum.accumulate(np.concatenate(([peak], marks)))[1:]
+            max_dd = max(max_dd, float(np.max((run_peak - marks) / run_peak)))
+            peak = float(run_peak[-1])
+        pnl = side * qty * (exit_price - entry)
+        pnls.append(pnl)
+        equity += pnl
+        if equity > peak:
+            peak = equity
+        else:
+            max_dd = max(max_dd, (peak - equity) / peak)
+        # Clôture de la barre de sortie : un nouveau signal peut y être posé
+        t = x
+
+    return compute_metrics(pnls, max_dd)
+
+
+def compute_metrics(pnls, max_dd: float) -> dict:
+    pnls = np.asarray(pnls, dtype=np.float64)
+    total = int(pnls.size)
+    gross_profit = float(pnls[pnls > 0].sum())
+    gross_loss = float(-pnls[pnls < 0].sum())
+    net = float(pnls.sum())
+    return {
+        "Net Profit": net,
+        "Net Profit Clean": net,
+        "Win Rate": (float((pnls > 0).sum()) / total * 100.0) if total else math.nan,
+        "drawdown": max_dd * 100.0,
+        "Total Trades": total,
+        "Profit Factor": (gross_profit / gross_loss) if gross_loss > 0 else math.nan,
+    }
+
+
+def run_backtest(bars, atr_mult=None, rr=None, vol_mult=None, params=None, mintick=None, symbol="",
+                 store_root=None) -> dict:
+    """Un combo, une ligne au format EXPECTED_COLS."""
+    ctx = prepare(bars, params=params, mintick=mintick, symbol=symbol, store_root=store_root)
+    p = ctx["params"]
+    atr_mult = p["atrMultiplier"] if atr_mult is None else atr_mult
+    rr = p["riskReward"] if rr is None else rr
+    vol_mult = p["volatilityMultiplier"] if vol_mult is None else vol_mult
+    row = {"Symbol": symbol, "ATR Multiplier": atr_mult, "RR": rr, "Vol Multiplier": vol_mult}
+    row.update(simulate(ctx, atr_mult, rr, vol_mult))
+    return row
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Backtest local de bollinger-strat.jl (sans navigateur)")
+    parser.add_argument('--csv', help='Export OHLC TradingView (défaut: stockage colonnaire bar_store)')
+    parser.add_argument('--symbol', default='', help='Symbole (sert à déduire le mintick, ex: EURUSD)')
+    parser.add_argument('--store', default=bar_store.STORE_ROOT, help='Répertoire du stockage de barres')
+    parser.add_argument('--atr', type=float, default=DEFAULT_PARAMS["atrMultiplier"])
+    parser.add_argument('--rr', type=float, default=DEFAULT_PARAMS["riskReward"])
+    parser.add_argument('--vol', type=float, default=DEFAULT_PARAMS["volatilityMultiplier"])
+    parser.add_argument('--mintick', type=float, default=None)
+    args = parser.parse_args()
+
+    bars = load_bars(args.symbol, args.csv, args.store)
+    t0 = time.perf_counter()
+    row = run_backtest(bars, args.atr, args.rr, args.vol, mintick=args.mintick, symbol=args.symbol,
+                       store_root=None if args.csv else args.store)
+    dt = time.perf_counter() - t0
+    print(f"📊 {args.symbol or args.csv}: {len(bars['close']):,} barres en {dt*1000:.1f} ms")
+    for col in EXPECTED_COLS[1:]:
+        if col == "Net Profit Clean":
+            continue
+        print(f"   {col:15s} {row[col]}")
+
+
+if __name__ == "__main__":
+    main()
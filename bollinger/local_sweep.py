@@ -0,0 +1,179 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Balayage local multi-processus : les symboles (découpés en tranches de grille) sont répartis sur
+un pool de processus, qui lisent les barres en mémoire partagée (multiprocessing.shared_memory).
+Usage: python local_sweep.py --level FINE [--symbols EURUSD GBPUSD] [--jobs 8]
+       (ou via le runner : test-selenium-single-thread.py --engine local --jobs 8)
+"""
+
+import argparse
+import os
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from multiprocessing import shared_memory
+
+import numpy as np
+
+import bar_store
+import grid_engine
+import local_engine
+
+# Colonnes copiées en mémoire partagée, dans cet ordre (8 octets chacune)
+SHARED_COLUMNS = (("time", np.int64), ("open", np.float64), ("high", np.float64),
+                  ("low", np.float64), ("close", np.float64))
+
+
+def share_bars(symbols, store_root: str = bar_store.STORE_ROOT):
+    """Un bloc de mémoire partagée par symbole (colonnes bout à bout).
+    Renvoie (layout symbole -> (nom du bloc, nb de barres), blocs à libérer avec release_bars)."""
+    layout, blocks = {}, []
+    try:
+        for symbol in symbols:
+            bars = local_engine.load_bars(symbol, store_root=store_root)
+            n = len(bars["time"])
+            shm = shared_memory.SharedMemory(create=True, size=max(n, 1) * 8 * len(SHARED_COLUMNS))
+            blocks.append(shm)
+            for view, values in zip(_column_views(shm, n), (bars[col] for col, _ in SHARED_COLUMNS)):
+                view[:] = values
+            layout[symbol] = (shm.name, n)
+    except BaseException:
+        release_bars(blocks)
+        raise
+    return layout, blocks
+
+
+def release_bars(blocks):
+    for shm in blocks:
+        shm.close()
+        shm.unlink()
+
+
+def _column_views(shm, n: int) -> list:
+    return [np.ndarray((n,), dtype=dtype, buffer=shm.buf, offset=i * n * 8)
+            for i, (_, dtype) in enumerate(SHARED_COLUMNS)]
+
+
+# --- Côté processus de travail ---
+_layout = {}
+_params = None
+_store_root = None
+_attached = {}  # symbole -> bloc ouvert (garde le buffer vivant)
+_contexts = {}  # symbole -> local_engine.prepare(...) : calculé une fois par processus
+
+
+def _init_worker(layout: dict, params, store_root=None):
+    global _layout, _params, _store_root
+    _layout, _params, _store_root = layout, params, store_root
+
+
+def _context(symbol: str) -> dict:
+    if symbol not in _contexts:
+        name, n = _layout[symbol]
+        shm = shared_memory.SharedMemory(name=name)
+        _attached[symbol] = shm
+        bars = {col: view for (col, _), view in zip(SHARED_COLUMNS, _column_views(shm, n))}
+        _contexts[symbol] = local_engine.prepare(bars, params=_params, symbol=symbol, store_root=_store_root)
+    return _contexts[symbol]
+
+
+def _run_shard(symbol: str, combos: np.ndarray):
+    t0 = time.perf_counter()
+    metrics = grid_engine.simulate_grid(_context(symbol), combos[:, 0], combos[:, 1], combos[:, 2])
+    return symbol, combos, metrics, time.perf_counter() - t0
+
+
+# --- Côté runner ---
+
+def shard_units(units, jobs: int) -> list:
+    """(symbol, atr, rr, vol) -> tranches (symbol, combos (k, 3)). Chaque tranche reparcourt toutes les
+    barres du symbole : un symbole n'est découpé que s'il y a moins de symboles que de processus, juste
+    assez pour occuper chaque processus ; sinon toute sa grille forme une seule tranche."""
+    by_symbol = {}
+    for symbol, atr, rr, vol_mult in units:
+        by_symbol.setdefault(symbol, []).append((atr, rr, vol_mult))
+    per_symbol = max(1, -(-jobs // max(len(by_symbol), 1)))
+    shards = []
+    for symbol, combos in by_symbol.items():
+        combos = np.asarray(combos, dtype=np.float64)
+        for part in np.array_split(combos, min(per_symbol, len(combos))):
+            shards.append((symbol, part))
+    return shards
+
+
+def _report_row(atr, rr, vol_mult, metrics: dict, i: int) -> dict:
+    """Même forme qu'une ligne lue dans le rapport TradingView (arrondis du rapport)."""
+    def fmt(value, digits):
+        return f"{value:.{digits}f}" if np.isfinite(value) else ""
+    return {
+        "ATR Multiplier": float(atr),
+        "RR": float(rr),
+        "Vol Multiplier": float(vol_mult),
+        "Net Profit": fmt(metrics["Net Profit"][i], 2),
+        "Win Rate": fmt(metrics["Win Rate"][i], 2),
+        "drawdown": fmt(metrics["drawdown"][i], 2),
+        "Total Trades": str(int(metrics["Total Trades"][i])),
+        "Profit Factor": fmt(metrics["Profit Factor"][i], 3),
+    }
+
+
+def start_pool(symbols, jobs: int, store_root: str = bar_store.STORE_ROOT, params=None) -> dict:
+    layout, blocks = share_bars(symbols, store_root)
+    pool = ProcessPoolExecutor(max_workers=jobs, initializer=_init_worker, initargs=(layout, params, store_root))
+    return {"pool": pool, "blocks": blocks, "jobs": jobs}
+
+
+def stop_pool(state: dict):
+    state["pool"].shutdown(cancel_futures=True)
+    release_bars(state["blocks"])
+
+
+def local_rows(state: dict, units):
+    """(symbol, row, combo_dt) au fil des tranches terminées, comme sweep_rows du runner.
+    combo_dt est le temps de calcul de la tranche réparti sur ses combos."""
+    pending = {state["pool"].submit(_run_shard, symbol, combos) for symbol, combos in shard_units(units, state["jobs"])}
+    try:
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                symbol, combos, metrics, dt = future.result()
+                combo_dt = dt / max(len(combos), 1)
+                for i, (atr, rr, vol_mult) in enumerate(combos):
+                    yield symbol, _report_row(atr, rr, vol_mult, metrics, i), combo_dt
+    finally:
+        for future in pending:
+            future.cancel()
+
+
+def main():
+    from test_calculator import ALL_SYMBOLS, TEST_LEVELS
+
+    parser = argparse.ArgumentParser(description="Balayage local multi-processus (barres en mémoire partagée)")
+    parser.add_argument('--level', choices=['COARSE', 'FINE', 'FULL'], default='FINE')
+    parser.add_argument('--symbols', nargs='*', help='Symboles (défaut: tous ceux du stockage de barres)')
+    parser.add_argument('--store', default=bar_store.STORE_ROOT, help='Répertoire du stockage de barres')
+    parser.add_argument('--jobs', type=int, default=os.cpu_count(), help='Nombre de processus')
+    args = parser.parse_args()
+
+    symbols = args.symbols or [s for s in ALL_SYMBOLS if s in bar_store.list_symbols(args.store)]
+    if not symbols:
+        print(f"❌ Aucun symbole dans {args.store}/ (python bar_store.py import ...)")
+        return
+    config = TEST_LEVELS[args.level]
+    combos = list(zip(*grid_engine.grid_axes(config['ATR_MULTIPLIERS'], config['RR_VALUES'], config['VOL_MULTIPLIERS'])))
+    units = [(s, *c) for s in symbols for c in combos]
+    print(f"🧮 {len(units):,} combos ({len(symbols)} symboles x {len(combos)}) sur {args.jobs} processus")
+
+    t0 = time.perf_counter()
+    state = start_pool(symbols, args.jobs, args.store)
+    try:
+        busy = sum(dt for _, _, dt in local_rows(state, units))
+    finally:
+        stop_pool(state)
+    wall = time.perf_counter() - t0
+    print(f"⚡ {len(units):,} combos en {wall:.1f}s ({len(units) / wall:.0f} combos/s), "
+          f"calcul cumulé {busy:.1f}s → parallélisme effectif x{busy / wall:.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,145 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+ta.pivothigh / ta.pivotlow et supports / résistances reportés (lastSupport, lastResistance de
+bollinger-strat.jl) en O(n), à partir de min/max glissants.
+Usage (benchmark contre un scan de fenêtre par barre): python pivots.py [--bars 500000] [--len 10]
+"""
+
+import argparse
+import math
+import time
+
+import numpy as np
+
+
+def rolling_max(x, window: int) -> np.ndarray:
+    """Max des `window` dernières valeurs (NaN avant la première fenêtre complète ; un NaN dans la
+    fenêtre donne NaN). Van Herk / Gil-Werman : maxima préfixes et suffixes par blocs de `window`,
+    chaque fenêtre étant couverte par la fin d'un bloc et le début du suivant. C'est le même O(n)
+    qu'une deque monotone, mais sans boucle Python par barre."""
+    x = np.asarray(x, dtype=np.float64)
+    n = len(x)
+    out = np.full(n, np.nan)
+    if window < 1 or n < window:
+        return out
+    n_blocks = -(-n // window)
+    padded = np.full(n_blocks * window, -np.inf)
+    padded[:n] = x
+    blocks = padded.reshape(n_blocks, window)
+    prefix = np.maximum.accumulate(blocks, axis=1).ravel()
+    suffix = np.maximum.accumulate(blocks[:, ::-1], axis=1)[:, ::-1].ravel()
+    out[window - 1:] = np.maximum(suffix[:n - window + 1], prefix[window - 1:n])
+    return out
+
+
+def rolling_min(x, window: int) -> np.ndarray:
+    return -rolling_max(-np.asarray(x, dtype=np.float64), window)
+
+
+def _shift(x: np.ndarray, k: int) -> np.ndarray:
+    """x[i - k] (k > 0 : valeur passée, k < 0 : valeur future), NaN hors du tableau."""
+    out = np.full(len(x), np.nan)
+    if abs(k) >= len(x):  # série plus courte que le décalage (nouveau symbole, tranche filtrée)
+        return out
+    if k >= 0:
+        out[k:] = x[:len(x) - k]
+    else:
+        out[:k] = x[-k:]
+    return out
+
+
+def pivot_high(high, left: int, right: int) -> np.ndarray:
+    """ta.pivothigh(high, left, right) : sur la barre i, high[i - right] s'il dépasse strictement les
+    `left` barres précédentes et égale au moins les `right` suivantes (sur un plateau, la première
+    barre est le pivot), sinon NaN. Le pivot n'est connu que `right` barres plus tard."""
+    high = np.asarray(high, dtype=np.float64)
+    left_roll = rolling_max(high, left) if left > 0 else None
+    right_roll = left_roll if right == left else (rolling_max(high, right) if right > 0 else None)
+    left_max = _shift(left_roll, 1) if left > 0 else np.full(len(high), -np.inf)
+    right_max = _shift(right_roll, -right) if right > 0 else np.full(len(high), -np.inf)
+    with np.errstate(invalid="ignore"):
+        is_pivot = (high > left_max) & (high >= right_max)  # NaN dans une fenêtre : pas de pivot
+    centre = np.where(is_pivot, high, np.nan)
+    return _shift(centre, right)
+
+
+def pivot_low(low, left: int, right: int) -> np.ndarray:
+    """ta.pivotlow : symétrique de pivot_high sur -low."""
+    return -pivot_high(-np.asarray(low, dtype=np.float64), left, right)
+
+
+def forward_fill(values: np.ndarray) -> np.ndarray:
+    """Dernière valeur non NaN à chaque barre (var float last := ... en Pine)."""
+    idx = np.where(~np.isnan(values), np.arange(len(values)), -1)
+    idx = np.maximum.accumulate(idx) if len(idx) else idx
+    out = np.full(len(values), np.nan)
+    ok = idx >= 0
+    out[ok] = values[idx[ok]]
+    return out
+
+
+def support_resistance(high, low, pivot_len: int):
+    """(lastSupport, lastResistance) de bollinger-strat.jl : derniers pivots confirmés, avec le retard
+    de pivot_len barres de ta.pivotlow(low, pivotLen, pivotLen) / ta.pivothigh(high, pivotLen, pivotLen)."""
+    return (forward_fill(pivot_low(low, pivot_len, pivot_len)),
+            forward_fill(pivot_high(high, pivot_len, pivot_len)))
+
+
+# --- Benchmark : scan de fenêtre par barre, O(n · pivotLen) ---
+
+def _naive_pivot_high(high, left: int, right: int) -> np.ndarray:
+    out = np.full(len(high), np.nan)
+    for i in range(left + right, len(high)):
+        c = i - right
+        v = high[c]
+        if all(v > high[j] for j in range(c - left, c)) and all(v >= high[j] for j in range(c + 1, i + 1)):
+            out[i] = v
+    return out
+
+
+def _windowed_pivot_high(high, left: int, right: int) -> np.ndarray:
+    # Vectorisé mais O(n · pivotLen) : matérialise chaque fenêtre
+    win = np.lib.stride_tricks.sliding_window_view(high, left + right + 1)
+    centre = win[:, left]
+    ok = (centre > win[:, :left].max(axis=1)) & (centre >= win[:, left + 1:].max(axis=1))
+    out = np.full(len(high), np.nan)
+    out[left + right:] = np.where(ok, centre, np.nan)
+    return out
+
+
+def _best_time(fn, repeat: int) -> float:
+    best = math.inf
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - t0)
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark des pivots O(n) contre un scan de fenêtre")
+    parser.add_argument('--bars', type=int, default=500_000, help='Nombre de barres synthétiques')
+    parser.add_argument('--len', type=int, nargs='+', default=[5, 10, 20, 50], help='Valeurs de pivotLen')
+    parser.add_argument('--repeat', type=int, default=3, help='Mesures par variante (meilleur temps retenu)')
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    # Prix arrondis à 5 décimales : des plateaux (égalités) apparaissent comme sur les données réelles
+    high = np.round(1.1 + np.cumsum(rng.normal(0.0, 0.0005, args.bars)), 5)
+    naive_bars = min(args.bars, 20_000)
+    print(f"⏱️ {args.bars:,} barres (boucle naïve sur {naive_bars:,}), meilleur de {args.repeat}")
+    print(f"   {'pivotLen':>8s} {'O(n)':>9s} {'fenêtres':>9s} {'gain':>6s} {'boucle/barre':>13s}  identique")
+    for length in args.len:
+        fast = _best_time(lambda: pivot_high(high, length, length), args.repeat)
+        windowed = _best_time(lambda: _windowed_pivot_high(high, length, length), args.repeat)
+        loop = _best_time(lambda: _naive_pivot_high(high[:naive_bars], length, length), 1) * args.bars / naive_bars
+        same = np.array_equal(pivot_high(high, length, length), _windowed_pivot_high(high, length, length), equal_nan=True) \
+            and np.array_equal(pivot_high(high[:naive_bars], length, length),
+                               _naive_pivot_high(high[:naive_bars], length, length), equal_nan=True)
+        print(f"   {length:8d} {fast * 1000:7.1f}ms {windowed * 1000:7.1f}ms {windowed / fast:5.1f}x "
+              f"{loop:11.1f}s   {'✅' if same else '❌'}")
+
+
+if __name__ == "__main__":
+    main()
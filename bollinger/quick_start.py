@@ -8,6 +8,8 @@ Usage: python quick_start.py
 import os
 import sys
 
+import time_estimator
+
 TEST_LEVELS = {
     'COARSE': {
         'combos': 75,
@@ -42,8 +44,12 @@ def choose_level():
     print("📊 CHOISISSEZ VOTRE NIVEAU DE TEST:")
     print("")
     
+    fits = time_estimator.fit_timings()
     for i, (level, info) in enumerate(TEST_LEVELS.items(), 1):
-        time_str = f"{info['time_min']}min" if info['time_min'] < 60 else f"{info['time_min']//60}h"
+        # Durée mesurée pour un symbole (time_estimator), time_min sans mesure
+        est = time_estimator.estimate_run(info['combos'], SYMBOL_GROUPS['majors'][:1], fits=fits)
+        minutes = est['p50_seconds'] / 60 if est['samples'] else info['time_min']
+        time_str = f"{minutes:.0f}min" if minutes < 60 else f"{minutes/60:.0f}h"
         print(f"{i}. {level:>6} - {info['combos']:>4} combos (~{time_str:>4}) - {info['description']}")
     
     print("")
@@ -116,12 +122,14 @@ def choose_custom_symbols():
             sys.exit(0)
 
 def calculate_time(level, symbols):
-    """Calcule le temps estimé."""
+    """Calcule le temps estimé (p50, p90) à partir des durées mesurées, combos déjà en cache déduits."""
+    from test_calculator import ALL_SYMBOLS
+
     combos = TEST_LEVELS[level]['combos']
-    symbol_count = len(symbols) if symbols else 25
-    total_tests = combos * symbol_count
-    minutes = total_tests * 4 / 60  # 4 sec par test
-    return minutes, total_tests
+    symbols = symbols or ALL_SYMBOLS
+    est = time_estimator.estimate_level(level, symbols)
+    total_tests = combos * len(symbols)
+    return est['p50_seconds'] / 60, est['p90_seconds'] / 60, total_tests
 
 def generate_command(level, symbols, skip_complete):
     """Génère la commande à exécuter."""
@@ -154,7 +162,7 @@ def main():
         skip_complete = False
     
     # Calcul des estimations
-    minutes, total_tests = calculate_time(level, symbols)
+    minutes, p90_minutes, total_tests = calculate_time(level, symbols)
     symbol_count = len(symbols) if symbols else 25
     
     # Résumé
@@ -166,9 +174,9 @@ def main():
     print(f"🔢 Tests totaux: {total_tests:,}")
     
     if minutes < 60:
-        print(f"⏱️ Temps estimé: ~{minutes:.0f} minutes")
+        print(f"⏱️ Temps estimé: ~{minutes:.0f} minutes (p90 ~{p90_minutes:.0f} minutes)")
     else:
-        print(f"⏱️ Temps estimé: ~{minutes/60:.1f} heures")
+        print(f"⏱️ Temps estimé: ~{minutes/60:.1f} heures (p90 ~{p90_minutes/60:.1f} heures)")
     
     if skip_complete:
         print(f"🔄 Reprise activée (ignore les tests déjà faits)")
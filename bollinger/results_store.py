@@ -0,0 +1,191 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Stockage SQLite des résultats (une ligne par combo, insertion transactionnelle).
+Usage:
+    python results_store.py import --level FINE   # reprend un classeur existant
+    python results_store.py export --level FINE   # régénère le classeur Excel
+"""
+
+import argparse
+import os
+import sqlite3
+
+import numpy as np
+import pandas as pd
+
+KEY_COLS = ["Symbol", "ATR Multiplier", "RR", "Vol Multiplier"]
+METRIC_COLS = ["Net Profit", "Net Profit Clean", "Win Rate", "drawdown", "Total Trades", "Profit Factor"]
+EXPECTED_COLS = KEY_COLS + METRIC_COLS
+# Colonnes qui rendent une ligne "complète" (même préférence que la dédup de l'autosave Excel)
+COMPLETE_COLS = ["drawdown", "Total Trades", "Profit Factor"]
+
+
+def _results_stem(level: str, engine: str = "browser") -> str:
+    # Moteur local : fichiers séparés, pour ne jamais mélanger les lignes simulées et celles
+    # lues dans TradingView (ni les reprendre comme "déjà testées" d'un moteur à l'autre)
+    suffix = "" if engine == "browser" else f"_{engine}"
+    return f"tradingview_backtest_results_{level.lower()}{suffix}"
+
+
+def db_path_for_level(level: str, engine: str = "browser") -> str:
+    return f"{_results_stem(level, engine)}.sqlite"
+
+
+def xlsx_path_for_level(level: str, engine: str = "browser") -> str:
+    return f"{_results_stem(level, engine)}.xlsx"
+
+
+def _q(col: str) -> str:
+    return '"' + col.replace('"', '""') + '"'
+
+
+_COLUMNS_SQL = ", ".join(_q(c) for c in EXPECTED_COLS + ["complete"])
+_UPSERT_SQL = (
+    f"INSERT INTO results ({_COLUMNS_SQL}) VALUES ({', '.join('?' * (len(EXPECTED_COLS) + 1))}) "
+    f"ON CONFLICT ({', '.join(_q(c) for c in KEY_COLS)}) DO UPDATE SET "
+    + ", ".join(f"{_q(c)} = excluded.{_q(c)}" for c in METRIC_COLS + ["complete"])
+    + " WHERE excluded.complete >= results.complete"
+)
+
+
+def open_store(path: str) -> sqlite3.Connection:
+    conn = sqlite3.connect(path, check_same_thread=False)
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA synchronous=NORMAL")
+    conn.execute(
+        "CREATE TABLE IF NOT EXISTS results ("
+        '"Symbol" TEXT NOT NULL, "ATR Multiplier" REAL NOT NULL, "RR" REAL NOT NULL, "Vol Multiplier" REAL NOT NULL, '
+        '"Net Profit" TEXT, "Net Profit Clean" REAL, "Win Rate" REAL, "drawdown" REAL, '
+        '"Total Trades" REAL, "Profit Factor" REAL, complete INTEGER NOT NULL DEFAULT 0)'
+    )
+    conn.execute(
+        f"CREATE UNIQUE INDEX IF NOT EXISTS results_key ON results ({', '.join(_q(c) for c in KEY_COLS)})"
+    )
+    conn.commit()
+    return conn
+
+
+def _sql_value(v):
+    if v is None or v is pd.NA or (isinstance(v, float) and v != v):
+        return None
+    if isinstance(v, np.generic):
+        return v.item()
+    return v
+
+
+def upsert_df(conn: sqlite3.Connection, df: pd.DataFrame) -> int:
+    """Insère/maj les lignes (clé Symbol, ATR, RR, Vol) en une transaction. Une ligne incomplète
+    (ex: 'Error') n'écrase jamais une ligne plus complète."""
+    if df is None or df.empty:
+        return 0
+    df = df.reindex(columns=EXPECTED_COLS)
+    complete = df[COMPLETE_COLS].notna().sum(axis=1).to_numpy()
+    df = df.astype(object).where(df.notna(), None)
+    df["Net Profit"] = df["Net Profit"].map(lambda v: None if v is None else str(v))
+    rows = [
+        tuple(_sql_value(v) for v in values) + (int(c),)
+        for values, c in zip(df.itertuples(index=False, name=None), complete)
+    ]
+    with conn:
+        conn.executemany(_UPSERT_SQL, rows)
+    return len(rows)
+
+
+def load_df(conn: sqlite3.Connection, symbol=None) -> pd.DataFrame:
+    sql = f"SELECT {', '.join(_q(c) for c in EXPECTED_COLS)} FROM results"
+    params = ()
+    if symbol is not None:
+        sql += ' WHERE "Symbol" = ?'
+        params = (symbol,)
+    sql += ' ORDER BY "Symbol", "ATR Multiplier", "RR", "Vol Multiplier"'
+    return pd.read_sql_query(sql, conn, params=params)
+
+
+def count_rows(conn: sqlite3.Connection) -> int:
+    return conn.execute("SELECT COUNT(*) FROM results").fetchone()[0]
+
+
+def best_per_symbol_df(df: pd.DataFrame) -> pd.DataFrame:
+    """Feuille Best_Per_Symbol (même disposition que l'autosave du runner)."""
+    ok = df.dropna(subset=["Net Profit Clean"])
+    if ok.empty:
+        return pd.DataFrame()
+    best = ok.loc[ok.groupby("Symbol", sort=False)["Net Profit Clean"].idxmax()]
+    return pd.DataFrame({
+        "Symbol": best["Symbol"].values,
+        "Best ATR Multiplier": best["ATR Multiplier"].values,
+        "Best RR": best["RR"].values,
+        "Best Vol Multiplier": best["Vol Multiplier"].values,
+        "Best Net Profit": best["Net Profit"].values,
+        "Best Win Rate": best["Win Rate"].values,
+        "Best Drawdown": best["drawdown"].values,
+        "Best Total Trades": best["Total Trades"].values,
+        "Best Profit Factor": best["Profit Factor"].values,
+        "Best Net Profit Clean": best["Net Profit Clean"].values,
+    })
+
+
+def export_xlsx(conn: sqlite3.Connection, xlsx_path: str) -> int:
+    """Écrit {SYMBOL}_Results, Best_Per_Symbol et All_Results en une seule passe.
+    Les autres feuilles (analyses) du classeur existant sont conservées."""
+    df = load_df(conn)
+    mode = 'a' if os.path.exists(xlsx_path) else 'w'
+    kwargs = {"if_sheet_exists": "replace"} if mode == 'a' else {}
+    with pd.ExcelWriter(xlsx_path, engine='openpyxl', mode=mode, **kwargs) as writer:
+        for symbol, df_symbol in df.groupby("Symbol", sort=False):
+            df_symbol.to_excel(writer, index=False, sheet_name=f"{symbol}_Results")
+        best = best_per_symbol_df(df)
+        if not best.empty:
+            best.to_excel(writer, index=False, sheet_name="Best_Per_Symbol")
+        df.to_excel(writer, index=False, sheet_name="All_Results")
+    return len(df)
+
+
+def import_xlsx(conn: sqlite3.Connection, xlsx_path: str) -> int:
+    """Reprend les feuilles *_Results d'un classeur produit par l'autosave Excel."""
+    sheets = pd.read_excel(xlsx_path, sheet_name=None, engine="openpyxl")
+    total = 0
+    for name, df in sheets.items():
+        if not name.endswith("_Results") or name == "All_Results" or df.empty:
+            continue
+        df = df.copy()
+        df["Symbol"] = name[: -len("_Results")]
+        for col in EXPECTED_COLS[1:]:
+            if col not in df.columns:
+                df[col] = np.nan
+            if col != "Net Profit":
+                df[col] = pd.to_numeric(df[col], errors="coerce")
+        total += upsert_df(conn, df.dropna(subset=KEY_COLS[1:]))
+    return total
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Stockage SQLite des résultats de backtest")
+    parser.add_argument('command', choices=['import', 'export', 'info'])
+    parser.add_argument('--level', choices=['COARSE', 'FINE', 'FULL', 'ADAPTIVE'], default='FINE')
+    parser.add_argument('--db', help='Base SQLite (défaut: tradingview_backtest_results_{level}.sqlite)')
+    parser.add_argument('--xlsx', help='Classeur Excel (défaut: tradingview_backtest_results_{level}.xlsx)')
+    parser.add_argument('--engine', choices=['browser', 'local'], default='browser',
+                        help='Résultats du runner --engine local : fichiers suffixés _local')
+    args = parser.parse_args()
+
+    db_path = args.db or db_path_for_level(args.level, args.engine)
+    xlsx_path = args.xlsx or xlsx_path_for_level(args.level, args.engine)
+    conn = open_store(db_path)
+    if args.command == 'import':
+        if not os.path.exists(xlsx_path):
+            print(f"❌ Erreur: Le fichier {xlsx_path} n'existe pas.")
+            return
+        n = import_xlsx(conn, xlsx_path)
+        print(f"✅ {n:,} lignes importées de {xlsx_path} dans {db_path}")
+    elif args.command == 'export':
+        n = export_xlsx(conn, xlsx_path)
+        print(f"✅ {n:,} lignes exportées de {db_path} vers {xlsx_path}")
+    else:
+        print(f"📁 {db_path}: {count_rows(conn):,} lignes")
+    conn.close()
+
+
+if __name__ == "__main__":
+    main()
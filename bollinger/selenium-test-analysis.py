@@ -5,6 +5,10 @@ from openpyxl.styles import PatternFill, Font, Alignment
 from openpyxl.formatting.rule import ColorScaleRule
 import argparse
 import sys
+import warnings
+
+import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
 
 # Noms des feuilles d'analyse (constants)
 SHEET_ALL = "All_Results"
@@ -13,6 +17,11 @@ SHEET_BEST_GLOBAL = "Analysis_Best_Global"
 SHEET_COMBO_COUNTS = "Analysis_Combo_Counts"
 SHEET_ALL_SCORED = "Analysis_All_Scored"
 SHEET_GLOBAL_VS_CUSTOM = "Analysis_Global_vs_Custom"
+SHEET_ROBUST_PER_SYMBOL = "Analysis_Robust_Per_Symbol"
+
+# Clé d'un résultat : (Symbol, ATR, RR, Vol)
+KEY_COLS = ["Symbol", "ATR Multiplier", "RR", "Vol Multiplier"]
+PARAM_COLS = KEY_COLS[1:]
 
 # === CONFIG: Hard filters & scoring weights (tweak here) ===
 MIN_TRADES      = 30        # discard rows with fewer trades
@@ -27,14 +36,19 @@ SCORE_WEIGHTS = {
     "dd": 1.0        # penalty weight for drawdown (higher drawdown reduces score)
 }
 
+# Robustesse : voisinage de ±ROBUST_RADIUS pas de grille sur ATR, RR et Vol (cube 3x3x3 par défaut)
+ROBUST_RADIUS = 1
+
 def load_all_results(path: str, sheet_all: str) -> pd.DataFrame:
-    wb = load_workbook(path)
-    if sheet_all in wb.sheetnames:
+    wb = load_workbook(path, read_only=True)  # noms de feuilles seulement
+    sheetnames = wb.sheetnames
+    wb.close()
+    if sheet_all in sheetnames:
         return pd.read_excel(path, sheet_name=sheet_all, engine="openpyxl")
 
     # Fallback: merge all *_Results sheets
     dfs = []
-    for s in wb.sheetnames:
+    for s in sheetnames:
         if s.endswith("_Results"):
             df_s = pd.read_excel(path, sheet_name=s, engine="openpyxl")
             df_s["Symbol"] = s.replace("_Results", "")
@@ -103,6 +117,73 @@ def best_per_symbol(df_scored: pd.DataFrame) -> pd.DataFrame:
     best_idx = ok.groupby("Symbol")["Score"].idxmax()
     return ok.loc[best_idx].sort_values("Score", ascending=False).reset_index(drop=True)
 
+def grid_axes_for_level(level: str):
+    """Axes ATR / RR / Vol du niveau (ADAPTIVE est sur la grille FULL)."""
+    from test_calculator import TEST_LEVELS
+    config = TEST_LEVELS['FULL' if level == 'ADAPTIVE' else level]
+    return config['ATR_MULTIPLIERS'], config['RR_VALUES'], config['VOL_MULTIPLIERS']
+
+
+def _axis_positions(values: pd.Series, axis) -> tuple:
+    """Position de chaque valeur sur l'axe, et masque des valeurs qui tombent sur la grille."""
+    axis = np.asarray(axis, dtype=float)
+    values = values.to_numpy(dtype=float)
+    pos = np.clip(np.searchsorted(axis, values - 1e-9), 0, len(axis) - 1)
+    return pos, np.abs(axis[pos] - values) < 1e-6
+
+
+def neighborhood_scores(grid: np.ndarray, radius: int = ROBUST_RADIUS) -> tuple:
+    """grid: (symboles, ATR, RR, Vol), NaN pour les combos absents.
+    Renvoie moyenne, minimum et nombre de combos présents sur le voisinage de chaque cellule."""
+    width = 2 * radius + 1
+    padded = np.pad(grid, [(0, 0)] + [(radius, radius)] * 3, constant_values=np.nan)
+    windows = sliding_window_view(padded, (width,) * 3, axis=(1, 2, 3))
+    axes = (-3, -2, -1)
+    with warnings.catch_warnings():
+        warnings.simplefilter("ignore", category=RuntimeWarning)  # voisinages vides
+        smooth = np.nanmean(windows, axis=axes)
+        worst = np.nanmin(windows, axis=axes)
+    count = np.sum(~np.isnan(windows), axis=axes)
+    return smooth, worst, count
+
+
+def add_robustness(df_scored: pd.DataFrame, df_grid: pd.DataFrame, axes) -> pd.DataFrame:
+    """Ajoute Score_Smooth (moyenne du voisinage), Score_Worst (pire voisin) et Neighbors.
+    df_grid fournit le Score de tous les combos testés (filtres durs non appliqués), placé
+    sur une grille dense par symbole ; un voisin éliminé par les filtres compte donc aussi."""
+    out = df_scored.copy()
+    out["Score_Smooth"] = np.nan
+    out["Score_Worst"] = np.nan
+    out["Neighbors"] = 0
+    if out.empty or df_grid.empty:
+        return out
+    symbols = pd.Index(pd.unique(df_grid["Symbol"]))
+    grid = np.full((len(symbols),) + tuple(len(a) for a in axes), np.nan)
+    pos = [_axis_positions(df_grid[col], axis) for col, axis in zip(PARAM_COLS, axes)]
+    on_grid = pos[0][1] & pos[1][1] & pos[2][1]
+    grid[symbols.get_indexer(df_grid["Symbol"])[on_grid], pos[0][0][on_grid], pos[1][0][on_grid], pos[2][0][on_grid]] = \
+        df_grid["Score"].to_numpy(dtype=float)[on_grid]
+    smooth, worst, count = neighborhood_scores(grid)
+
+    sym = symbols.get_indexer(out["Symbol"])
+    pos = [_axis_positions(out[col], axis) for col, axis in zip(PARAM_COLS, axes)]
+    ok = (sym >= 0) & pos[0][1] & pos[1][1] & pos[2][1]
+    cell = (sym[ok], pos[0][0][ok], pos[1][0][ok], pos[2][0][ok])
+    out.loc[ok, "Score_Smooth"] = smooth[cell]
+    out.loc[ok, "Score_Worst"] = worst[cell]
+    out.loc[ok, "Neighbors"] = count[cell]
+    return out
+
+
+def robust_per_symbol(df_scored: pd.DataFrame) -> pd.DataFrame:
+    """Meilleur combo par symbole selon Score_Smooth (plateau plutôt que pic isolé)."""
+    ok = df_scored.dropna(subset=["Symbol", "Score_Smooth"])
+    if ok.empty:
+        return pd.DataFrame(columns=df_scored.columns)
+    ok = ok.sort_values(["Score_Smooth", "Score"], ascending=False)
+    return ok.drop_duplicates("Symbol").reset_index(drop=True)
+
+
 def best_global_avg(df_scored: pd.DataFrame) -> pd.DataFrame:
     # Rank parameter sets by average Score across symbols
     # Keep only rows with parameters present
@@ -139,20 +220,112 @@ def combo_counts_among_winners(df_best_per_symbol: pd.DataFrame) -> pd.DataFrame
     counts = counts.sort_values(["NumSymbols", "Count"], ascending=[False, False]).reset_index(drop=True)
     return counts
 
+# === Styles communs (export en place et export streaming) ===
+HEADER_FILL = PatternFill(start_color="FFEEEEEE", end_color="FFEEEEEE", fill_type="solid")
+HEADER_FONT = Font(bold=True)
+HEADER_ALIGNMENT = Alignment(horizontal="center")
+TOP5_FILL = PatternFill(start_color="FFDFF0D8", end_color="FFDFF0D8", fill_type="solid")
+# Colonne -> True si une valeur haute est bonne (échelle rouge -> vert), False sinon
+SCALE_COLUMNS = {"Score": True, "Score_Smooth": True, "Score_Worst": True,
+                 "Net Profit Clean": True, "Win Rate": True, "Profit Factor": True, "drawdown": False}
+MAX_COLUMN_WIDTH = 50
+STREAM_CHUNK_ROWS = 10_000
+
+
+def color_scale_rule(good_high: bool = True) -> ColorScaleRule:
+    low, high = ("FFF4CCCC", "FFDFF0D8") if good_high else ("FFDFF0D8", "FFF4CCCC")  # rouge / vert
+    return ColorScaleRule(
+        start_type="min", start_color=low,
+        mid_type="percentile", mid_value=50, mid_color="FFFFFFCC",  # jaune
+        end_type="max", end_color=high
+    )
+
+
+def column_widths(df: pd.DataFrame) -> list:
+    """Largeur de chaque colonne (texte le plus long, en-tête compris), calculée sur les colonnes pandas."""
+    widths = []
+    for col in df.columns:
+        values = df[col]
+        lengths = values.astype(str).str.len().where(values.notna(), 0)
+        max_len = max(len(str(col)), int(lengths.max()) if len(lengths) else 0)
+        widths.append(min(max_len + 2, MAX_COLUMN_WIDTH))
+    return widths
+
+
+def _stream_sheet(wb, name: str, df: pd.DataFrame, highlight_top5: bool = False, add_scales: bool = False):
+    from openpyxl.cell import WriteOnlyCell
+    from openpyxl.utils import get_column_letter
+
+    ws = wb.create_sheet(name)
+    # Largeurs et échelles de couleur déclarées avant la première ligne
+    for c, width in enumerate(column_widths(df), start=1):
+        ws.column_dimensions[get_column_letter(c)].width = width
+    if add_scales and len(df):
+        for col_name, good_high in SCALE_COLUMNS.items():
+            if col_name in df.columns:
+                letter = get_column_letter(df.columns.get_loc(col_name) + 1)
+                ws.conditional_formatting.add(f"{letter}2:{letter}{len(df) + 1}", color_scale_rule(good_high))
+
+    header = []
+    for col in df.columns:
+        cell = WriteOnlyCell(ws, value=str(col))
+        cell.fill, cell.font, cell.alignment = HEADER_FILL, HEADER_FONT, HEADER_ALIGNMENT
+        header.append(cell)
+    ws.append(header)
+
+    n_top = min(5, len(df)) if highlight_top5 else 0
+    for start in range(0, len(df), STREAM_CHUNK_ROWS):
+        chunk = df.iloc[start:start + STREAM_CHUNK_ROWS]
+        chunk = chunk.astype(object).where(chunk.notna(), None)
+        for i, values in enumerate(chunk.itertuples(index=False, name=None), start=start):
+            if i < n_top:
+                row = []
+                for v in values:
+                    cell = WriteOnlyCell(ws, value=v)
+                    cell.fill = TOP5_FILL
+                    row.append(cell)
+                ws.append(row)
+            else:
+                ws.append(values)
+
+
+def write_analysis_streaming(path: str,
+                             all_scored: pd.DataFrame,
+                             best_per_sym: pd.DataFrame,
+                             best_global: pd.DataFrame,
+                             combo_counts: pd.DataFrame,
+                             global_vs_custom: pd.DataFrame,
+                             robust_per_sym: pd.DataFrame,
+                             sheet_names: dict):
+    """Écrit l'analyse dans un classeur dédié en une seule passe (openpyxl write-only, styles posés à l'écriture)."""
+    from openpyxl import Workbook
+
+    wb = Workbook(write_only=True)
+    _stream_sheet(wb, sheet_names['all_scored'], all_scored, add_scales=True)
+    _stream_sheet(wb, sheet_names['best_per_symbol'], best_per_sym, add_scales=True)
+    _stream_sheet(wb, sheet_names['best_global'], best_global, highlight_top5=True, add_scales=True)
+    _stream_sheet(wb, sheet_names['combo_counts'], combo_counts)
+    _stream_sheet(wb, sheet_names['global_vs_custom'], global_vs_custom, add_scales=True)
+    _stream_sheet(wb, sheet_names['robust_per_symbol'], robust_per_sym, add_scales=True)
+    wb.save(path)
+
+
 def write_analysis(path: str,
                    all_scored: pd.DataFrame,
                    best_per_sym: pd.DataFrame,
                    best_global: pd.DataFrame,
                    combo_counts: pd.DataFrame,
                    global_vs_custom: pd.DataFrame,
+                   robust_per_sym: pd.DataFrame,
                    sheet_names: dict):
-    """Écrit l'analyse dans le fichier Excel avec styling."""
+    """Écrit l'analyse dans le fichier de résultats avec styling (relit tout le classeur : --in-place)."""
     with pd.ExcelWriter(path, engine="openpyxl", mode="a", if_sheet_exists="replace") as writer:
         all_scored.to_excel(writer, index=False, sheet_name=sheet_names['all_scored'])
         best_per_sym.to_excel(writer, index=False, sheet_name=sheet_names['best_per_symbol'])
         best_global.to_excel(writer, index=False, sheet_name=sheet_names['best_global'])
         combo_counts.to_excel(writer, index=False, sheet_name=sheet_names['combo_counts'])
         global_vs_custom.to_excel(writer, index=False, sheet_name=sheet_names['global_vs_custom'])
+        robust_per_sym.to_excel(writer, index=False, sheet_name=sheet_names['robust_per_symbol'])
 
     # Styling
     wb = load_workbook(path)
@@ -163,20 +336,17 @@ def write_analysis(path: str,
         ws = wb[ws_name]
 
         # Header style
-        header_fill = PatternFill(start_color="FFEEEEEE", end_color="FFEEEEEE", fill_type="solid")
-        header_font = Font(bold=True)
         for cell in ws[1]:
-            cell.fill = header_fill
-            cell.font = header_font
-            cell.alignment = Alignment(horizontal="center")
+            cell.fill = HEADER_FILL
+            cell.font = HEADER_FONT
+            cell.alignment = HEADER_ALIGNMENT
 
         # Highlight top 5
         if highlight_top5:
-            green_fill = PatternFill(start_color="FFDFF0D8", end_color="FFDFF0D8", fill_type="solid")
             top_n = min(5, ws.max_row - 1)
             for r in range(2, 2 + top_n):
                 for c in range(1, ws.max_column + 1):
-                    ws.cell(row=r, column=c).fill = green_fill
+                    ws.cell(row=r, column=c).fill = TOP5_FILL
 
         # Conditional color scales
         if add_scales:
@@ -189,28 +359,10 @@ def write_analysis(path: str,
                     return
                 col = headers[col_name]
                 rng = f"{get_column_letter(col)}{start_row}:{get_column_letter(col)}{end_row}"
-                if good_high:
-                    ws.conditional_formatting.add(
-                        rng,
-                        ColorScaleRule(
-                            start_type="min", start_color="FFF4CCCC",   # red
-                            mid_type="percentile", mid_value=50, mid_color="FFFFFFCC",  # yellow
-                            end_type="max", end_color="FFDFF0D8"        # green
-                        )
-                    )
-                else:
-                    ws.conditional_formatting.add(
-                        rng,
-                        ColorScaleRule(
-                            start_type="min", start_color="FFDFF0D8",   # green (low is good)
-                            mid_type="percentile", mid_value=50, mid_color="FFFFFFCC",
-                            end_type="max", end_color="FFF4CCCC"        # red (high is bad)
-                        )
-                    )
-
-            for col in ["Score", "Net Profit Clean", "Win Rate", "Profit Factor"]:
-                add_scale(col, good_high=True)
-            add_scale("drawdown", good_high=False)
+                ws.conditional_formatting.add(rng, color_scale_rule(good_high))
+
+            for col, good_high in SCALE_COLUMNS.items():
+                add_scale(col, good_high=good_high)
 
         # Autosize columns
         for col_cells in ws.columns:
@@ -220,13 +372,14 @@ def write_analysis(path: str,
                 v = "" if cell.value is None else str(cell.value)
                 if len(v) > max_len:
                     max_len = len(v)
-            ws.column_dimensions[col_letter].width = min(max_len + 2, 50)
+            ws.column_dimensions[col_letter].width = min(max_len + 2, MAX_COLUMN_WIDTH)
 
     style_sheet(sheet_names['best_global'], highlight_top5=True, add_scales=True)
     style_sheet(sheet_names['best_per_symbol'], highlight_top5=False, add_scales=True)
     style_sheet(sheet_names['all_scored'], highlight_top5=False, add_scales=True)
     style_sheet(sheet_names['combo_counts'], highlight_top5=False, add_scales=False)
     style_sheet(sheet_names['global_vs_custom'], highlight_top5=False, add_scales=True)
+    style_sheet(sheet_names['robust_per_symbol'], highlight_top5=False, add_scales=True)
 
     wb.save(path)
 
@@ -237,20 +390,11 @@ def compare_global_vs_custom(df_scored: pd.DataFrame, best_per_sym: pd.DataFrame
         return pd.DataFrame()
     
     # Au lieu du meilleur absolu, trouvons le paramètre testé sur le plus de symboles
-    param_coverage = []
-    for _, row in best_global.iterrows():
-        atr, rr, vol = row["ATR Multiplier"], row["RR"], row["Vol Multiplier"]
-        symbols_tested = len(df_scored[
-            (df_scored["ATR Multiplier"] == atr) &
-            (df_scored["RR"] == rr) &
-            (df_scored["Vol Multiplier"] == vol)
-        ]["Symbol"].unique())
-        param_coverage.append({
-            "ATR": atr, "RR": rr, "Vol": vol,
-            "Score": row["Score"], "Symbols_Tested": symbols_tested
-        })
-    
-    coverage_df = pd.DataFrame(param_coverage)
+    # (un seul groupby : nombre de symboles par jeu de paramètres)
+    symbols_tested = df_scored.groupby(PARAM_COLS)["Symbol"].nunique(dropna=False).rename("Symbols_Tested")
+    coverage_df = best_global[PARAM_COLS + ["Score"]].join(symbols_tested, on=PARAM_COLS)
+    coverage_df["Symbols_Tested"] = coverage_df["Symbols_Tested"].fillna(0).astype(int)
+    coverage_df = coverage_df.rename(columns={"ATR Multiplier": "ATR", "Vol Multiplier": "Vol"}).reset_index(drop=True)
     
     # Trouver la couverture maximale
     max_coverage = coverage_df["Symbols_Tested"].max()
@@ -267,88 +411,61 @@ def compare_global_vs_custom(df_scored: pd.DataFrame, best_per_sym: pd.DataFrame
     print(f"[INFO] Testés sur {best_coverage['Symbols_Tested']} symboles (score moyen: {best_coverage['Score']:.2f})")
     print(f"[INFO] Nombre de symboles à analyser: {len(best_per_sym)}")
     
-    # Pour chaque symbole, comparer le score avec paramètre global vs optimal
-    comparison = []
+    # Pour chaque symbole, comparer le score avec paramètre global vs optimal :
+    # lookup direct dans l'index (Symbol, ATR, RR, Vol)
+    custom = best_per_sym.reset_index(drop=True)
+    scores = df_scored.set_index(KEY_COLS)["Score"]
+    scores = scores[~scores.index.duplicated(keep="first")]
+    n = len(custom)
+    global_index = pd.MultiIndex.from_arrays(
+        [custom["Symbol"], [global_atr] * n, [global_rr] * n, [global_vol] * n], names=KEY_COLS)
+    found = global_index.isin(scores.index)
+    global_score = scores.reindex(global_index).to_numpy()
     
-    for _, row in best_per_sym.iterrows():
-        symbol = row["Symbol"]
-        custom_score = row["Score"]
-        
-        # Trouver le score avec les paramètres globaux pour ce symbole
-        global_mask = (
-            (df_scored["Symbol"] == symbol) &
-            (df_scored["ATR Multiplier"] == global_atr) &
-            (df_scored["RR"] == global_rr) &
-            (df_scored["Vol Multiplier"] == global_vol)
-        )
-        
-        global_result = df_scored[global_mask]
-        if not global_result.empty:
-            global_score = global_result.iloc[0]["Score"]
-            regret = custom_score - global_score  # Différence de performance
-            regret_pct = (regret / custom_score * 100) if custom_score != 0 else 0
-            
-            comparison.append({
-                "Symbol": symbol,
-                "Custom_Score": custom_score,
-                "Global_Score": global_score,
-                "Regret": regret,
-                "Regret_Pct": regret_pct,
-                "Custom_ATR": row.get("ATR Multiplier"),
-                "Custom_RR": row.get("RR"),
-                "Custom_Vol": row.get("Vol Multiplier"),
-                "Global_ATR": global_atr,
-                "Global_RR": global_rr,
-                "Global_Vol": global_vol
-            })
-        else:
-            # Prendre le meilleur paramètre disponible pour ce symbole qui ressemble le plus au global
-            symbol_data = df_scored[df_scored["Symbol"] == symbol]
-            if not symbol_data.empty:
-                # Calculer la "distance" euclidienne aux paramètres globaux
-                symbol_data = symbol_data.copy()
-                symbol_data["distance"] = (
-                    (symbol_data["ATR Multiplier"] - global_atr)**2 +
-                    (symbol_data["RR"] - global_rr)**2 +
-                    (symbol_data["Vol Multiplier"] - global_vol)**2
-                )**0.5
-                
-                closest_params = symbol_data.loc[symbol_data["distance"].idxmin()]
-                fallback_score = closest_params["Score"]
-                
-                regret = custom_score - fallback_score
-                regret_pct = (regret / custom_score * 100) if custom_score != 0 else 0
-                
-                comparison.append({
-                    "Symbol": f"{symbol} (fallback)",
-                    "Custom_Score": custom_score,
-                    "Global_Score": fallback_score,
-                    "Regret": regret,
-                    "Regret_Pct": regret_pct,
-                    "Custom_ATR": row.get("ATR Multiplier"),
-                    "Custom_RR": row.get("RR"),
-                    "Custom_Vol": row.get("Vol Multiplier"),
-                    "Global_ATR": f"{closest_params['ATR Multiplier']} (closest)",
-                    "Global_RR": f"{closest_params['RR']} (closest)",
-                    "Global_Vol": f"{closest_params['Vol Multiplier']} (closest)"
-                })
-            else:
-                # Si vraiment aucune donnée pour ce symbole
-                comparison.append({
-                    "Symbol": symbol,
-                    "Custom_Score": custom_score,
-                    "Global_Score": "N/A",
-                    "Regret": "N/A",
-                    "Regret_Pct": "N/A",
-                    "Custom_ATR": row.get("ATR Multiplier"),
-                    "Custom_RR": row.get("RR"),
-                    "Custom_Vol": row.get("Vol Multiplier"),
-                    "Global_ATR": global_atr,
-                    "Global_RR": global_rr,
-                    "Global_Vol": global_vol
-                })
+    # Sinon : le paramètre testé le plus proche (distance euclidienne) pour ce symbole
+    nearest = df_scored.iloc[:0].set_index("Symbol")
+    missing_symbols = custom.loc[~found, "Symbol"]
+    if not missing_symbols.empty:
+        symbol_data = df_scored[df_scored["Symbol"].isin(missing_symbols)]
+        distance = (
+            (symbol_data["ATR Multiplier"] - global_atr)**2 +
+            (symbol_data["RR"] - global_rr)**2 +
+            (symbol_data["Vol Multiplier"] - global_vol)**2
+        )**0.5
+        distance = distance.dropna()
+        closest_idx = distance.groupby(symbol_data.loc[distance.index, "Symbol"], sort=False).idxmin()
+        nearest = symbol_data.loc[closest_idx].set_index("Symbol")
+    fallback = ~found & custom["Symbol"].isin(nearest.index).to_numpy()
+    closest = nearest.reindex(custom["Symbol"]).reset_index(drop=True)
     
-    comparison_df = pd.DataFrame(comparison)
+    custom_score = custom["Score"]
+    other_score = pd.Series(np.where(found, global_score, closest["Score"].to_numpy(dtype=float)))
+    regret = custom_score - other_score  # Différence de performance
+    regret_pct = (regret / custom_score * 100).where(custom_score != 0, 0)
+    
+    def _global_param(col, value):
+        labels = closest[col].map(lambda v: f"{v} (closest)")
+        return pd.Series(value, index=custom.index, dtype=object).mask(fallback, labels)
+    
+    comparison_df = pd.DataFrame({
+        "Symbol": custom["Symbol"].mask(fallback, custom["Symbol"].astype(str) + " (fallback)"),
+        "Custom_Score": custom_score,
+        "Global_Score": other_score,
+        "Regret": regret,
+        "Regret_Pct": regret_pct,
+        "Custom_ATR": custom["ATR Multiplier"],
+        "Custom_RR": custom["RR"],
+        "Custom_Vol": custom["Vol Multiplier"],
+        "Global_ATR": _global_param("ATR Multiplier", global_atr),
+        "Global_RR": _global_param("RR", global_rr),
+        "Global_Vol": _global_param("Vol Multiplier", global_vol),
+    })
+    # Si vraiment aucune donnée pour ce symbole
+    no_data = ~(found | fallback)
+    if no_data.any():
+        na_cols = ["Global_Score", "Regret", "Regret_Pct"]
+        comparison_df[na_cols] = comparison_df[na_cols].astype(object)
+        comparison_df.loc[no_data, na_cols] = "N/A"
     
     if not comparison_df.empty:
         # Filtrer les lignes avec des données valides pour les statistiques
@@ -394,12 +511,18 @@ def compare_global_vs_custom(df_scored: pd.DataFrame, best_per_sym: pd.DataFrame
 def main():
     # Analyse des arguments de ligne de commande
     parser = argparse.ArgumentParser(description="Analyse des résultats de backtest TradingView")
-    parser.add_argument('--level', choices=['COARSE', 'FINE', 'FULL'], default='FINE',
-                       help='Niveau de test à analyser: COARSE, FINE, ou FULL (défaut: FINE)')
+    parser.add_argument('--level', choices=['COARSE', 'FINE', 'FULL', 'ADAPTIVE'], default='FINE',
+                       help='Niveau de test à analyser: COARSE, FINE, FULL ou ADAPTIVE (défaut: FINE)')
+    parser.add_argument('--output', help='Classeur d\'analyse (défaut: tradingview_backtest_results_{level}_analysis.xlsx)')
+    parser.add_argument('--in-place', action='store_true',
+                       help='Ancien comportement: ajouter les feuilles d\'analyse au classeur de résultats puis le styler')
+    parser.add_argument('--engine', choices=['browser', 'local'], default='browser',
+                       help='Résultats du runner --engine local (classeur suffixé _local)')
     args = parser.parse_args()
     
-    # Configuration du fichier selon le niveau
-    file_path = f"tradingview_backtest_results_{args.level.lower()}.xlsx"
+    # Configuration du fichier selon le niveau (et le moteur : _local pour --engine local)
+    stem = f"tradingview_backtest_results_{args.level.lower()}" + ("_local" if args.engine == 'local' else "")
+    file_path = f"{stem}.xlsx"
     
     # Configuration des noms de feuilles
     sheet_names = {
@@ -408,7 +531,8 @@ def main():
         'best_per_symbol': SHEET_BEST_PER_SYMBOL,
         'best_global': SHEET_BEST_GLOBAL,
         'combo_counts': SHEET_COMBO_COUNTS,
-        'global_vs_custom': SHEET_GLOBAL_VS_CUSTOM
+        'global_vs_custom': SHEET_GLOBAL_VS_CUSTOM,
+        'robust_per_symbol': SHEET_ROBUST_PER_SYMBOL
     }
     
     print(f"🔍 ANALYSE DU NIVEAU {args.level}")
@@ -419,7 +543,7 @@ def main():
     if not os.path.exists(file_path):
         print(f"❌ Erreur: Le fichier {file_path} n'existe pas.")
         print(f"💡 Assurez-vous d'avoir exécuté les tests pour le niveau {args.level}:")
-        print(f"   python3 test-selenium-single-thread.py --level {args.level}")
+        print(f"   python3 test-selenium-single-thread.py --level {args.level} --engine {args.engine}")
         sys.exit(1)
     
     df_raw = load_all_results(file_path, sheet_names['all'])
@@ -431,20 +555,33 @@ def main():
     # Compute score on filtered data
     df_scored = compute_score(df_filtered)
 
+    # Robustness: neighborhood of each combo on the level's grid (every tested combo counts)
+    df_grid = compute_score(df_clean.dropna(subset=["Net Profit Clean"]))
+    df_scored = add_robustness(df_scored, df_grid, grid_axes_for_level(args.level))
+
     # Derive analytics
     best_per_sym = best_per_symbol(df_scored)
+    robust_per_sym = robust_per_symbol(df_scored)
     best_global = best_global_avg(df_scored)
     combo_counts = combo_counts_among_winners(best_per_sym)
     global_vs_custom = compare_global_vs_custom(df_scored, best_per_sym, best_global)
 
     # Write & style
-    write_analysis(file_path, df_scored, best_per_sym, best_global, combo_counts, global_vs_custom, sheet_names)
-    print(f"\n✅ Analyse {args.level} terminée. Feuilles créées dans {file_path}:")
+    if args.in_place:
+        output_path = file_path
+        write_analysis(output_path, df_scored, best_per_sym, best_global, combo_counts, global_vs_custom,
+                       robust_per_sym, sheet_names)
+    else:
+        output_path = args.output or f"{stem}_analysis.xlsx"
+        write_analysis_streaming(output_path, df_scored, best_per_sym, best_global, combo_counts, global_vs_custom,
+                                 robust_per_sym, sheet_names)
+    print(f"\n✅ Analyse {args.level} terminée. Feuilles créées dans {output_path}:")
     print(f" - {sheet_names['all_scored']}")
     print(f" - {sheet_names['best_per_symbol']}")
     print(f" - {sheet_names['best_global']}")
     print(f" - {sheet_names['combo_counts']}")
     print(f" - {sheet_names['global_vs_custom']}")
+    print(f" - {sheet_names['robust_per_symbol']}")
     
     # Statistiques du niveau analysé
     total_rows = len(df_raw)
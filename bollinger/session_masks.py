@@ -0,0 +1,185 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Masques allowedSession / spreadOK de bollinger-strat.jl, calculés en une passe vectorisée et mis en
+cache par (symbole, timeframe, session, fuseau) : les combos de la grille les réutilisent sans
+aucune conversion de date par barre.
+Usage (benchmark contre la conversion pandas par barre): python session_masks.py [--bars 1000000] [--tz Europe/Paris]
+"""
+
+import argparse
+import math
+import time
+
+import numpy as np
+import pandas as pd
+
+OFFSET_BUCKET_SEC = 900  # les changements d'heure IANA tombent sur des quarts d'heure
+CACHE_SIZE = 64          # entrées gardées en mémoire (les plus anciennes sont oubliées)
+TIMEFRAME_SAMPLE = 1000  # barres utilisées pour estimer le timeframe
+
+_cache = {}
+
+
+def parse_session(session: str) -> list:
+    """'2300-0000' (ou '23:00-00:00', plusieurs plages séparées par des virgules) ->
+    [(1380, 0)] en minutes depuis minuit. Les ':' sont retirés comme sessionFixed dans le script."""
+    ranges = []
+    for part in session.replace(":", "").split(","):
+        start, end = part.strip().split("-")[:2]
+        ranges.append((int(start[:2]) * 60 + int(start[2:4]), int(end[:2]) * 60 + int(end[2:4])))
+    return ranges
+
+
+def in_session(minutes, session: str) -> np.ndarray:
+    """Barres dont la minute d'ouverture (heure locale) tombe dans la session ; début == fin : 24 h."""
+    mask = np.zeros(len(minutes), dtype=bool)
+    for start, end in parse_session(session):
+        if start == end:
+            mask[:] = True
+        elif start < end:
+            mask |= (minutes >= start) & (minutes < end)
+        else:
+            mask |= (minutes >= start) | (minutes < end)
+    return mask
+
+
+def _offsets_at(seconds, tz: str) -> np.ndarray:
+    utc = pd.DatetimeIndex(np.asarray(seconds, dtype="datetime64[s]")).as_unit("s").tz_localize("UTC")
+    return utc.tz_convert(tz).tz_localize(None).asi8 - utc.asi8
+
+
+def _group(keys):
+    """(clés distinctes, indice de la clé de chaque barre) ; sans tri si les barres sont déjà triées."""
+    if np.all(keys[1:] >= keys[:-1]):
+        starts = np.flatnonzero(np.concatenate(([True], keys[1:] != keys[:-1])))
+        return keys[starts], np.repeat(np.arange(len(starts)), np.diff(np.append(starts, len(keys))))
+    return np.unique(keys, return_inverse=True)
+
+
+def utc_offsets(times, tz: str) -> np.ndarray:
+    """Décalage UTC (secondes, heure d'été comprise) de chaque barre. Le fuseau n'est converti qu'au
+    début et à la fin de chaque jour distinct ; seuls les jours de changement d'heure sont convertis
+    au quart d'heure près, puis le résultat est diffusé aux barres en NumPy."""
+    times = np.asarray(times, dtype=np.int64)
+    if not len(times):
+        return np.zeros(0, dtype=np.int64)
+    days, day_of_bar = _group(times // 86400)
+    first, last = _offsets_at(days * 86400, tz), _offsets_at(days * 86400 + 86399, tz)
+    offsets = first[day_of_bar]
+    changing = (first != last)[day_of_bar]
+    if changing.any():
+        buckets, bucket_of_bar = _group(times[changing] // OFFSET_BUCKET_SEC)
+        offsets[changing] = _offsets_at(buckets * OFFSET_BUCKET_SEC, tz)[bucket_of_bar]
+    return offsets
+
+
+def local_minutes(times, tz: str) -> np.ndarray:
+    """Minutes depuis minuit dans le fuseau `tz` (comme time(timeframe.period, session, tz))."""
+    times = np.asarray(times, dtype=np.int64)
+    return (times + utc_offsets(times, tz)) // 60 % 1440
+
+
+def bar_timeframe(times) -> int:
+    """Durée d'une barre en secondes (médiane des premiers écarts), 0 si moins de deux barres."""
+    head = np.asarray(times[:TIMEFRAME_SAMPLE], dtype=np.int64)
+    return int(np.median(np.diff(head))) if len(head) > 1 else 0
+
+
+def compute_masks(times, p) -> tuple:
+    """(allowedSession, spreadOK) sans cache. allowedSession suit hour(time, "UTC") : pas de DST,
+    une simple division entière suffit."""
+    times = np.asarray(times, dtype=np.int64)
+    if p["useSessionFilter"]:
+        hour = times // 3600 % 24
+        in_london = (hour >= p["londonSessionStart"]) & (hour < p["londonSessionEnd"])
+        in_ny = (hour >= p["nySessionStart"]) & (hour < p["nySessionEnd"])
+        allowed = in_london | in_ny
+    else:
+        allowed = np.ones(len(times), dtype=bool)
+    if p["enableNoTradeWindow"]:
+        spread_ok = ~in_session(local_minutes(times, p["noTradeTZ"]), p["noTradeSession"])
+    else:
+        spread_ok = np.ones(len(times), dtype=bool)
+    return allowed, spread_ok
+
+
+def _cache_key(times, p, symbol: str) -> tuple:
+    session = (p["londonSessionStart"], p["londonSessionEnd"], p["nySessionStart"], p["nySessionEnd"]) \
+        if p["useSessionFilter"] else None
+    no_trade = (p["noTradeSession"], p["noTradeTZ"]) if p["enableNoTradeWindow"] else None
+    # Nombre de barres et bornes : un historique complété ou tronqué ne réutilise pas d'anciens masques
+    span = (len(times), int(times[0]), int(times[-1])) if len(times) else (0,)
+    return symbol, bar_timeframe(times), session, no_trade, span
+
+
+def session_masks(times, p, symbol: str = "") -> tuple:
+    """(allowedSession, spreadOK) mis en cache ; les tableaux renvoyés sont en lecture seule."""
+    key = _cache_key(times, p, symbol)
+    if key not in _cache:
+        masks = compute_masks(times, p)
+        for mask in masks:
+            mask.setflags(write=False)
+        if len(_cache) >= CACHE_SIZE:
+            del _cache[next(iter(_cache))]
+        _cache[key] = masks
+    return _cache[key]
+
+
+def clear_cache():
+    _cache.clear()
+
+
+# --- Benchmark : conversion pandas barre par barre (ancienne version de local_engine) ---
+
+def _pandas_masks(times, p) -> tuple:
+    utc = pd.to_datetime(times, unit="s", utc=True)
+    if p["useSessionFilter"]:
+        hour = utc.hour.to_numpy()
+        allowed = ((hour >= p["londonSessionStart"]) & (hour < p["londonSessionEnd"])) | \
+                  ((hour >= p["nySessionStart"]) & (hour < p["nySessionEnd"]))
+    else:
+        allowed = np.ones(len(times), dtype=bool)
+    local = utc.tz_convert(p["noTradeTZ"])
+    minutes = (local.hour * 60 + local.minute).to_numpy()
+    return allowed, ~in_session(minutes, p["noTradeSession"])
+
+
+def _best_time(fn, repeat: int) -> float:
+    best = math.inf
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - t0)
+    return best
+
+
+def main():
+    from local_engine import DEFAULT_PARAMS
+
+    parser = argparse.ArgumentParser(description="Benchmark des masques de session contre la conversion pandas")
+    parser.add_argument('--bars', type=int, default=1_000_000, help='Nombre de barres synthétiques')
+    parser.add_argument('--timeframe', type=int, default=60, help='Durée d\'une barre en secondes')
+    parser.add_argument('--tz', nargs='+', default=['Europe/Paris', 'America/New_York', 'Australia/Lord_Howe'],
+                        help='Fuseaux de la fenêtre sans trade')
+    parser.add_argument('--session', default='2300-0000', help='noTradeSession')
+    parser.add_argument('--repeat', type=int, default=3, help='Mesures par variante (meilleur temps retenu)')
+    args = parser.parse_args()
+
+    # Départ au 1er janvier 2020 : l'historique traverse plusieurs changements d'heure
+    times = 1_577_836_800 + np.arange(args.bars, dtype=np.int64) * args.timeframe
+    print(f"⏱️ {args.bars:,} barres de {args.timeframe}s, session {args.session}, meilleur de {args.repeat}")
+    print(f"   {'fuseau':<22s} {'pandas':>9s} {'vectorisé':>10s} {'gain':>6s} {'cache':>9s}  identique")
+    for tz in args.tz:
+        p = dict(DEFAULT_PARAMS, useSessionFilter=True, enableNoTradeWindow=True, noTradeTZ=tz, noTradeSession=args.session)
+        slow = _best_time(lambda: _pandas_masks(times, p), args.repeat)
+        fast = _best_time(lambda: compute_masks(times, p), args.repeat)
+        session_masks(times, p, "BENCH")
+        cached = _best_time(lambda: session_masks(times, p, "BENCH"), args.repeat)
+        same = all(np.array_equal(a, b) for a, b in zip(_pandas_masks(times, p), compute_masks(times, p)))
+        print(f"   {tz:<22s} {slow * 1000:7.1f}ms {fast * 1000:8.1f}ms {slow / fast:5.1f}x "
+              f"{cached * 1e6:6.0f}µs   {'✅' if same else '❌'}")
+
+
+if __name__ == "__main__":
+    main()
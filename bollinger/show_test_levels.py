@@ -5,6 +5,8 @@ Script d'aide pour afficher les niveaux de test disponibles.
 Usage: python show_test_levels.py
 """
 
+import time_estimator
+
 TEST_LEVELS = {
     'COARSE': {
         'ATR_MULTIPLIERS': [1.0, 1.5, 2.0, 2.5, 3.0],  # 5 valeurs
@@ -31,6 +33,7 @@ SYMBOL_LIST = ['EURUSD', 'EURAUD', 'USDCAD', 'NZDJPY', 'GBPUSD', 'USDJPY', 'EURJ
 def main():
     print("🚀 NIVEAUX DE TEST DISPONIBLES")
     print("=" * 60)
+    fits = time_estimator.fit_timings()  # durées mesurées (tv_timings.csv)
     
     for level_name, config in TEST_LEVELS.items():
         total_combos = len(config['ATR_MULTIPLIERS']) * len(config['RR_VALUES']) * len(config['VOL_MULTIPLIERS'])
@@ -46,17 +49,8 @@ def main():
         print(f"🌍 Tests totaux ({len(SYMBOL_LIST)} symboles): {total_tests:,}")
         
         # Estimation du temps
-        avg_time_per_test = 4.0
-        estimated_seconds = total_tests * avg_time_per_test
-        estimated_hours = estimated_seconds / 3600
-        estimated_days = estimated_hours / 24
-        
-        if estimated_hours < 1:
-            print(f"⏱️ Temps estimé: ~{estimated_seconds/60:.0f} minutes")
-        elif estimated_hours < 24:
-            print(f"⏱️ Temps estimé: ~{estimated_hours:.1f}h")
-        else:
-            print(f"⏱️ Temps estimé: ~{estimated_days:.1f} jours")
+        est = time_estimator.estimate_run(total_combos, SYMBOL_LIST, fits=fits)
+        print(f"⏱️ Temps estimé: {time_estimator.describe(est)}")
         
         # Détail des valeurs pour COARSE
         if level_name == 'COARSE':
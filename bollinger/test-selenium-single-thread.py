@@ -1,6 +1,7 @@
 # -*- coding: utf-8 -*-
 
 import time
+import numpy as np
 import pandas as pd
 import os
 import re
@@ -20,6 +21,12 @@ from collections import defaultdict
 from collections import deque
 import sys
 import argparse
+import json
+import queue
+import threading
+
+import local_sweep
+import time_estimator
 
 TIMING_CSV = "tv_timings.csv"
 timing_stats = defaultdict(list)       # label -> list of durations (seconds)
@@ -28,6 +35,7 @@ combo_timings_rows = []                # detailed per-combination rows for CSV
 # --- ETA / progress helpers ---
 combo_time_window = deque(maxlen=100)
 DEFAULT_COMBO_SEC = 5.0  # fallback when we don't have timing yet
+ACTIVE_WORKERS = 1       # browsers sweeping in parallel (--workers)
 
 def _avg_combo_seconds():
     if combo_time_window:
@@ -48,7 +56,7 @@ def _fmt_eta(seconds: float):
     return f"{m:02d}:{s:02d}"
 
 def _print_progress(symbol: str, done: int, total: int, gdone: int, gtotal: int):
-    avg_sec = _avg_combo_seconds()
+    avg_sec = _avg_combo_seconds() / ACTIVE_WORKERS
     eta_symbol = (total - done) * avg_sec
     eta_all = (gtotal - gdone) * avg_sec
     msg = (
@@ -61,6 +69,35 @@ def _print_progress(symbol: str, done: int, total: int, gdone: int, gtotal: int)
     except Exception:
         print(msg)
 DEBUG = False  # Set to False to disable debug prints
+
+# --- Spans (--trace): every timed() section with its thread and (symbol, atr, rr, vol) context ---
+TRACE_SPANS = False
+span_records = []             # (label, t0, t1, thread name, context dict), perf_counter seconds
+_span_ctx = threading.local()
+_TRACE_T0 = time.perf_counter()
+
+
+@contextmanager
+def span_context(**ctx):
+    """Attach context (symbol, atr, rr, vol) to the spans recorded on this thread inside the block."""
+    prev = getattr(_span_ctx, "ctx", {})
+    _span_ctx.ctx = {**prev, **ctx}
+    try:
+        yield
+    finally:
+        _span_ctx.ctx = prev
+
+
+def record_timing(label: str, t0: float, t1: float):
+    """Add one perf_counter interval to timing_stats (and to the spans when tracing)."""
+    dt = t1 - t0
+    timing_stats[label].append(dt)
+    if TRACE_SPANS:
+        span_records.append((label, t0, t1, threading.current_thread().name, getattr(_span_ctx, "ctx", {})))
+    if DEBUG:
+        print(f"[Timing] {label}: {dt:.3f} seconds")
+
+
 @contextmanager
 def timed(label: str):
     """Context manager to time code sections and collect aggregated stats."""
@@ -68,10 +105,23 @@ def timed(label: str):
     try:
         yield
     finally:
-        dt = time.perf_counter() - t0
-        timing_stats[label].append(dt)
-        if DEBUG:
-            print(f"[Timing] {label}: {dt:.3f} seconds")
+        record_timing(label, t0, time.perf_counter())
+
+
+def export_chrome_trace(path: str):
+    """Write span_records as Chrome trace events (chrome://tracing, ui.perfetto.dev, trace_report.py)."""
+    pid = os.getpid()
+    tids = {}
+    events = []
+    for label, t0, t1, thread, ctx in span_records:
+        tid = tids.setdefault(thread, len(tids) + 1)
+        events.append({"name": label, "ph": "X", "pid": pid, "tid": tid,
+                       "ts": round((t0 - _TRACE_T0) * 1e6, 1), "dur": round((t1 - t0) * 1e6, 1), "args": ctx})
+    events += [{"name": "thread_name", "ph": "M", "pid": pid, "tid": tid, "args": {"name": thread}}
+               for thread, tid in tids.items()]
+    with open(path, "w") as f:
+        json.dump({"traceEvents": events, "displayTimeUnit": "ms"}, f, default=str)
+    print(f"[Trace] {len(span_records)} spans written to {path} (python trace_report.py {path})")
 
 
 def _append_combo_timing_row(symbol, atr, rr, vol_mult, **parts):
@@ -85,12 +135,15 @@ def _append_combo_timing_row(symbol, atr, rr, vol_mult, **parts):
     combo_timings_rows.append(row)
 
 
-def dump_timing_summary():
+def dump_timing_summary(write_stages: bool = True):
+    """Print the timing summary and append the CSVs. write_stages=False (--engine local) keeps the
+    run out of time_estimator's browser stages."""
     print("\n==== TIMING SUMMARY (seconds) ====")
     for label, values in timing_stats.items():
         if not values:
             continue
-        print(f"{label:22s}  n={len(values):4d}  avg={statistics.mean(values):6.3f}  p90={statistics.quantiles(values, n=10)[8]:6.3f}  max={max(values):6.3f}")
+        p90 = statistics.quantiles(values, n=10)[8] if len(values) > 1 else values[0]
+        print(f"{label:22s}  n={len(values):4d}  avg={statistics.mean(values):6.3f}  p90={p90:6.3f}  max={max(values):6.3f}")
     # Write detailed CSV for further analysis
     if combo_timings_rows:
         import csv
@@ -105,11 +158,22 @@ def dump_timing_summary():
             print(f"Timing details appended to {TIMING_CSV} ({len(combo_timings_rows)} rows).")
         except Exception as e:
             print(f"[Timing] Failed to write {TIMING_CSV}: {e}")
+    # Per-symbol / per-autosave stages feed time_estimator's ETA
+    stage_rows = [(label, v) for label in time_estimator.STAGES for v in timing_stats.get(label, [])] if write_stages else []
+    if stage_rows:
+        try:
+            write_header = not os.path.exists(time_estimator.STAGE_CSV)
+            with open(time_estimator.STAGE_CSV, "a", newline="") as f:
+                if write_header:
+                    f.write("label,seconds\n")
+                f.writelines(f"{label},{v:.6f}\n" for label, v in stage_rows)
+        except Exception as e:
+            print(f"[Timing] Failed to write {time_estimator.STAGE_CSV}: {e}")
 
 # --- Global in-memory cache of existing results ---
 # Keyed by (Symbol, ATR Multiplier, RR, Vol Multiplier) -> full row dict
 existing_rows = {}
-AUTOSAVE_ROWS_THRESHOLD = 200  # Autosave every N tests
+AUTOSAVE_ROWS_THRESHOLD = 200  # Merge into the in-memory frame every N tests
 
 def _key(symbol, atr, rr, vol):
     try:
@@ -117,12 +181,8 @@ def _key(symbol, atr, rr, vol):
     except Exception:
         return (str(symbol), atr, rr, vol)
 
-# Ensure consistent dtypes & column order
-EXPECTED_COLS = [
-    "Symbol", "ATR Multiplier", "RR", "Vol Multiplier",
-    "Net Profit", "Net Profit Clean", "Win Rate", "drawdown",
-    "Total Trades", "Profit Factor"
-]
+# Ensure consistent dtypes & column order (one layout for results_store, local_engine and the runner)
+from results_store import EXPECTED_COLS
 
 
 # --- Unified formatting used by both autosave and final save ---
@@ -174,8 +234,9 @@ def _format_results_df(results_list, symbol_name):
     return df
 
 
-# --- Autosave helper: write partial results every N tests (same format as final) ---
+# --- Autosave helper: merge partial results every N tests in memory (same format as final) ---
 from openpyxl import load_workbook
+import results_store
 
 def _compute_best_row(df_symbol: pd.DataFrame):
     if df_symbol.empty:
@@ -188,35 +249,22 @@ def _compute_best_row(df_symbol: pd.DataFrame):
 
 
 def _refresh_cache_from_df(df_symbol: pd.DataFrame):
-    for _, r in df_symbol.iterrows():
-        k = _key(r.get("Symbol"), r.get("ATR Multiplier"), r.get("RR"), r.get("Vol Multiplier"))
-        existing_rows[k] = {col: r.get(col) for col in df_symbol.columns}
-
-
-def autosave_and_update(xlsx_path: str, symbol_name: str, results_list: list):
-    if not results_list:
+    if df_symbol.empty:
         return
-    # Normalize partial into consistent DF
-    df_partial = _format_results_df(results_list, symbol_name)
+    # Same keys as _key(), built column-wise
+    keys = zip(df_symbol["Symbol"].astype(str).tolist(),
+               *(pd.to_numeric(df_symbol[c], errors='coerce').astype(float).tolist()
+                 for c in ["ATR Multiplier", "RR", "Vol Multiplier"]))
+    cols = list(df_symbol.columns)
+    rows = (dict(zip(cols, values)) for values in zip(*(df_symbol[c].tolist() for c in cols)))
+    existing_rows.update(zip(keys, rows))
 
-    # Merge with existing symbol sheet (if any) and dedup by key
-    if os.path.exists(xlsx_path):
-        try:
-            book = load_workbook(xlsx_path)
-            if f"{symbol_name}_Results" in book.sheetnames:
-                df_prev = pd.read_excel(xlsx_path, sheet_name=f"{symbol_name}_Results", engine='openpyxl')
-                df_prev = _format_results_df(df_prev.to_dict(orient='records'), symbol_name)
-                df_symbol = pd.concat([df_prev, df_partial], ignore_index=True)
-            else:
-                df_symbol = df_partial.copy()
-        except Exception:
-            df_symbol = df_partial.copy()
-    else:
-        df_symbol = df_partial.copy()
 
+def _dedup_results(df: pd.DataFrame) -> pd.DataFrame:
     # Prefer rows that have drawdown/Total Trades/Profit Factor filled, then higher profit
-    df_symbol["__complete__"] = df_symbol[["drawdown", "Total Trades", "Profit Factor"]].notna().sum(axis=1)
-    df_symbol = df_symbol.sort_values(
+    df = df.copy()
+    df["__complete__"] = df[["drawdown", "Total Trades", "Profit Factor"]].notna().sum(axis=1)
+    return df.sort_values(
         ["Symbol", "ATR Multiplier", "RR", "Vol Multiplier", "__complete__", "Net Profit Clean"],
         ascending=[True, True, True, True, False, False]
     ).drop_duplicates(
@@ -224,92 +272,296 @@ def autosave_and_update(xlsx_path: str, symbol_name: str, results_list: list):
         keep="first"
     ).drop(columns="__complete__", errors="ignore")
 
-    # Best row for this symbol
-    best_row = _compute_best_row(df_symbol)
 
-    # Rebuild Best_Per_Symbol by replacing/adding this symbol
-    if os.path.exists(xlsx_path):
-        try:
-            if "Best_Per_Symbol" in load_workbook(xlsx_path).sheetnames:
-                best_df_prev = pd.read_excel(xlsx_path, sheet_name="Best_Per_Symbol", engine='openpyxl')
-                best_df_prev = best_df_prev[best_df_prev["Symbol"] != symbol_name]
-            else:
-                best_df_prev = pd.DataFrame()
-        except Exception:
-            best_df_prev = pd.DataFrame()
-    else:
-        best_df_prev = pd.DataFrame()
-
-    if best_row is not None:
-        best_df_new = pd.DataFrame({
-            "Symbol": [symbol_name],
-            "Best ATR Multiplier": [best_row.get("ATR Multiplier")],
-            "Best RR": [best_row.get("RR")],
-            "Best Vol Multiplier": [best_row.get("Vol Multiplier")],
-            "Best Net Profit": [best_row.get("Net Profit")],
-            "Best Win Rate": [best_row.get("Win Rate")],
-            "Best Drawdown": [best_row.get("drawdown")],
-            "Best Total Trades": [best_row.get("Total Trades")],
-            "Best Profit Factor": [best_row.get("Profit Factor")],
-            "Best Net Profit Clean": [best_row.get("Net Profit Clean")],
-        })
-        best_df_merged = pd.concat([best_df_prev, best_df_new], ignore_index=True)
-    else:
-        best_df_merged = best_df_prev
+def autosave_and_update(xlsx_path: str, symbol_name: str, results_list: list):
+    """Merge new rows into the symbol's in-memory frame (no workbook read or write).
+    The workbook is rewritten once per symbol by finalize_symbol; until then the journal holds the rows."""
+    if not results_list:
+        return
+    # Normalize partial into consistent DF
+    df_partial = _format_results_df(results_list, symbol_name)
 
-    # Write symbol sheet + Best_Per_Symbol
-    mode = 'a' if os.path.exists(xlsx_path) else 'w'
-    with pd.ExcelWriter(xlsx_path, engine='openpyxl', mode=mode, if_sheet_exists='replace') as writer:
-        df_symbol.to_excel(writer, index=False, sheet_name=f"{symbol_name}_Results")
-        if not best_df_merged.empty:
-            best_df_merged.to_excel(writer, index=False, sheet_name="Best_Per_Symbol")
+    # Merge with the symbol's frame (loaded from the workbook at startup) and dedup by key
+    frames = _sheet_frames.setdefault(xlsx_path, {})
+    df_prev = frames.get(symbol_name)
+    if df_prev is not None and not df_prev.empty:
+        df_symbol = _dedup_results(pd.concat([df_prev, df_partial], ignore_index=True))
+    else:
+        df_symbol = _dedup_results(df_partial)
+    frames[symbol_name] = df_symbol
 
     # Refresh in-memory cache from latest df_symbol
     _refresh_cache_from_df(df_symbol)
 
-    # Rebuild All_Results by concatenating all *_Results sheets
-    try:
-        book = load_workbook(xlsx_path)
-        all_dfs = []
-        for sh in book.sheetnames:
-            if sh.endswith("_Results"): # Exclude All_results
-                if sh == "All_Results":
-                    continue
-                df_sh = pd.read_excel(xlsx_path, sheet_name=sh, engine='openpyxl')
-                df_sh = _format_results_df(df_sh.to_dict(orient='records'), sh.replace("_Results", ""))
-                all_dfs.append(df_sh)
-        if all_dfs:
-            all_merged = pd.concat(all_dfs, ignore_index=True)
-            all_merged["__complete__"] = all_merged[["drawdown", "Total Trades", "Profit Factor"]].notna().sum(axis=1)
-            all_merged = all_merged.sort_values(
-                ["Symbol", "ATR Multiplier", "RR", "Vol Multiplier", "__complete__", "Net Profit Clean"],
-                ascending=[True, True, True, True, False, False]
-            ).drop_duplicates(
-                subset=["Symbol", "ATR Multiplier", "RR", "Vol Multiplier"],
-                keep="first"
-            ).drop(columns="__complete__", errors="ignore")
-            with pd.ExcelWriter(xlsx_path, engine='openpyxl', mode='a', if_sheet_exists='replace') as writer:
-                all_merged.to_excel(writer, index=False, sheet_name="All_Results")
-    except Exception as e:
-        print(f"[AutoSave] Failed to rebuild All_Results: {e}")
-
-    print(f"[AutoSave] {symbol_name}: {len(df_symbol)} unique rows saved. Best updated.")
+    print(f"[AutoSave] {symbol_name}: {len(df_symbol)} unique rows in memory.")
     try:
         sys.stdout.write("\n"); sys.stdout.flush()
     except Exception:
         pass
 
-def finalize_symbol(xlsx_path: str, symbol_name: str):
-    """Force a final formatting pass on the symbol's sheet so the last batch is properly formatted."""
+
+def _best_per_symbol_df(xlsx_path: str) -> pd.DataFrame:
+    """Best_Per_Symbol from the in-memory symbol frames."""
+    rows = []
+    for symbol_name, df_symbol in sorted(_sheet_frames.get(xlsx_path, {}).items()):
+        best_row = _compute_best_row(df_symbol)
+        if best_row is None:
+            continue
+        rows.append({
+            "Symbol": symbol_name,
+            "Best ATR Multiplier": best_row.get("ATR Multiplier"),
+            "Best RR": best_row.get("RR"),
+            "Best Vol Multiplier": best_row.get("Vol Multiplier"),
+            "Best Net Profit": best_row.get("Net Profit"),
+            "Best Win Rate": best_row.get("Win Rate"),
+            "Best Drawdown": best_row.get("drawdown"),
+            "Best Total Trades": best_row.get("Total Trades"),
+            "Best Profit Factor": best_row.get("Profit Factor"),
+            "Best Net Profit Clean": best_row.get("Net Profit Clean"),
+        })
+    return pd.DataFrame(rows)
+
+# --- Startup cache sidecar: the *_Results sheets as columns in a .npz next to the workbook ---
+# Valid while the workbook's mtime/size match the stamp stored inside; rewritten after each symbol.
+_sheet_frames = {}  # xlsx path -> {symbol: formatted *_Results frame}, mirrors the workbook
+
+
+def _cache_path(xlsx_path: str) -> str:
+    return os.path.splitext(xlsx_path)[0] + ".cache.npz"
+
+
+def _xlsx_stamp(xlsx_path: str):
+    st = os.stat(xlsx_path)
+    return np.array([st.st_mtime_ns, st.st_size], dtype=np.int64)
+
+
+def save_cache_sidecar(xlsx_path: str):
+    frames = [df for df in _sheet_frames.get(xlsx_path, {}).values() if not df.empty]
+    if not frames or not os.path.exists(xlsx_path):
+        return
+    df = pd.concat(frames, ignore_index=True).reindex(columns=EXPECTED_COLS)
+    arrays = {}
+    for col in EXPECTED_COLS:
+        if col in ("Symbol", "Net Profit"):
+            arrays[col] = np.array([("" if v is None or v != v else str(v)) for v in df[col].tolist()], dtype=str)
+        else:
+            arrays[col] = pd.to_numeric(df[col], errors='coerce').to_numpy(dtype=np.float64)
+    path = _cache_path(xlsx_path)
+    tmp = path + ".tmp.npz"
+    np.savez(tmp, __stamp__=_xlsx_stamp(xlsx_path), **arrays)
+    os.replace(tmp, path)
+
+
+def _load_cache_sidecar(xlsx_path: str):
+    path = _cache_path(xlsx_path)
+    if not os.path.exists(path):
+        return None
+    try:
+        with np.load(path) as z:
+            if not np.array_equal(z["__stamp__"], _xlsx_stamp(xlsx_path)):
+                return None
+            df = pd.DataFrame({col: z[col] for col in EXPECTED_COLS})
+    except Exception as e:
+        print(f"[Cache] Ignoring {path}: {e}")
+        return None
+    df["Net Profit"] = df["Net Profit"].astype(object).where(df["Net Profit"] != "", None)
+    return {symbol: g.reset_index(drop=True) for symbol, g in df.groupby("Symbol", sort=False)}
+
+
+def write_all_results(xlsx_path: str):
+    """Write All_Results from the in-memory per-symbol frames (one concat, no sheet re-read)."""
+    frames = _sheet_frames.get(xlsx_path, {})
+    frames = [frames[s] for s in sorted(frames) if not frames[s].empty]
+    if not frames or not os.path.exists(xlsx_path):
+        return
+    all_merged = _dedup_results(pd.concat(frames, ignore_index=True))
     try:
-        df_raw = pd.read_excel(xlsx_path, sheet_name=f"{symbol_name}_Results", engine='openpyxl')
-        df_fmt = _format_results_df(df_raw.to_dict(orient='records'), symbol_name)
         with pd.ExcelWriter(xlsx_path, engine='openpyxl', mode='a', if_sheet_exists='replace') as writer:
-            df_fmt.to_excel(writer, index=False, sheet_name=f"{symbol_name}_Results")
-        print(f"[Finalize] {symbol_name}: sheet formatted and rewritten.")
+            all_merged.to_excel(writer, index=False, sheet_name="All_Results")
+    except Exception as e:
+        print(f"[AllResults] Failed to write All_Results: {e}")
+        return
+    save_cache_sidecar(xlsx_path)  # the workbook stamp changed
+    print(f"[AllResults] {len(all_merged)} rows written to All_Results.")
+
+
+def load_workbook_cache(xlsx_path: str):
+    """Fill existing_rows from every *_Results sheet of a results workbook (sidecar when up to date)."""
+    frames = _load_cache_sidecar(xlsx_path)
+    if frames is None:
+        with timed("cache_rebuild"):
+            book = load_workbook(xlsx_path, read_only=True)
+            names = [s for s in book.sheetnames if s.endswith("_Results") and s != "All_Results"]
+            book.close()
+            sheets = pd.read_excel(xlsx_path, sheet_name=names, engine="openpyxl") if names else {}
+            frames = {
+                name.replace("_Results", ""): _format_results_df(df_prev.to_dict(orient='records'), name.replace("_Results", ""))
+                for name, df_prev in sheets.items()
+            }
+            _sheet_frames[xlsx_path] = frames
+            save_cache_sidecar(xlsx_path)
+    else:
+        _sheet_frames[xlsx_path] = frames
+    for df_symbol in frames.values():
+        _refresh_cache_from_df(df_symbol)
+
+# --- Results backend: xlsx autosave (default) or append-only SQLite store ---
+results_db = None  # sqlite3 connection when --backend sqlite
+# Scraped rows are journaled and committed to SQLite one by one. --engine local turns this off:
+# its rows can be recomputed, so they are only persisted in batches (autosave, then per symbol).
+ROW_DURABILITY = True
+
+
+def record_result(symbol_name: str, row: dict):
+    """Commit one scraped combo right away when the SQLite backend is active."""
+    if results_db is not None:
+        results_store.upsert_df(results_db, _format_results_df([row], symbol_name))
+
+
+def save_results(xlsx_path: str, symbol_name: str, results_list: list):
+    if results_db is not None:
+        if not ROW_DURABILITY and results_list:
+            results_store.upsert_df(results_db, _format_results_df(results_list, symbol_name))
+        return  # otherwise rows are already committed one by one; the xlsx is exported at the end
+    autosave_and_update(xlsx_path, symbol_name, results_list)
+
+
+def finalize_symbol(xlsx_path: str, symbol_name: str):
+    """Write the symbol's sheet and Best_Per_Symbol from memory: one workbook rewrite per symbol."""
+    df_symbol = _sheet_frames.get(xlsx_path, {}).get(symbol_name)
+    if df_symbol is None or df_symbol.empty:
+        return
+    try:
+        mode = 'a' if os.path.exists(xlsx_path) else 'w'
+        kwargs = {"if_sheet_exists": "replace"} if mode == 'a' else {}
+        with pd.ExcelWriter(xlsx_path, engine='openpyxl', mode=mode, **kwargs) as writer:
+            df_symbol.to_excel(writer, index=False, sheet_name=f"{symbol_name}_Results")
+            best_df = _best_per_symbol_df(xlsx_path)
+            if not best_df.empty:
+                best_df.to_excel(writer, index=False, sheet_name="Best_Per_Symbol")
+        print(f"[Finalize] {symbol_name}: {len(df_symbol)} rows written, Best_Per_Symbol updated.")
     except Exception as e:
         print(f"[Finalize] Failed to finalize {symbol_name}: {e}")
 
+# --- Write-ahead journal: each scraped row is appended + fsync'd before it is queued for saving ---
+# Rows left over by a crash are replayed into the results store at startup; truncated after a clean run.
+JOURNAL_FSYNC = True
+_journal = None
+
+
+def journal_path(xlsx_path: str) -> str:
+    return os.path.splitext(xlsx_path)[0] + ".journal.jsonl"
+
+
+def read_journal(path: str) -> dict:
+    """symbol -> rows recorded in the journal (a torn last line from a crash is ignored)."""
+    replayed = defaultdict(list)
+    if not os.path.exists(path):
+        return replayed
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            try:
+                entry = json.loads(line)
+            except ValueError:
+                continue
+            replayed[entry["Symbol"]].append(entry["row"])
+    return replayed
+
+
+def replay_journal(path: str, xlsx_path: str) -> int:
+    """Persist the rows of an interrupted run and add them to existing_rows. Returns the row count."""
+    replayed = read_journal(path)
+    for symbol_name, rows in replayed.items():
+        if results_db is not None:
+            results_store.upsert_df(results_db, _format_results_df(rows, symbol_name))
+            _refresh_cache_from_df(results_store.load_df(results_db, symbol_name))
+        else:
+            autosave_and_update(xlsx_path, symbol_name, rows)
+            finalize_symbol(xlsx_path, symbol_name)
+    if replayed and results_db is None:
+        save_cache_sidecar(xlsx_path)
+    return sum(len(rows) for rows in replayed.values())
+
+
+def open_journal(path: str):
+    """Start a fresh journal (call after replay_journal has persisted the previous one)."""
+    global _journal
+    _journal = open(path, "w", encoding="utf-8")
+
+
+def journal_append(symbol_name: str, row: dict):
+    if _journal is None:
+        return
+    _journal.write(json.dumps({"Symbol": symbol_name, "row": row}, default=str, ensure_ascii=False) + "\n")
+    _journal.flush()
+    if JOURNAL_FSYNC:
+        os.fsync(_journal.fileno())
+
+
+def close_journal(remove: bool = False):
+    """Close the journal; remove it once every row it holds is persisted."""
+    global _journal
+    if _journal is None:
+        return
+    path = _journal.name
+    _journal.close()
+    _journal = None
+    if remove:
+        os.remove(path)
+
+# --- Background writer: autosave / finalize / SQLite upserts run on one thread ---
+# The sweep only enqueues (bounded queue, so it blocks only if the writer falls far behind).
+WRITE_QUEUE_MAX = 64
+_write_queue = None
+_writer_thread = None
+
+
+def _writer_loop():
+    while True:
+        job = _write_queue.get()
+        try:
+            if job is None:
+                return
+            fn, args, ctx = job
+            try:
+                with span_context(**ctx), timed(f"writer_{fn.__name__}"):
+                    fn(*args)
+            except Exception as e:
+                print(f"[Writer] {fn.__name__} failed: {e}")
+        finally:
+            _write_queue.task_done()
+
+
+def start_writer():
+    global _write_queue, _writer_thread
+    _write_queue = queue.Queue(maxsize=WRITE_QUEUE_MAX)
+    _writer_thread = threading.Thread(target=_writer_loop, name="tv-writer", daemon=True)
+    _writer_thread.start()
+
+
+def submit_write(fn, *args):
+    """Queue a persistence call for the writer thread (runs inline when no writer is running)."""
+    if _writer_thread is None:
+        fn(*args)
+        return
+    _write_queue.put((fn, args, getattr(_span_ctx, "ctx", {})))
+
+
+def flush_writer():
+    """Block until every queued write has been persisted."""
+    if _write_queue is not None:
+        _write_queue.join()
+
+
+def stop_writer():
+    global _write_queue, _writer_thread
+    if _writer_thread is None:
+        return
+    _write_queue.put(None)
+    _writer_thread.join()
+    _write_queue = None
+    _writer_thread = None
+
 # === CONFIG ===
 TRADINGVIEW_URL = "https://www.tradingview.com/chart/0RKjg68o/"
 
@@ -332,6 +584,24 @@ TEST_LEVELS = {
         'RR_VALUES': [round(i * 0.1, 1) for i in range(20, 51)],        # 2.0 à 5.0 par 0.1 = 31 valeurs
         'VOL_MULTIPLIERS': [round(i * 0.1, 1) for i in range(8, 14)],   # 0.8 à 1.3 par 0.1 = 6 valeurs
         'description': 'Test complet avec 3906 combinaisons par symbole'
+    },
+    'ADAPTIVE': {
+        # Même grille que FULL, mais seuls les voisinages des meilleurs combos sont testés
+        'ATR_MULTIPLIERS': [round(i * 0.1, 1) for i in range(10, 31)],
+        'RR_VALUES': [round(i * 0.1, 1) for i in range(20, 51)],
+        'VOL_MULTIPLIERS': [round(i * 0.1, 1) for i in range(8, 14)],
+        # Passe initiale : grille grossière couvrant les bornes de FULL sur chaque axe (le premier
+        # rayon de 0.4 atteint tous les points entre deux valeurs de la graine)
+        'seed': {
+            'ATR_MULTIPLIERS': [1.0, 1.5, 2.0, 2.5, 3.0],                 # 5 valeurs
+            'RR_VALUES': [round(i * 0.5, 1) for i in range(4, 11)],       # 2.0 à 5.0 par 0.5 = 7 valeurs
+            'VOL_MULTIPLIERS': [0.8, 1.1, 1.3],                           # 3 valeurs
+        },
+        'top_k': 5,                                 # combos (par Score) autour desquels on densifie
+        'rounds': [(0.4, 0.2), (0.2, 0.1), (0.1, 0.1)],  # (rayon, pas) ATR/RR ; la dernière passe se répète
+        'max_rounds': 10,
+        'estimated_combos': 350,                    # pour l'ETA (~9 % de FULL)
+        'description': 'Grille grossière (105 combos, bornes de FULL) puis raffinement autour des meilleurs combos jusqu\'au pas 0.1 de FULL'
     }
 }
 
@@ -344,372 +614,955 @@ def set_test_level(level='FINE'):
         level = 'FINE'
     
     config = TEST_LEVELS[level]
-    total_combos = len(config['ATR_MULTIPLIERS']) * len(config['RR_VALUES']) * len(config['VOL_MULTIPLIERS'])
+    total_combos = config.get('estimated_combos') or len(config['ATR_MULTIPLIERS']) * len(config['RR_VALUES']) * len(config['VOL_MULTIPLIERS'])
     
     print(f"\n📊 NIVEAU DE TEST: {level}")
     print(f"📈 {config['description']}")
     print(f"🔢 ATR: {len(config['ATR_MULTIPLIERS'])} valeurs de {min(config['ATR_MULTIPLIERS'])} à {max(config['ATR_MULTIPLIERS'])}")
     print(f"🔢 RR: {len(config['RR_VALUES'])} valeurs de {min(config['RR_VALUES'])} à {max(config['RR_VALUES'])}")
     print(f"🔢 Vol: {len(config['VOL_MULTIPLIERS'])} valeurs de {min(config['VOL_MULTIPLIERS'])} à {max(config['VOL_MULTIPLIERS'])}")
-    print(f"⚡ Total par symbole: {total_combos:,} combinaisons")
+    if 'estimated_combos' in config:
+        print(f"⚡ Total par symbole: ~{total_combos:,} combinaisons (estimation)")
+    else:
+        print(f"⚡ Total par symbole: {total_combos:,} combinaisons")
     print("")
     
     return config['ATR_MULTIPLIERS'], config['RR_VALUES'], config['VOL_MULTIPLIERS']
 
-# === Setup Chrome Remote Debugging Attach ===
-options = Options()
-options.add_argument("--window-size=1920,1080")
-options.debugger_address = "127.0.0.1:9222"
-driver = webdriver.Chrome(options=options)
-
-# --- Argument parser pour options CLI ---
-parser = argparse.ArgumentParser(description="Backtest TradingView avec Selenium")
-parser.add_argument('--skip-complete', action='store_true', help='Ignorer les devises déjà complètes (tous les combos testés)')
-parser.add_argument('--level', choices=['COARSE', 'FINE', 'FULL'], default='FINE', 
-                   help='Niveau de test: COARSE (rapide, 75 combos), FINE (moyen, 726 combos), FULL (complet, 3906 combos)')
-parser.add_argument('--symbols', nargs='*', help='Symboles spécifiques à tester (ex: --symbols EURUSD GBPUSD)')
-args = parser.parse_args()
-
-# Configuration du niveau de test
-ATR_MULTIPLIERS, RR_VALUES, VOL_MULTIPLIERS = set_test_level(args.level)
-
-# Filtrer les symboles si spécifié
-if args.symbols:
-    # Valider que les symboles existent
-    invalid_symbols = [s for s in args.symbols if s not in SYMBOL_LIST]
-    if invalid_symbols:
-        print(f"❌ Symboles invalides: {invalid_symbols}")
-        print(f"📋 Symboles disponibles: {SYMBOL_LIST}")
-        exit(1)
-    SYMBOL_LIST = args.symbols
-    print(f"🎯 Test limité à {len(SYMBOL_LIST)} symbole(s): {', '.join(SYMBOL_LIST)}")
-
-# --- ETA totals (calculés après la configuration) ---
-TOTAL_COMBOS_PER_SYMBOL = len(ATR_MULTIPLIERS) * len(RR_VALUES) * len(VOL_MULTIPLIERS)
-TOTAL_SYMBOLS = len(SYMBOL_LIST)
-GLOBAL_TOTAL_COMBOS = TOTAL_COMBOS_PER_SYMBOL * TOTAL_SYMBOLS
-global_done_combos = 0
-
-# Affichage des totaux finaux
-print(f"🌍 Total pour {TOTAL_SYMBOLS} symbole(s): {GLOBAL_TOTAL_COMBOS:,} tests")
-avg_time_per_test = 4.0
-estimated_hours = (GLOBAL_TOTAL_COMBOS * avg_time_per_test) / 3600
-if estimated_hours < 1:
-    print(f"⏱️ Temps estimé total: ~{estimated_hours*60:.0f} minutes")
-else:
-    print(f"⏱️ Temps estimé total: ~{estimated_hours:.1f}h")
-print("")
-
-# === Load existing results to skip already-tested combinations ===
-output_file = f"tradingview_backtest_results_{args.level.lower()}.xlsx"
-if os.path.exists(output_file):
-    try:
-        book = load_workbook(output_file)
-        for sheet_name in book.sheetnames:
-            if not sheet_name.endswith("_Results"):
-                continue
-            symbol = sheet_name.replace("_Results", "")
-            df_prev = pd.read_excel(output_file, sheet_name=sheet_name, engine="openpyxl")
-            df_prev = _format_results_df(df_prev.to_dict(orient='records'), symbol)
-            for _, row in df_prev.iterrows():
-                k = _key(symbol, row.get("ATR Multiplier"), row.get("RR"), row.get("Vol Multiplier"))
-                existing_rows[k] = {col: row.get(col) for col in df_prev.columns}
-        print(f"Loaded {len(existing_rows)} cached rows from workbook.")
-    except Exception as e:
-        print(f"Could not load existing results: {e}")
-        # Create the xlsx file if it doesn't exist
-        with pd.ExcelWriter(output_file, engine='openpyxl') as writer:
-            pd.DataFrame().to_excel(writer, index=False, sheet_name="All_Results")
-            pd.DataFrame().to_excel(writer, index=False, sheet_name="Best_Per_Symbol")
-else:
-    # Initialize a new workbook with expected sheets
-    with pd.ExcelWriter(output_file, engine='openpyxl') as writer:
-        pd.DataFrame().to_excel(writer, index=False, sheet_name="All_Results")
-        pd.DataFrame().to_excel(writer, index=False, sheet_name="Best_Per_Symbol")
-
-# Navigate to the correct chart
-driver.get(TRADINGVIEW_URL)
-
-# Save full HTML for inspection
-html = driver.page_source
-# Smart wait for the page to load instead of fixed sleep
+# === Browser helpers (one attached Chrome per remote debugging port) ===
+DEBUG_PORT = 9222  # first port; old/launch_8_chrome.py opens 9222..9229
+ATR_INPUT_XPATH = "//div[contains(text(),'ATR Stop Multiplier') or contains(text(),'Multiplicateur ATR')]/parent::div/following-sibling::div//input"
+RR_INPUT_XPATH = "//div[contains(text(),'Base Risk/Reward Ratio') or contains(text(),'Ratio Risque/Rendement de base')]/parent::div/following-sibling::div//input"
+VOL_INPUT_XPATH = "//div[contains(text(),'Dynamic: Min Volatility Multiplier') or contains(text(),'Multiplicateur minimal de volatilité dynamique')]/parent::div/following-sibling::div//input"
+PROFIT_LABEL_XPATH = "//div[contains(text(),'Profit net') or contains(text(),'Total P&L')]"
+SNACKBAR_CLASS = "snackbarLayer-_MKqWk5g"
+BASE_ATR = 1.2
+BASE_RR = 2.7
+BASE_VOL_MULT = 0.8
+
 from selenium.webdriver.support.ui import WebDriverWait
 from selenium.webdriver.support import expected_conditions as EC
 
-print("Log into TradingView manually if needed. Starting tests...")
 
-# Confirmation pour les tests longs
-if args.level == 'FULL':
-    estimated_hours = (GLOBAL_TOTAL_COMBOS * 4.0) / 3600
-    print(f"⚠️  ATTENTION: Vous avez sélectionné le niveau FULL")
-    print(f"⏱️  Temps estimé: ~{estimated_hours:.1f}h ({estimated_hours*24:.1f} jours)")
-    confirm = input("🤔 Êtes-vous sûr de vouloir continuer? (tapez 'OUI' pour confirmer): ")
-    if confirm != 'OUI':
-        print("❌ Test annulé.")
-        driver.quit()
-        exit()
-
-print(f"\n🚀 DÉMARRAGE DU TEST NIVEAU {args.level}")
-print(f"📊 {GLOBAL_TOTAL_COMBOS:,} tests au total")
-
-results = []
-
-# Get all currencies in the list
-# currencies = driver.find_elements(By.XPATH, "//div[@data-symbol-full]")
-# currency_divs = [{'name': currency.text.split("\n")[0], 'element' : currency} for currency in currencies]
-# print("Available currencies:", [currency['name'] for currency in currency_divs])
-
-for currency in SYMBOL_LIST:
-    results = []
-    tests_since_last_save = 0
-    symbol_done = 0
-    symbol_total = TOTAL_COMBOS_PER_SYMBOL
-    print("")  # ensure a fresh line for progress
-    symbol_name = currency
-    # Option pour skip les devises déjà complètes (activable via CLI)
-    if args.skip_complete:
-        combos_tested = 0
-        for atr in ATR_MULTIPLIERS:
-            for rr in RR_VALUES:
-                for vol_mult in VOL_MULTIPLIERS:
-                    row_key = _key(symbol_name, atr, rr, vol_mult)
-                    if row_key in existing_rows:
-                        combos_tested += 1
-        if combos_tested >= TOTAL_COMBOS_PER_SYMBOL:
-            print(f"[SKIP] {symbol_name}: tous les combos déjà testés ({combos_tested}/{TOTAL_COMBOS_PER_SYMBOL})")
-            continue
-    # Click on the currency to open its chart
+def attach_driver(port: int = DEBUG_PORT, headless: bool = False):
+    """Attach to the Chrome listening on `port`, or launch a fresh headless one (--headless, e.g. tv_fixture.py)."""
+    options = Options()
+    options.add_argument("--window-size=1920,1080")
+    if headless:
+        options.add_argument("--headless=new")
+    else:
+        options.debugger_address = f"127.0.0.1:{port}"
+    driver = webdriver.Chrome(options=options)
+    driver.set_script_timeout(REPORT_TIMEOUT_SEC + 5)
+    return driver
+
+
+def _settle(driver, seconds: float, xpath: str, timeout: float = 10):
+    """--wait fixed: sleep `seconds`; --wait observer: return as soon as `xpath` is in the page."""
+    if WAIT_MODE == "fixed":
+        time.sleep(seconds)
+        return
+    try:
+        WebDriverWait(driver, timeout, poll_frequency=0.05).until(
+            EC.presence_of_element_located((By.XPATH, xpath))
+        )
+    except Exception:
+        pass  # let the next step fail (and retry) if the page really is not there
+
+
+def open_symbol_chart(driver, currency: str):
+    """Load the chart for `currency` and open the strategy settings (Command+P on Mac)."""
     with timed("symbol_change"):
-        driver.get(f"https://www.tradingview.com/chart/0RKjg68o/?symbol=PEPPERSTONE:{currency}")
-        time.sleep(5)  # Wait for the chart to load
-    print(f"Testing symbol: {symbol_name}")
-    # Open settings using Command+P (Mac)
+        driver.get(f"{TRADINGVIEW_URL}?symbol=PEPPERSTONE:{currency}")
+        _settle(driver, 5, PROFIT_LABEL_XPATH, timeout=30)  # Wait for the chart and report to load
+    print(f"Testing symbol: {currency}")
     actions = ActionChains(driver)
     with timed("open_settings_cmdP"):
         actions.key_down(Keys.COMMAND).send_keys('p').key_up(Keys.COMMAND).perform()
-    time.sleep(2)
-    for atr in ATR_MULTIPLIERS:
-        for rr in RR_VALUES:
-            for vol_mult in VOL_MULTIPLIERS:
-                # === Skip already-tested combinations (use in-memory cache) ===
-                row_key = _key(symbol_name, atr, rr, vol_mult)
-                if row_key in existing_rows:
-                    # Append cached row so we keep a full local results list for symbol
-                    cached = existing_rows[row_key].copy()
-                    # Ensure Symbol column matches current symbol (sheet merge safety)
-                    cached["Symbol"] = symbol_name
-                    results.append(cached)
-                    tests_since_last_save += 1
-                    if tests_since_last_save >= AUTOSAVE_ROWS_THRESHOLD:
-                        with timed("autosave"):
-                            autosave_and_update(output_file, symbol_name, results)
-                        tests_since_last_save = 0
-                    # progress for skipped (cached) combo
-                    symbol_done += 1
-                    global_done_combos += 1
-                    _print_progress(symbol_name, symbol_done, symbol_total, global_done_combos, GLOBAL_TOTAL_COMBOS)
-                    continue
-                success = False
-                for attempt in range(3):
-                    print(f"Testing ATR={atr}, RR={rr}, VM={vol_mult}, Attempt={attempt+1}")
-                    combo_t0 = time.perf_counter()
-                    set_inputs_t0 = time.perf_counter()
-                    with timed("edit_inputs_total"):
-                        # ATR input
-                        with timed("edit_input_ATR"):
-                            atr_input = driver.find_element(
-                                By.XPATH,
-                                "//div[contains(text(),'ATR Stop Multiplier') or contains(text(),'Multiplicateur ATR')]/parent::div/following-sibling::div//input"
-                            )
-                            atr_input.send_keys(Keys.COMMAND + "a")
-                            actions.key_down(Keys.COMMAND).send_keys('a').key_up(Keys.COMMAND).perform()
-                            time.sleep(0.1)
-                            atr_input.send_keys(Keys.BACKSPACE)
-                            atr_input.send_keys(str(atr))
-
-                        # RR input
-                        with timed("edit_input_RR"):
-                            rr_input = driver.find_element(
-                                By.XPATH,
-                                "//div[contains(text(),'Base Risk/Reward Ratio') or contains(text(),'Ratio Risque/Rendement de base')]/parent::div/following-sibling::div//input"
-                            )
-                            rr_input.send_keys(Keys.COMMAND + "a")
-                            actions.key_down(Keys.COMMAND).send_keys('a').key_up(Keys.COMMAND).perform()
-                            rr_input.send_keys(Keys.BACKSPACE)
-                            rr_input.send_keys(str(rr))
-
-                        # Volatility Multiplier input (Dynamic: Min Volatility Multiplier)
-                        with timed("edit_input_VolMult"):
-                            vol_input = driver.find_element(
-                                By.XPATH,
-                                "//div[contains(text(),'Dynamic: Min Volatility Multiplier') or contains(text(),'Multiplicateur minimal de volatilité dynamique')]/parent::div/following-sibling::div//input"
-                            )
-                            vol_input.send_keys(Keys.COMMAND + "a")
-                            actions.key_down(Keys.COMMAND).send_keys('a').key_up(Keys.COMMAND).perform()
-                            vol_input.send_keys(Keys.BACKSPACE)
-                            vol_input.send_keys(str(vol_mult))
-
-                        actions.send_keys(Keys.TAB).perform()
-                    with timed("wait_snackbar_hide"):
-                        try:
-                            WebDriverWait(driver, 3).until_not(
-                                EC.presence_of_element_located((By.CLASS_NAME, "snackbarLayer-_MKqWk5g"))
-                            )
-                        except:
-                            pass
-                    # Attendre que le texte "Profit net" ou "Total P&L" soit présent
-                    with timed("wait_profit_locator"):
-                        WebDriverWait(driver, 10).until(
-                            EC.presence_of_element_located((By.XPATH, "//div[contains(text(),'Profit net') or contains(text(),'Total P&L')]"))
-                        )
-                    with timed("scrape_metrics"):
-                        # Get Net Profit
-                        net_profit_elem = driver.find_element(By.XPATH, "//div[contains(text(),'Profit net') or contains(text(),'Total P&L')]/parent::div/following-sibling::div/div[3]")
-                        net_profit = net_profit_elem.text
-                        # Normalize various unicode minus/dash characters and spaces so the sign is preserved
-                        net_profit = net_profit.replace('\u2212', '-')  # unicode minus → ASCII minus
-                        net_profit = net_profit.replace('\u2013', '-')  # en dash → ASCII minus
-                        net_profit = net_profit.replace('\u202f', '')   # thin space
-                        net_profit = net_profit.replace('\xa0', '')     # non-breaking space
-                        net_profit = net_profit.replace(' ', '')
-                        net_profit = net_profit.replace(',', '.')       # decimal comma to dot
-                        # Keep only digits, dot, plus and minus (sign)
-                        net_profit = re.sub(r'[^0-9.\-\+]', '', net_profit).strip()
-
-                        # Win Rate
-                        win_rate_elem = driver.find_element(By.XPATH, "//div[contains(text(),'Pourcentage de trades gagnants') or contains(text(),'Profitable trades')]/parent::div/following-sibling::div/div[1]")
-                        win_rate = win_rate_elem.text
-
-                        # Drawdown
-                        drawdown_elem = driver.find_element(By.XPATH, "//div[contains(text(),'Drawdown') or contains(text(),'drawdown')]/parent::div/following-sibling::div/div[3]")
-                        drawdown = drawdown_elem.text
-                        drawdown = drawdown.replace('€', '').replace('£', '').replace('%', '')
-                        drawdown = drawdown.replace(',', '.').strip()
-
-                        # Total trades
-                        total_trades_elem = driver.find_element(By.XPATH, "//div[contains(text(),'Total des trades') or contains(text(),'Total trades')]/parent::div/following-sibling::div")
-                        total_trades = total_trades_elem.text
-                        total_trades = total_trades.replace('\u202f', '').replace(' ', '')
-                        total_trades = ''.join(ch for ch in total_trades if ch.isdigit())
-
-                        # Profit factor
-                        profit_factor_elem = driver.find_element(By.XPATH, "//div[contains(text(),'Profit factor') or contains(text(),'Profit factor')]/parent::div/following-sibling::div")
-                        profit_factor = profit_factor_elem.text.replace('x', '').replace(',', '.').strip()
-
-                    print(f"Net Profit: {net_profit}, Win Rate: {win_rate}, Drawdown: {drawdown}, Total Trades: {total_trades}, Profit Factor: {profit_factor}")
-
-                    results.append({
-                        "ATR Multiplier": atr,
-                        "RR": rr,
-                        "Vol Multiplier": vol_mult,
-                        "Net Profit": net_profit,
-                        "Win Rate": win_rate,
-                        "drawdown": drawdown,
-                        "Total Trades": total_trades,
-                        "Profit Factor": profit_factor
-                    })
-                    combo_dt = time.perf_counter() - combo_t0
-                    _append_combo_timing_row(symbol_name, atr, rr, vol_mult,
-                                             combo_total=combo_dt)
-                    tests_since_last_save += 1
-                    if tests_since_last_save >= AUTOSAVE_ROWS_THRESHOLD:
-                        with timed("autosave"):
-                            autosave_and_update(output_file, symbol_name, results)
-                        tests_since_last_save = 0
-                    combo_time_window.append(combo_dt)
-                    symbol_done += 1
-                    global_done_combos += 1
-                    _print_progress(symbol_name, symbol_done, symbol_total, global_done_combos, GLOBAL_TOTAL_COMBOS)
-                    success = True
-                    break
-                if not success:
-                    results.append({
-                        "ATR Multiplier": atr,
-                        "RR": rr,
-                        "Vol Multiplier": vol_mult,
-                        "Net Profit": "Error",
-                        "Win Rate": "Error",
-                        "drawdown": "Error",
-                        "Total Trades": "Error",
-                        "Profit Factor": "Error"
-                    })
-                    tests_since_last_save += 1
-                    if tests_since_last_save >= AUTOSAVE_ROWS_THRESHOLD:
-                        with timed("autosave"):
-                            autosave_and_update(output_file, symbol_name, results)
-                        tests_since_last_save = 0
-                    combo_time_window.append(_avg_combo_seconds())
-                    symbol_done += 1
-                    global_done_combos += 1
-                    _print_progress(symbol_name, symbol_done, symbol_total, global_done_combos, GLOBAL_TOTAL_COMBOS)
-                time.sleep(0.1)
-
-    # Final autosave for any remaining unsaved results for this symbol
-    with timed("autosave"):
-        autosave_and_update(output_file, symbol_name, results)
-    print("")  # finalize the progress line for this symbol
-    # Results are already persisted & deduplicated by autosave_and_update.
-    # Proceed with parameter reset for the next symbol.
-    with timed("finalize_symbol"):
-        finalize_symbol(output_file, symbol_name)
-    # Reset to base parameters
+        _settle(driver, 2, ATR_INPUT_XPATH)
+    return actions
+
+
+# In-page symbol switch (--symbol-switch inpage): the chart's TradingViewApi loads the new ticker
+# without a page load, so the strategy, its inputs and the settings dialog stay as they are.
+SYMBOL_SWITCH = "inpage"  # inpage | reload (--symbol-switch)
+SYMBOL_TIMEOUT_SEC = 30
+INPAGE_MAX_FAILURES = 3  # consecutive failed in-page switches before reloading for the rest of the run
+
+SET_SYMBOL_JS = """
+const [ticker, timeoutMs] = arguments;
+const done = arguments[arguments.length - 1];
+const api = window.TradingViewApi;
+if (!api || typeof api.activeChart !== "function") { done("unavailable"); return; }
+let finished = false;
+const finish = status => { if (!finished) { finished = true; done(status); } };
+setTimeout(() => finish("timeout"), timeoutMs);
+try {
+    api.activeChart().setSymbol(ticker, () => finish("ok"));
+} catch (e) {
+    finish("error: " + e);
+}
+"""
+
+
+def switch_symbol_inpage(driver, currency: str, session: dict) -> bool:
+    """Change the ticker of the loaded chart and wait for the strategy report of the new symbol.
+    The inputs already in the dialog are kept (session["applied"]). Returns False when the switch
+    failed; the caller then falls back to reset_params + open_symbol_chart for this symbol. A page
+    without the chart API disables in-page switching for the session (session["inpage"])."""
+    with timed("symbol_change"):
+        applied = session["applied"]
+        try:
+            if WAIT_MODE == "observer":
+                # Always re-armed: the last combo's watch is disconnected and already marked rewritten
+                on_screen = arm_report_watch(driver)
+                previous = applied.get("report") or _complete_report(on_screen)
+            status = driver.execute_async_script(SET_SYMBOL_JS, f"PEPPERSTONE:{currency}", SYMBOL_TIMEOUT_SEC * 1000)
+        except Exception as e:
+            status = f"error: {e}"
+        if status != "ok":
+            print(f"In-page symbol switch to {currency} failed ({status}), reloading the chart.")
+            if status == "unavailable":
+                session["inpage"] = False  # no API on this page: it will never work
+            return False
+        if WAIT_MODE == "observer":
+            # Report of the new symbol for the inputs still in the dialog
+            try:
+                applied["report"] = wait_report_update(driver, previous)
+            except Exception as e:
+                print(f"Report of {currency} not loaded after the in-page switch ({e}), reloading the chart.")
+                return False
+        else:
+            time.sleep(2)
+            applied.pop("report", None)
+    print(f"Testing symbol: {currency}")
+    if not driver.find_elements(By.XPATH, ATR_INPUT_XPATH):
+        # The dialog did not survive the switch: reopen it, the inputs keep their values
+        with timed("open_settings_cmdP"):
+            session["actions"].key_down(Keys.COMMAND).send_keys('p').key_up(Keys.COMMAND).perform()
+            _settle(driver, 2, ATR_INPUT_XPATH)
+    return True
+
+
+def _set_input(driver, actions, xpath: str, value, settle: float = 0.0):
+    field = driver.find_element(By.XPATH, xpath)
+    field.send_keys(Keys.COMMAND + "a")
+    actions.key_down(Keys.COMMAND).send_keys('a').key_up(Keys.COMMAND).perform()
+    if settle:
+        time.sleep(settle)
+    field.send_keys(Keys.BACKSPACE)
+    field.send_keys(str(value))
+
+
+def _input_holds(driver, xpath: str, value) -> bool:
+    """True when the dialog field already shows `value` (typing it again would not recompute)."""
+    try:
+        text = driver.find_element(By.XPATH, xpath).get_attribute("value") or ""
+        return float(text.replace(",", ".")) == float(value)
+    except Exception:
+        return False
+
+
+def set_inputs(driver, actions, atr, rr, vol_mult, applied: dict) -> int:
+    """Edit only the inputs whose value differs from `applied` (values currently in the dialog,
+    plus the last report read under "report"). An input missing from `applied` (fresh chart, retry)
+    is read back from the dialog first. Returns the number of inputs actually edited."""
+    edited = 0
+    with timed("edit_inputs_total"):
+        for key, xpath, value, label, settle in (
+                ("atr", ATR_INPUT_XPATH, atr, "edit_input_ATR", 0.1),
+                ("rr", RR_INPUT_XPATH, rr, "edit_input_RR", 0.0),
+                # Volatility Multiplier input (Dynamic: Min Volatility Multiplier)
+                ("vol", VOL_INPUT_XPATH, vol_mult, "edit_input_VolMult", 0.0)):
+            if applied.get(key) == value:
+                continue
+            if key not in applied and _input_holds(driver, xpath, value):
+                applied[key] = value
+                continue
+            with timed(label):
+                _set_input(driver, actions, xpath, value, settle=settle)
+            applied[key] = value
+            edited += 1
+        actions.send_keys(Keys.TAB).perform()
+    return edited
+
+
+def snake_combos(*axes):
+    """Boustrophedon (reflected Gray code) path over the grid: each axis is walked forward then
+    backward, so consecutive combos differ in exactly one value."""
+    if not axes:
+        yield ()
+        return
+    inner = list(snake_combos(*axes[1:]))
+    for i, value in enumerate(axes[0]):
+        for rest in (inner if i % 2 == 0 else reversed(inner)):
+            yield (value,) + rest
+
+
+# Strategy-tester report cells, shared by both scrape modes
+METRIC_XPATHS = {
+    "Net Profit": PROFIT_LABEL_XPATH + "/parent::div/following-sibling::div/div[3]",
+    "Win Rate": "//div[contains(text(),'Pourcentage de trades gagnants') or contains(text(),'Profitable trades')]/parent::div/following-sibling::div/div[1]",
+    "drawdown": "//div[contains(text(),'Drawdown') or contains(text(),'drawdown')]/parent::div/following-sibling::div/div[3]",
+    "Total Trades": "//div[contains(text(),'Total des trades') or contains(text(),'Total trades')]/parent::div/following-sibling::div",
+    "Profit Factor": "//div[contains(text(),'Profit factor') or contains(text(),'Profit factor')]/parent::div/following-sibling::div",
+}
+SCRAPE_MODE = "js"  # js: one execute_script round trip; xpath: one find_element per metric (--scrape)
+
+# Evaluates every metric XPath in the page and returns {metric: innerText or null}
+SCRAPE_JS = """
+const xpaths = arguments[0];
+const out = {};
+for (const [name, xp] of Object.entries(xpaths)) {
+    const node = document.evaluate(xp, document, null, XPathResult.FIRST_ORDERED_NODE_TYPE, null).singleNodeValue;
+    out[name] = node ? node.innerText : null;
+}
+return out;
+"""
+
+
+def _normalize_metrics(raw: dict) -> dict:
+    """Clean the raw report texts in one step (same rules for both scrape modes)."""
+    net_profit = raw["Net Profit"]
+    # Normalize various unicode minus/dash characters and spaces so the sign is preserved
+    net_profit = net_profit.replace('\u2212', '-')  # unicode minus → ASCII minus
+    net_profit = net_profit.replace('\u2013', '-')  # en dash → ASCII minus
+    net_profit = net_profit.replace('\u202f', '')   # thin space
+    net_profit = net_profit.replace('\xa0', '')     # non-breaking space
+    net_profit = net_profit.replace(' ', '')
+    net_profit = net_profit.replace(',', '.')       # decimal comma to dot
+    # Keep only digits, dot, plus and minus (sign)
+    net_profit = re.sub(r'[^0-9.\-\+]', '', net_profit).strip()
+
+    drawdown = raw["drawdown"].replace('€', '').replace('£', '').replace('%', '')
+    drawdown = drawdown.replace(',', '.').strip()
+
+    total_trades = raw["Total Trades"].replace('\u202f', '').replace(' ', '')
+    total_trades = ''.join(ch for ch in total_trades if ch.isdigit())
+
+    profit_factor = raw["Profit Factor"].replace('x', '').replace(',', '.').strip()
+
+    return {
+        "Net Profit": net_profit,
+        "Win Rate": raw["Win Rate"],
+        "drawdown": drawdown,
+        "Total Trades": total_trades,
+        "Profit Factor": profit_factor
+    }
+
+
+def _scrape_raw_js(driver) -> dict:
+    raw = driver.execute_script(SCRAPE_JS, METRIC_XPATHS)
+    missing = [name for name, text in raw.items() if text is None]
+    if missing:
+        raise ValueError(f"metrics not found in report: {missing}")
+    return raw
+
+
+def _scrape_raw_xpath(driver) -> dict:
+    return {name: driver.find_element(By.XPATH, xp).text for name, xp in METRIC_XPATHS.items()}
+
+
+# Event-driven wait (--wait observer). arm_report_watch() runs before the inputs are edited: it
+# snapshots the report and records when its nodes are re-rendered. wait_report_update() then
+# resolves as soon as the report differs from the previous combo's ("changed"), or, for results
+# identical to the previous combo, once the report was re-rendered since arming and has been
+# quiet for QUIET_MS ("settled"). A timeout raises, so run_combo retries instead of saving the row.
+REPORT_TIMEOUT_SEC = 10
+REPORT_QUIET_MS = 250
+WAIT_MODE = "observer"  # observer | fixed (--wait)
+
+_READ_REPORT_JS = """
+const xpaths = arguments[0];
+const nodes = () => Object.values(xpaths).map(
+    xp => document.evaluate(xp, document, null, XPathResult.FIRST_ORDERED_NODE_TYPE, null).singleNodeValue);
+const read = () => {
+    const out = {};
+    for (const [name, xp] of Object.entries(xpaths)) {
+        const node = document.evaluate(xp, document, null, XPathResult.FIRST_ORDERED_NODE_TYPE, null).singleNodeValue;
+        out[name] = node ? node.innerText : null;
+    }
+    return out;
+};
+const complete = r => Object.values(r).every(v => v !== null);
+"""
+
+ARM_REPORT_JS = _READ_REPORT_JS + """
+if (window.__reportWatch) window.__reportWatch.observer.disconnect();
+const watch = {rewritten: false, last: performance.now(), nodes: nodes()};
+watch.observer = new MutationObserver(records => {
+    // Only the report cells count: the chart itself mutates on every tick
+    const current = nodes();
+    const replaced = current.some((node, i) => node !== watch.nodes[i]);
+    if (replaced || records.some(rec => watch.nodes.some(node => node && node.contains(rec.target)))) {
+        watch.rewritten = true;
+        watch.last = performance.now();
+        watch.nodes = current;
+    }
+});
+watch.observer.observe(document.body, {subtree: true, childList: true, characterData: true});
+window.__reportWatch = watch;
+return read();
+"""
+
+WAIT_REPORT_JS = _READ_REPORT_JS + """
+const [, previous, timeoutMs, quietMs, expectUpdate] = arguments;
+const done = arguments[arguments.length - 1];
+const watch = window.__reportWatch || null;
+const before = previous === null ? null : JSON.stringify(previous);
+let finished = false, observer = null, poll = null, hardTimer = null;
+const finish = (status, metrics) => {
+    if (finished) return;
+    finished = true;
+    observer.disconnect();
+    clearInterval(poll);
+    clearTimeout(hardTimer);
+    // On timeout the watch keeps running: run_combo's retry still sees a late re-render
+    if (watch && status !== "timeout") watch.observer.disconnect();
+    done({status: status, metrics: metrics || read()});
+};
+const check = () => {
+    const r = read();
+    if (!complete(r)) return;
+    if (before !== null && JSON.stringify(r) !== before) { finish("changed", r); return; }
+    // Same values as before: proven only if the report was re-rendered since arm_report_watch
+    // (or no input was edited at all), then quiet for quietMs
+    const proven = !expectUpdate || (watch !== null && watch.rewritten);
+    if (proven && performance.now() - (watch ? watch.last : 0) >= quietMs) finish("settled", r);
+};
+observer = new MutationObserver(check);
+observer.observe(document.body, {subtree: true, childList: true, characterData: true});
+poll = setInterval(check, Math.max(20, quietMs / 4));
+hardTimer = setTimeout(() => finish("timeout"), timeoutMs);
+check();  // the report may already have been refreshed before this script ran
+"""
+
+
+def arm_report_watch(driver) -> dict:
+    """Start watching the report cells before editing the inputs; returns the report on screen."""
+    return driver.execute_script(ARM_REPORT_JS, METRIC_XPATHS)
+
+
+def wait_report_update(driver, previous, expect_update: bool = True) -> dict:
+    """Block until the strategy report is recomputed; returns the raw report texts.
+    `previous` is the report before the edit; expect_update=False when no input actually changed
+    (the report on screen is already the right one). Raises TimeoutError when nothing proves the
+    report was recomputed within REPORT_TIMEOUT_SEC."""
+    t0 = time.perf_counter()
+    res = driver.execute_async_script(WAIT_REPORT_JS, METRIC_XPATHS, previous,
+                                      REPORT_TIMEOUT_SEC * 1000, REPORT_QUIET_MS, expect_update)
+    # One label per outcome (changed / settled / timeout) so the summary shows how each wait ended
+    record_timing(f"wait_report_{res['status']}", t0, time.perf_counter())
+    if res["status"] == "timeout":
+        raise TimeoutError(f"report not recomputed after {REPORT_TIMEOUT_SEC}s")
+    missing = [name for name, text in res["metrics"].items() if text is None]
+    if missing:
+        raise ValueError(f"metrics not found in report: {missing}")
+    return res["metrics"]
+
+
+def _complete_report(raw):
+    return raw if raw and all(text is not None for text in raw.values()) else None
+
+
+def scrape_metrics(driver, applied: dict, previous=None, expect_update: bool = True) -> dict:
+    """`previous`/`expect_update` (--wait observer): report before the edit and whether an input
+    changed since arm_report_watch()."""
+    if WAIT_MODE == "observer":
+        raw = wait_report_update(driver, previous, expect_update)
+        if SCRAPE_MODE == "xpath":
+            with timed("scrape_metrics"):
+                raw = _scrape_raw_xpath(driver)
+        applied["report"] = raw
+        return _normalize_metrics(raw)
+    with timed("wait_snackbar_hide"):
+        try:
+            WebDriverWait(driver, 3).until_not(
+                EC.presence_of_element_located((By.CLASS_NAME, SNACKBAR_CLASS))
+            )
+        except:
+            pass
+    # Attendre que le texte "Profit net" ou "Total P&L" soit présent
+    with timed("wait_profit_locator"):
+        WebDriverWait(driver, 10).until(
+            EC.presence_of_element_located((By.XPATH, PROFIT_LABEL_XPATH))
+        )
+    with timed("scrape_metrics"):
+        raw = _scrape_raw_js(driver) if SCRAPE_MODE == "js" else _scrape_raw_xpath(driver)
+    return _normalize_metrics(raw)
+
+
+def run_combo(driver, actions, symbol_name: str, atr, rr, vol_mult, applied: dict):
+    """Test one combination (3 attempts). Returns (row, combo_dt); combo_dt is None on failure."""
+    previous, edited, armed = applied.get("report"), 0, False
+    for attempt in range(3):
+        print(f"Testing ATR={atr}, RR={rr}, VM={vol_mult}, Attempt={attempt+1}")
+        combo_t0 = time.perf_counter()
+        try:
+            if WAIT_MODE == "observer" and not armed:
+                # Armed once per combo, before any edit: a retry still sees a late re-render
+                on_screen = arm_report_watch(driver)
+                previous, armed = previous or _complete_report(on_screen), True
+            edited += set_inputs(driver, actions, atr, rr, vol_mult, applied)
+            metrics = scrape_metrics(driver, applied, previous, expect_update=edited > 0)
+        except Exception as e:
+            print(f"[{symbol_name}] ATR={atr}, RR={rr}, VM={vol_mult} failed: {e}")
+            applied.clear()  # dialog state unknown: rewrite every input on retry
+            continue
+        print(f"Net Profit: {metrics['Net Profit']}, Win Rate: {metrics['Win Rate']}, Drawdown: {metrics['drawdown']}, "
+              f"Total Trades: {metrics['Total Trades']}, Profit Factor: {metrics['Profit Factor']}")
+        combo_dt = time.perf_counter() - combo_t0
+        _append_combo_timing_row(symbol_name, atr, rr, vol_mult, combo_total=combo_dt)
+        return {"ATR Multiplier": atr, "RR": rr, "Vol Multiplier": vol_mult, **metrics}, combo_dt
+    return {
+        "ATR Multiplier": atr,
+        "RR": rr,
+        "Vol Multiplier": vol_mult,
+        "Net Profit": "Error",
+        "Win Rate": "Error",
+        "drawdown": "Error",
+        "Total Trades": "Error",
+        "Profit Factor": "Error"
+    }, None
+
+
+def reset_params(driver):
+    """Reset the strategy inputs to their base values and close the settings dialog."""
     with timed("reset_params"):
-        BASE_ATR = 1.2
-        BASE_RR = 2.7
-        BASE_VOL_MULT = 0.8
         actions = ActionChains(driver)
         actions.key_down(Keys.COMMAND).send_keys('p').key_up(Keys.COMMAND).perform()
-        time.sleep(2)
-
-        # ATR input
-        atr_input = driver.find_element(
-            By.XPATH,
-            "//div[contains(text(),'ATR Stop Multiplier') or contains(text(),'Multiplicateur ATR')]/parent::div/following-sibling::div//input"
-        )
-        atr_input.send_keys(Keys.COMMAND + "a")
-        actions.key_down(Keys.COMMAND).send_keys('a').key_up(Keys.COMMAND).perform()
-        time.sleep(1)  # Ensure input is cleared
-        atr_input.send_keys(Keys.BACKSPACE)
-        atr_input.send_keys(str(BASE_ATR))
-
-        # RR input
-        rr_input = driver.find_element(
-            By.XPATH,
-            "//div[contains(text(),'Base Risk/Reward Ratio') or contains(text(),'Ratio Risque/Rendement de base')]/parent::div/following-sibling::div//input"
-        )
-        rr_input.send_keys(Keys.COMMAND + "a")
-        actions.key_down(Keys.COMMAND).send_keys('a').key_up(Keys.COMMAND).perform()
-        time.sleep(1)  # Ensure input is cleared
-        rr_input.send_keys(Keys.BACKSPACE)
-        rr_input.send_keys(str(BASE_RR))
-
-        # Volatility Multiplier input (Dynamic: Min Volatility Multiplier)
-        vol_input = driver.find_element(
-            By.XPATH,
-            "//div[contains(text(),'Dynamic: Min Volatility Multiplier') or contains(text(),'Multiplicateur minimal de volatilité dynamique')]/parent::div/following-sibling::div//input"
-        )
-        vol_input.send_keys(Keys.COMMAND + "a")
-        actions.key_down(Keys.COMMAND).send_keys('a').key_up(Keys.COMMAND).perform()
-        vol_input.send_keys(Keys.BACKSPACE)
-        vol_input.send_keys(str(BASE_VOL_MULT))
+        _settle(driver, 2, ATR_INPUT_XPATH)
+        settle = 1 if WAIT_MODE == "fixed" else 0.1  # Ensure input is cleared
+        _set_input(driver, actions, ATR_INPUT_XPATH, BASE_ATR, settle=settle)
+        _set_input(driver, actions, RR_INPUT_XPATH, BASE_RR, settle=settle)
+        _set_input(driver, actions, VOL_INPUT_XPATH, BASE_VOL_MULT)
 
         # Wait until snackbar disappears if present
         try:
-            WebDriverWait(driver, 5).until_not(
-                EC.presence_of_element_located((By.CLASS_NAME, "snackbarLayer-_MKqWk5g"))
+            WebDriverWait(driver, 5, poll_frequency=0.05).until_not(
+                EC.presence_of_element_located((By.CLASS_NAME, SNACKBAR_CLASS))
             )
         except:
             pass  # Ignore if not found or timeout
         close_button = driver.find_element(By.XPATH, "//button[@data-name='submit-button']")
         close_button.click()
-        time.sleep(2)
+        if WAIT_MODE == "fixed":
+            time.sleep(2)
+        else:
+            try:
+                WebDriverWait(driver, 5, poll_frequency=0.05).until(EC.staleness_of(close_button))
+            except Exception:
+                pass
         print("Strategy parameters reset to default values.")
 
 
-# Results are already persisted & deduplicated by autosave_and_update.
-# Remove the final manual All_Results rebuild block entirely.
-print(f"Backtesting complete. Results saved to {output_file}")
+def sweep_units(driver, units, session=None, reset_at_end=True):
+    """Run (symbol, atr, rr, vol) units on one browser, yielding (symbol, row, combo_dt).
+    The symbol is only switched when it changes (in page, or by reloading the chart); inputs are only
+    edited when their value changes.
+    `session` (open symbol, applied inputs) can be kept across calls to chain several sweeps."""
+    session = {} if session is None else session
+    for symbol_name, atr, rr, vol_mult in units:
+        if symbol_name != session.get("symbol"):
+            switched = False
+            if session.get("symbol") is not None:
+                if SYMBOL_SWITCH == "inpage" and session.get("inpage", True):
+                    with span_context(symbol=symbol_name):
+                        switched = switch_symbol_inpage(driver, symbol_name, session)
+                    # A transient failure only reloads this symbol; reload for good after repeated ones
+                    session["inpage_failures"] = 0 if switched else session.get("inpage_failures", 0) + 1
+                    if session["inpage_failures"] >= INPAGE_MAX_FAILURES:
+                        print(f"In-page symbol switch failed {INPAGE_MAX_FAILURES} times in a row, "
+                              f"reloading the chart from now on.")
+                        session["inpage"] = False
+                if not switched:
+                    with span_context(symbol=session["symbol"]):
+                        reset_params(driver)
+            if not switched:
+                with span_context(symbol=symbol_name):
+                    session["actions"] = open_symbol_chart(driver, symbol_name)
+                session["applied"] = {}
+            session["symbol"] = symbol_name
+        with span_context(symbol=symbol_name, atr=atr, rr=rr, vol=vol_mult), timed("combo"):
+            row, combo_dt = run_combo(driver, session["actions"], symbol_name, atr, rr, vol_mult, session["applied"])
+        yield symbol_name, row, combo_dt
+        if WAIT_MODE == "fixed":
+            time.sleep(0.1)
+    if reset_at_end and session.get("symbol") is not None:
+        with span_context(symbol=session["symbol"]):
+            reset_params(driver)
+        session.clear()
+
+
+POOL_SEGMENT_COMBOS = 25  # combos handed to a browser at once
+
+
+def _drain(work_queue):
+    while True:
+        try:
+            yield from work_queue.get_nowait()
+        except queue.Empty:
+            return
+
+
+def _pool_worker(driver, port: int, work_queue, result_queue, session, reset_at_end):
+    try:
+        for item in sweep_units(driver, _drain(work_queue), session, reset_at_end):
+            result_queue.put(item)
+    except Exception as e:
+        print(f"[Worker {port}] stopped: {e}")
+    finally:
+        result_queue.put(None)
+
+
+def pool_rows(drivers: dict, units: list, sessions=None, reset_at_end=True):
+    """Browser pool: one thread per attached Chrome pulls units from a shared queue; rows come
+    back through a single result queue so the caller stays the only writer.
+    Units are queued as contiguous segments of the snake path so each browser still edits
+    a single input per combo."""
+    sessions = sessions if sessions is not None else {port: {} for port in drivers}
+    seg_len = max(1, min(POOL_SEGMENT_COMBOS, -(-len(units) // len(drivers))))
+    work_queue = queue.Queue()
+    segment = []
+    for unit in units:
+        if segment and (len(segment) >= seg_len or segment[-1][0] != unit[0]):
+            work_queue.put(segment)
+            segment = []
+        segment.append(unit)
+    if segment:
+        work_queue.put(segment)
+    result_queue = queue.Queue()
+    threads = [
+        threading.Thread(target=_pool_worker,
+                         args=(driver, port, work_queue, result_queue, sessions[port], reset_at_end),
+                         name=f"tv-worker-{port}", daemon=True)
+        for port, driver in drivers.items()
+    ]
+    for t in threads:
+        t.start()
+    running = len(threads)
+    while running:
+        item = result_queue.get()
+        if item is None:
+            running -= 1
+            continue
+        yield item
+    for t in threads:
+        t.join()
+
+
+# --engine local: process pool of local_sweep.py (no browser), started by main()
+_local_pool = None
+
+
+def sweep_rows(drivers: dict, units: list, sessions=None, reset_at_end=True):
+    """(symbol, row, combo_dt) for every unit: the local process pool with --engine local,
+    in the main thread with one browser, else the browser pool."""
+    if _local_pool is not None:
+        return local_sweep.local_rows(_local_pool, units)
+    if len(drivers) == 1:
+        port, driver = next(iter(drivers.items()))
+        return sweep_units(driver, units, None if sessions is None else sessions[port], reset_at_end)
+    return pool_rows(drivers, units, sessions, reset_at_end)
+
+
+def plan_symbol(symbol_name: str, combos):
+    """Split (atr, rr, vol) combos into cached rows (existing_rows) and units still to test."""
+    cached_rows = []
+    units = []
+    for atr, rr, vol_mult in combos:
+        # === Skip already-tested combinations (use in-memory cache) ===
+        row_key = _key(symbol_name, atr, rr, vol_mult)
+        if row_key in existing_rows:
+            cached = existing_rows[row_key].copy()
+            # Ensure Symbol column matches current symbol (sheet merge safety)
+            cached["Symbol"] = symbol_name
+            cached_rows.append(cached)
+        else:
+            units.append((symbol_name, atr, rr, vol_mult))
+    return cached_rows, units
+
+
+n_tested_combos = 0  # rows consumed by run_sweep (cached rows excluded)
+
+
+def run_sweep(rows, plan: dict, output_file: str, skip_complete: bool, global_total: int):
+    """Single writer: consume (symbol, row, combo_dt) and persist per symbol.
+    plan: symbol -> (cached rows, combos still to test), in sweep order.
+    Returns symbol -> rows (cached + tested)."""
+    global n_tested_combos
+    results = {s: [] for s in plan}
+    saved = dict.fromkeys(plan, 0)  # rows of results[symbol] already handed to save_results
+    remaining = {s: n for s, (_, n) in plan.items()}
+    symbol_total = {s: len(cached) + n for s, (cached, n) in plan.items()}
+    global_done = 0
+
+    def _save(symbol_name):
+        # Only the new rows: the symbol's frame in memory already holds the earlier ones
+        new_rows = results[symbol_name][saved[symbol_name]:]
+        saved[symbol_name] = len(results[symbol_name])
+        with timed("autosave"):
+            submit_write(save_results, output_file, symbol_name, new_rows)
+
+    def _add(symbol_name, row):
+        nonlocal global_done
+        results[symbol_name].append(row)
+        if len(results[symbol_name]) - saved[symbol_name] >= AUTOSAVE_ROWS_THRESHOLD:
+            _save(symbol_name)
+        global_done += 1
+        _print_progress(symbol_name, len(results[symbol_name]), symbol_total[symbol_name], global_done, global_total)
+
+    def _finish(symbol_name):
+        # Final autosave for any remaining unsaved results for this symbol
+        _save(symbol_name)
+        print("")  # finalize the progress line for this symbol
+        if results_db is None:
+            with timed("finalize_symbol"):
+                submit_write(finalize_symbol, output_file, symbol_name)
+            submit_write(save_cache_sidecar, output_file)
+        # The symbol is fully on disk before the sweep moves on
+        with timed("writer_flush"):
+            flush_writer()
+
+    for symbol_name, (cached_rows, n_todo) in plan.items():
+        print("")  # ensure a fresh line for progress
+        if skip_complete and n_todo == 0:
+            print(f"[SKIP] {symbol_name}: tous les combos déjà testés ({len(cached_rows)}/{symbol_total[symbol_name]})")
+            global_done += len(cached_rows)
+            results[symbol_name] = list(cached_rows)
+            continue
+        # Append cached rows so we keep a full local results list for symbol
+        for cached in cached_rows:
+            _add(symbol_name, cached)
+        if n_todo == 0:
+            _finish(symbol_name)
+
+    for symbol_name, row, combo_dt in rows:
+        with span_context(symbol=symbol_name):
+            if ROW_DURABILITY:
+                with timed("journal"):
+                    journal_append(symbol_name, row)
+                if results_db is not None:
+                    with timed("record_result"):
+                        submit_write(record_result, symbol_name, row)
+            n_tested_combos += 1
+            combo_time_window.append(combo_dt if combo_dt is not None else _avg_combo_seconds())
+            _add(symbol_name, row)
+            remaining[symbol_name] -= 1
+            if remaining[symbol_name] == 0:
+                _finish(symbol_name)
+
+    for symbol_name, n in remaining.items():
+        if n > 0 and results[symbol_name]:
+            print(f"\n⚠️  {symbol_name}: {n} combos non testés (worker arrêté), résultats partiels sauvegardés.")
+            _finish(symbol_name)
+    return results
+
+
+# === ADAPTIVE level: coarse seed over FULL's bounds, then densify around the top-k combos by Score ===
+_analysis = None
+
+
+def _analysis_module():
+    """selenium-test-analysis.py (hyphenated file name, so loaded by path)."""
+    global _analysis
+    if _analysis is None:
+        import importlib.util
+        path = os.path.join(os.path.dirname(os.path.abspath(__file__)), "selenium-test-analysis.py")
+        spec = importlib.util.spec_from_file_location("selenium_test_analysis", path)
+        _analysis = importlib.util.module_from_spec(spec)
+        spec.loader.exec_module(_analysis)
+    return _analysis
+
+
+def score_rows(symbol_name: str, rows: list) -> pd.DataFrame:
+    """Score tested rows like the analysis script (hard filters, then compute_score).
+    Falls back to every valid row when nothing passes the filters yet."""
+    analysis = _analysis_module()
+    df = _format_results_df(rows, symbol_name)
+    df = df.dropna(subset=["ATR Multiplier", "RR", "Vol Multiplier", "Net Profit Clean"])
+    filtered = analysis.apply_hard_filters(df)
+    return analysis.compute_score(filtered if not filtered.empty else df)
+
+
+def _lattice_neighbors(value: float, radius: float, step: float, lattice: list) -> list:
+    return [v for v in lattice
+            if abs(v - value) <= radius + 1e-9 and abs((v - value) / step - round((v - value) / step)) < 1e-6]
+
+
+def refine_combos(df_scored: pd.DataFrame, tested: set, config: dict, radius: float, step: float) -> list:
+    """Untested lattice combos within `radius` (every `step`) in ATR/RR and one lattice step in Vol
+    around the top-k scored combos, in snake order."""
+    wanted = set()
+    top = df_scored.nlargest(config['top_k'], "Score")
+    vol_step = round(config['VOL_MULTIPLIERS'][1] - config['VOL_MULTIPLIERS'][0], 10)
+    for atr, rr, vol_mult in top[["ATR Multiplier", "RR", "Vol Multiplier"]].itertuples(index=False, name=None):
+        for a in _lattice_neighbors(atr, radius, step, config['ATR_MULTIPLIERS']):
+            for r in _lattice_neighbors(rr, radius, step, config['RR_VALUES']):
+                for v in _lattice_neighbors(vol_mult, vol_step, vol_step, config['VOL_MULTIPLIERS']):
+                    wanted.add((a, r, v))
+    return [c for c in snake_combos(config['ATR_MULTIPLIERS'], config['RR_VALUES'], config['VOL_MULTIPLIERS'])
+            if c in wanted and c not in tested]
+
+
+def run_adaptive(drivers: dict, symbols: list, output_file: str, config: dict):
+    """Per symbol: run the seed grid, then refine around the best combos until no new combo appears."""
+    seed = config['seed']
+    sessions = {port: {} for port in drivers}
+    for symbol_name in symbols:
+        tested = {}  # (atr, rr, vol) -> row
+        todo = list(snake_combos(seed['ATR_MULTIPLIERS'], seed['RR_VALUES'], seed['VOL_MULTIPLIERS']))
+        for round_no in range(config['max_rounds']):
+            if not todo:
+                break
+            cached_rows, units = plan_symbol(symbol_name, todo)
+            print(f"\n🔎 {symbol_name} passe {round_no}: {len(todo)} combos ({len(cached_rows)} en cache)")
+            rows = sweep_rows(drivers, units, sessions, reset_at_end=False)
+            results = run_sweep(rows, {symbol_name: (cached_rows, len(units))}, output_file, True, len(todo))
+            for row in results[symbol_name]:
+                tested[(float(row["ATR Multiplier"]), float(row["RR"]), float(row["Vol Multiplier"]))] = row
+            radius, step = config['rounds'][min(round_no, len(config['rounds']) - 1)]
+            todo = refine_combos(score_rows(symbol_name, list(tested.values())), set(tested), config, radius, step)
+        print(f"🏁 {symbol_name}: {len(tested)} combos testés sur la grille ADAPTIVE")
+    for port, session in sessions.items():
+        if session.get("symbol") is not None:
+            reset_params(drivers[port])
+
+
+def main():
+    global results_db, ROW_DURABILITY, ACTIVE_WORKERS, SCRAPE_MODE, WAIT_MODE, TRACE_SPANS, TRADINGVIEW_URL, SYMBOL_SWITCH, _local_pool
+
+    # --- Argument parser pour options CLI ---
+    parser = argparse.ArgumentParser(description="Backtest TradingView avec Selenium")
+    parser.add_argument('--skip-complete', action='store_true', help='Ignorer les devises déjà complètes (tous les combos testés)')
+    parser.add_argument('--level', choices=list(TEST_LEVELS), default='FINE', 
+                       help='Niveau de test: COARSE (rapide, 75 combos), FINE (moyen, 726 combos), FULL (complet, 3906 combos), '
+                            'ADAPTIVE (grille grossière puis raffinement autour des meilleurs combos)')
+    parser.add_argument('--symbols', nargs='*', help='Symboles spécifiques à tester (ex: --symbols EURUSD GBPUSD)')
+    parser.add_argument('--backend', choices=['xlsx', 'sqlite'], default='xlsx',
+                       help="Persistance: xlsx (autosave Excel) ou sqlite (une ligne par combo, export xlsx en fin de run)")
+    parser.add_argument('--workers', type=int, default=1,
+                       help='Nombre de Chrome en parallèle, un par port de debug (--base-port, --base-port+1, ...)')
+    parser.add_argument('--base-port', type=int, default=DEBUG_PORT, help=f'Premier port de debug Chrome (défaut: {DEBUG_PORT})')
+    parser.add_argument('--scrape', choices=['js', 'xpath'], default=SCRAPE_MODE,
+                       help='Lecture des métriques: js (un seul execute_script par combo) ou xpath (un find_element par métrique)')
+    parser.add_argument('--wait', choices=['observer', 'fixed'], default=WAIT_MODE,
+                       help='Attente du recalcul: observer (MutationObserver sur le rapport) ou fixed (sleeps historiques)')
+    parser.add_argument('--rebuild-all-results', action='store_true',
+                       help='Réécrire la feuille All_Results du classeur du niveau puis quitter (sans navigateur)')
+    parser.add_argument('--trace', nargs='?', const='tv_trace.json', metavar='FICHIER',
+                       help='Enregistrer chaque étape chronométrée (trace Chrome, défaut: tv_trace.json) ; '
+                            'rapport: python trace_report.py tv_trace.json')
+    parser.add_argument('--url', default=TRADINGVIEW_URL,
+                       help='URL du graphique (ex: page locale de tv_fixture.py pour un bench hors ligne)')
+    parser.add_argument('--headless', action='store_true',
+                       help='Lancer un Chrome headless par worker au lieu de s\'attacher aux ports de debug')
+    parser.add_argument('--symbol-switch', choices=['inpage', 'reload'], default=SYMBOL_SWITCH,
+                       help='Changement de symbole: inpage (API du graphique, dialogue et paramètres conservés) '
+                            'ou reload (rechargement de la page + reset des paramètres)')
+    parser.add_argument('--engine', choices=['browser', 'local'], default='browser',
+                       help='browser (TradingView via Selenium) ou local (moteur NumPy sur le stockage de barres, sans navigateur)')
+    parser.add_argument('--jobs', type=int, default=None,
+                       help='--engine local uniquement: nombre de processus (défaut: un par cœur) ; '
+                            'le nombre de navigateurs reste fixé par --workers')
+    parser.add_argument('--store', default='bars', help='--engine local: répertoire du stockage de barres (bar_store.py)')
+    args = parser.parse_args()
+    SYMBOL_SWITCH = args.symbol_switch
+    TRADINGVIEW_URL = args.url
+    TRACE_SPANS = bool(args.trace)
+    SCRAPE_MODE = args.scrape
+    WAIT_MODE = args.wait
+    if args.workers < 1:
+        parser.error("--workers doit être >= 1")
+    if args.jobs is not None and args.engine != 'local':
+        parser.error("--jobs ne s'applique qu'à --engine local (navigateurs: --workers)")
+    if args.jobs is None:
+        args.jobs = os.cpu_count() or 1
+    if args.jobs < 1:
+        parser.error("--jobs doit être >= 1")
+
+    if args.rebuild_all_results:
+        output_file = results_store.xlsx_path_for_level(args.level, args.engine)
+        if not os.path.exists(output_file):
+            print(f"❌ Erreur: Le fichier {output_file} n'existe pas.")
+            return
+        load_workbook_cache(output_file)
+        write_all_results(output_file)
+        return
+
+    # === Setup Chrome Remote Debugging Attach (one browser per worker) ===
+    ports = [args.base_port + i for i in range(args.workers)]
+    if args.engine == 'local':
+        drivers = {}
+        ACTIVE_WORKERS = args.jobs
+        ROW_DURABILITY = False  # simulated rows: no journal, no per-row SQLite commit
+    else:
+        drivers = {port: attach_driver(port, args.headless) for port in ports}
+        ACTIVE_WORKERS = len(drivers)
+
+    # Configuration du niveau de test
+    ATR_MULTIPLIERS, RR_VALUES, VOL_MULTIPLIERS = set_test_level(args.level)
+
+    # Filtrer les symboles si spécifié
+    symbols = SYMBOL_LIST
+    if args.symbols:
+        # Valider que les symboles existent
+        invalid_symbols = [s for s in args.symbols if s not in SYMBOL_LIST]
+        if invalid_symbols:
+            print(f"❌ Symboles invalides: {invalid_symbols}")
+            print(f"📋 Symboles disponibles: {SYMBOL_LIST}")
+            exit(1)
+        symbols = args.symbols
+        print(f"🎯 Test limité à {len(symbols)} symbole(s): {', '.join(symbols)}")
+
+    # --- ETA totals (calculés après la configuration) ---
+    TOTAL_COMBOS_PER_SYMBOL = TEST_LEVELS[args.level].get('estimated_combos') or len(ATR_MULTIPLIERS) * len(RR_VALUES) * len(VOL_MULTIPLIERS)
+    TOTAL_SYMBOLS = len(symbols)
+    GLOBAL_TOTAL_COMBOS = TOTAL_COMBOS_PER_SYMBOL * TOTAL_SYMBOLS
+
+    # Affichage des totaux finaux
+    print(f"🌍 Total pour {TOTAL_SYMBOLS} symbole(s): {GLOBAL_TOTAL_COMBOS:,} tests")
+    if args.engine == 'local':
+        print(f"🧮 Moteur local: {ACTIVE_WORKERS} processus, barres de {args.store}/")
+    elif ACTIVE_WORKERS > 1:
+        print(f"🧵 {ACTIVE_WORKERS} navigateurs en parallèle (ports {ports[0]}-{ports[-1]})")
+    print("")
+
+    # === Load existing results to skip already-tested combinations ===
+    # --engine local: own workbook/journal/cache (*_local), never mixed with scraped rows
+    output_file = results_store.xlsx_path_for_level(args.level, args.engine)
+    if args.backend == 'sqlite':
+        db_file = results_store.db_path_for_level(args.level, args.engine)
+        results_db = results_store.open_store(db_file)
+        if results_store.count_rows(results_db) == 0 and os.path.exists(output_file):
+            n_imported = results_store.import_xlsx(results_db, output_file)
+            print(f"Imported {n_imported} rows from {output_file} into {db_file}.")
+        df_db = results_store.load_df(results_db)
+        existing_rows.update(
+            (_key(*k), row) for k, row in zip(
+                df_db[["Symbol", "ATR Multiplier", "RR", "Vol Multiplier"]].itertuples(index=False, name=None),
+                df_db.to_dict(orient='records'))
+        )
+        print(f"Loaded {len(existing_rows)} cached rows from {db_file}.")
+    elif os.path.exists(output_file):
+        try:
+            load_workbook_cache(output_file)
+            print(f"Loaded {len(existing_rows)} cached rows from workbook.")
+        except Exception as e:
+            print(f"Could not load existing results: {e}")
+            # Create the xlsx file if it doesn't exist
+            with pd.ExcelWriter(output_file, engine='openpyxl') as writer:
+                pd.DataFrame().to_excel(writer, index=False, sheet_name="All_Results")
+                pd.DataFrame().to_excel(writer, index=False, sheet_name="Best_Per_Symbol")
+    else:
+        # Initialize a new workbook with expected sheets
+        with pd.ExcelWriter(output_file, engine='openpyxl') as writer:
+            pd.DataFrame().to_excel(writer, index=False, sheet_name="All_Results")
+            pd.DataFrame().to_excel(writer, index=False, sheet_name="Best_Per_Symbol")
+
+    if args.level == 'ADAPTIVE':
+        # Every level lies on the FULL 0.1 lattice: reuse their results as cache
+        for other in ('COARSE', 'FINE', 'FULL'):
+            other_file = results_store.xlsx_path_for_level(other, args.engine)
+            if os.path.exists(other_file):
+                try:
+                    n_before = len(existing_rows)
+                    load_workbook_cache(other_file)
+                    print(f"Loaded {len(existing_rows) - n_before} cached rows from {other_file}.")
+                except Exception as e:
+                    print(f"Could not load {other_file}: {e}")
+
+    # Rows scraped after the last save of an interrupted run
+    journal_file = journal_path(output_file)
+    n_replayed = replay_journal(journal_file, output_file)
+    if n_replayed:
+        print(f"Replayed {n_replayed} rows from {journal_file}.")
+    if ROW_DURABILITY:
+        open_journal(journal_file)
+
+    # === ETA from measured timings, minus combos already cached ===
+    cached_counts = {}  # ADAPTIVE: the refined combos are not known in advance
+    if args.level != 'ADAPTIVE':
+        level_combos = list(snake_combos(ATR_MULTIPLIERS, RR_VALUES, VOL_MULTIPLIERS))
+        cached_counts = {s: sum(_key(s, *c) in existing_rows for c in level_combos) for s in symbols}
+    eta = time_estimator.estimate_run(TOTAL_COMBOS_PER_SYMBOL, symbols, cached_counts, ACTIVE_WORKERS)
+    if args.engine == 'browser':
+        print(f"⏱️ Temps estimé: {time_estimator.describe(eta)} pour {eta['remaining_tests']:,} tests restants")
+
+        # Navigate to the correct chart
+        for driver in drivers.values():
+            driver.get(TRADINGVIEW_URL)
+
+        print("Log into TradingView manually if needed. Starting tests...")
+
+    # Confirmation pour les tests longs
+    if args.level == 'FULL' and args.engine == 'browser':
+        estimated_hours = eta['p50_seconds'] / 3600
+        print(f"⚠️  ATTENTION: Vous avez sélectionné le niveau FULL")
+        print(f"⏱️  Temps estimé: ~{estimated_hours:.1f}h ({estimated_hours/24:.1f} jours), p90 ~{eta['p90_seconds']/3600:.1f}h")
+        confirm = input("🤔 Êtes-vous sûr de vouloir continuer? (tapez 'OUI' pour confirmer): ")
+        if confirm != 'OUI':
+            print("❌ Test annulé.")
+            for driver in drivers.values():
+                driver.quit()
+            exit()
+
+    print(f"\n🚀 DÉMARRAGE DU TEST NIVEAU {args.level}")
+    print(f"📊 {GLOBAL_TOTAL_COMBOS:,} tests au total")
+
+    if args.engine == 'local':
+        try:
+            _local_pool = local_sweep.start_pool(symbols, args.jobs, args.store)
+        except FileNotFoundError as e:
+            print(f"❌ {e}")
+            exit(1)
+
+    sweep_t0 = time.perf_counter()
+    start_writer()
+    try:
+        if args.level == 'ADAPTIVE':
+            run_adaptive(drivers, symbols, output_file, TEST_LEVELS['ADAPTIVE'])
+        else:
+            # === Work plan: cached rows per symbol + (symbol, combo) units still to test ===
+            plan = {}
+            units = []
+            for symbol_name in symbols:
+                # Snake order: consecutive combos change a single input
+                cached_rows, symbol_units = plan_symbol(symbol_name, snake_combos(ATR_MULTIPLIERS, RR_VALUES, VOL_MULTIPLIERS))
+                plan[symbol_name] = (cached_rows, len(symbol_units))
+                units.extend(symbol_units)
+            run_sweep(sweep_rows(drivers, units), plan, output_file, args.skip_complete, GLOBAL_TOTAL_COMBOS)
+    finally:
+        if _local_pool is not None:
+            local_sweep.stop_pool(_local_pool)
+            _local_pool = None
+        # Flush pending autosaves even on Ctrl+C / crash
+        with timed("writer_flush"):
+            stop_writer()
+        if results_db is None:
+            with timed("all_results"):
+                write_all_results(output_file)
+    # Every journaled row is now in the results store
+    close_journal(remove=True)
+
+    # Results are already persisted & deduplicated by autosave_and_update.
+    if results_db is not None:
+        with timed("export_xlsx"):
+            n_exported = results_store.export_xlsx(results_db, output_file)
+        print(f"[Export] {n_exported} rows exported from {db_file}.")
+        results_db.close()
+    print(f"Backtesting complete. Results saved to {output_file}")
+    sweep_sec = time.perf_counter() - sweep_t0
+    if n_tested_combos:
+        print(f"⚡ {n_tested_combos:,} combos testés en {sweep_sec:.1f}s ({n_tested_combos / sweep_sec:.2f} combos/s)")
+
+    dump_timing_summary(write_stages=args.engine == 'browser')
+    if args.trace:
+        export_chrome_trace(args.trace)
+
+    for driver in drivers.values():
+        driver.quit()
 
-dump_timing_summary()
 
-driver.quit()
\ No newline at end of file
+if __name__ == "__main__":
+    main()
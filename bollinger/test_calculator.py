@@ -7,6 +7,8 @@ Usage: python test_calculator.py [--level COARSE|FINE|FULL] [--symbols EURUSD GB
 
 import argparse
 
+import time_estimator
+
 TEST_LEVELS = {
     'COARSE': {
         'ATR_MULTIPLIERS': [1.0, 1.5, 2.0, 2.5, 3.0],
@@ -39,30 +41,40 @@ def format_time(seconds):
         days = seconds / 86400
         return f"{days:.1f} jours"
 
-def calculate_test_time(level, symbols=None, avg_time_per_test=4.0):
-    """Calcule le temps de test pour un niveau et des symboles donnés."""
+def calculate_test_time(level, symbols=None, avg_time_per_test=None, workers=1):
+    """Calcule le temps de test pour un niveau et des symboles donnés.
+    Sans avg_time_per_test : durées mesurées (time_estimator), combos déjà en cache déduits."""
     if symbols is None:
         symbols = ALL_SYMBOLS
     
     config = TEST_LEVELS[level]
     combos_per_symbol = len(config['ATR_MULTIPLIERS']) * len(config['RR_VALUES']) * len(config['VOL_MULTIPLIERS'])
     total_tests = combos_per_symbol * len(symbols)
-    total_time = total_tests * avg_time_per_test
+    if avg_time_per_test is None:
+        est = time_estimator.estimate_level(level, symbols, workers)
+        remaining_tests, p50, p90 = est['remaining_tests'], est['p50_seconds'], est['p90_seconds']
+    else:
+        remaining_tests = total_tests
+        p50 = p90 = total_tests * avg_time_per_test / workers
     
     return {
         'level': level,
         'symbols': len(symbols),
         'combos_per_symbol': combos_per_symbol,
         'total_tests': total_tests,
-        'total_time_seconds': total_time,
-        'total_time_formatted': format_time(total_time)
+        'remaining_tests': remaining_tests,
+        'total_time_seconds': p50,
+        'total_time_formatted': format_time(p50),
+        'p90_time_seconds': p90,
+        'p90_time_formatted': format_time(p90)
     }
 
-def suggest_optimization(level, symbols):
+def suggest_optimization(level, symbols, result=None):
     """Suggère des optimisations basées sur le niveau et les symboles."""
     suggestions = []
     
-    result = calculate_test_time(level, symbols)
+    if result is None:
+        result = calculate_test_time(level, symbols)
     
     if result['total_time_seconds'] > 86400:  # Plus d'un jour
         suggestions.append("⚠️  Test très long (>24h). Considérez:")
@@ -111,7 +123,8 @@ def main():
         
         for level in ['COARSE', 'FINE', 'FULL']:
             result = calculate_test_time(level, symbols)
-            print(f"\n{level:>6}: {result['total_tests']:>6,} tests → {result['total_time_formatted']:>8}")
+            print(f"\n{level:>6}: {result['remaining_tests']:>6,}/{result['total_tests']:,} tests → "
+                  f"{result['total_time_formatted']:>8} (p90 {result['p90_time_formatted']})")
     else:
         result = calculate_test_time(args.level, symbols)
         
@@ -119,10 +132,12 @@ def main():
         print(f"🎯 Symboles: {result['symbols']}")
         print(f"⚡ Combinaisons/symbole: {result['combos_per_symbol']:,}")
         print(f"🔢 Tests totaux: {result['total_tests']:,}")
-        print(f"⏱️ Temps estimé: {result['total_time_formatted']}")
+        if result['remaining_tests'] < result['total_tests']:
+            print(f"🔄 Restant à tester: {result['remaining_tests']:,} (le reste est déjà en cache)")
+        print(f"⏱️ Temps estimé: {result['total_time_formatted']} (p90 {result['p90_time_formatted']})")
         
         # Suggestions d'optimisation
-        suggestions = suggest_optimization(args.level, symbols)
+        suggestions = suggest_optimization(args.level, symbols, result)
         if suggestions:
             print(f"\n{suggestions[0]}")
             for suggestion in suggestions[1:]:
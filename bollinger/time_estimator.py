@@ -0,0 +1,195 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Estimation du temps de test à partir des durées mesurées (tv_timings.csv, tv_stage_timings.csv).
+Usage: python time_estimator.py --level FINE [--symbols EURUSD GBPUSD] [--workers 2] [--no-cache]
+"""
+
+import argparse
+import math
+import os
+
+import numpy as np
+import pandas as pd
+
+TIMING_CSV = "tv_timings.csv"             # une ligne par combo (combo_total), écrit par le runner
+STAGE_CSV = "tv_stage_timings.csv"        # label,seconds pour les étapes ci-dessous
+DEFAULT_COMBO_SEC = 4.0                   # sans mesure : ancienne hypothèse de 4 s par test
+AUTOSAVE_ROWS = 200                       # AUTOSAVE_ROWS_THRESHOLD du runner
+# Étapes hors combo et leur fréquence : une fois par symbole ou une fois par autosave
+STAGES = {
+    "symbol_change": "symbol",
+    "reset_params": "symbol",
+    "writer_flush": "symbol",
+    "autosave": "autosave",
+}
+Z_P90 = 1.2816  # quantile 90 % de la loi normale
+
+
+def load_timings(timing_csv: str = TIMING_CSV, stage_csv: str = STAGE_CSV) -> dict:
+    """label -> durées mesurées (secondes). combo_total vient de tv_timings.csv."""
+    samples = {}
+    if os.path.exists(timing_csv):
+        df = pd.read_csv(timing_csv)
+        if "combo_total" in df.columns:
+            samples["combo_total"] = pd.to_numeric(df["combo_total"], errors="coerce").to_numpy()
+    if os.path.exists(stage_csv):
+        df = pd.read_csv(stage_csv)
+        seconds = pd.to_numeric(df["seconds"], errors="coerce")
+        for label, values in seconds.groupby(df["label"]):
+            samples[label] = values.to_numpy()
+    out = {}
+    for label, values in samples.items():
+        values = values[np.isfinite(values) & (values > 0)]
+        if values.size:
+            out[label] = values
+    return out
+
+
+def fit_stage(values) -> dict:
+    """Moyenne, écart-type et quantiles d'une étape (None si aucune mesure)."""
+    if values is None or len(values) == 0:
+        return None
+    values = np.asarray(values, dtype=float)
+    return {
+        "n": int(values.size),
+        "mean": float(values.mean()),
+        "std": float(values.std(ddof=1)) if values.size > 1 else 0.0,
+        "p50": float(np.percentile(values, 50)),
+        "p90": float(np.percentile(values, 90)),
+    }
+
+
+def fit_timings(timings: dict = None) -> dict:
+    timings = load_timings() if timings is None else timings
+    return {label: fit_stage(timings.get(label)) for label in ["combo_total", *STAGES]}
+
+
+def cached_combo_counts(level: str, combos, symbols) -> dict:
+    """Nombre de combos du plan déjà présents dans le stockage du niveau, par symbole.
+    Lit la base SQLite si elle existe, sinon le cache .cache.npz à jour, sinon les feuilles *_Results."""
+    import results_store
+
+    wanted = {(round(float(a), 6), round(float(r), 6), round(float(v), 6)) for a, r, v in combos}
+    keys = _stored_keys(level)
+    if keys is None or keys.empty:
+        return {s: 0 for s in symbols}
+    keys = keys[keys["Symbol"].isin(symbols)].dropna()
+    params = keys[results_store.KEY_COLS[1:]].to_numpy(dtype=float).round(6)
+    hit = np.fromiter((tuple(p) in wanted for p in params), dtype=bool, count=len(params))
+    per_symbol = keys.assign(hit=hit).drop_duplicates(results_store.KEY_COLS).groupby("Symbol")["hit"].sum()
+    return {s: int(per_symbol.get(s, 0)) for s in symbols}
+
+
+def _stored_keys(level: str):
+    import results_store
+
+    db_path = results_store.db_path_for_level(level)
+    if os.path.exists(db_path):
+        conn = results_store.open_store(db_path)
+        try:
+            return results_store.load_df(conn)[results_store.KEY_COLS]
+        finally:
+            conn.close()
+    xlsx_path = results_store.xlsx_path_for_level(level)
+    if not os.path.exists(xlsx_path):
+        return None
+    sidecar = os.path.splitext(xlsx_path)[0] + ".cache.npz"
+    if os.path.exists(sidecar):
+        st = os.stat(xlsx_path)
+        with np.load(sidecar) as z:
+            if np.array_equal(z["__stamp__"], [st.st_mtime_ns, st.st_size]):
+                return pd.DataFrame({col: z[col] for col in results_store.KEY_COLS})
+    sheets = pd.read_excel(xlsx_path, sheet_name=None, engine="openpyxl")
+    frames = []
+    for name, df in sheets.items():
+        if name.endswith("_Results") and name != "All_Results" and not df.empty:
+            df = df.reindex(columns=results_store.KEY_COLS[1:]).apply(pd.to_numeric, errors="coerce")
+            frames.append(df.assign(Symbol=name[: -len("_Results")]))
+    return pd.concat(frames, ignore_index=True)[results_store.KEY_COLS] if frames else None
+
+
+def estimate_run(combos_per_symbol: int, symbols, cached: dict = None, workers: int = 1, fits: dict = None) -> dict:
+    """ETA p50/p90 d'un run : somme des combos restants et des étapes par symbole / par autosave.
+    La somme de k durées indépendantes est approchée par une loi normale ; l'incertitude sur la
+    moyenne (peu de mesures) est ajoutée, car elle ne s'amortit pas avec k."""
+    fits = fit_timings() if fits is None else fits
+    cached = cached or {}
+    remaining = {s: max(combos_per_symbol - cached.get(s, 0), 0) for s in symbols}
+    remaining_tests = sum(remaining.values())
+    counts = {
+        "combo_total": remaining_tests,
+        "symbol": sum(1 for n in remaining.values() if n > 0),
+        "autosave": sum(math.ceil(n / AUTOSAVE_ROWS) for n in remaining.values()),
+    }
+    mean = 0.0
+    var = 0.0
+    for label, fit in fits.items():
+        k = counts["combo_total"] if label == "combo_total" else counts[STAGES[label]]
+        if fit is None:
+            if label == "combo_total":
+                mean += k * DEFAULT_COMBO_SEC
+            continue
+        mean += k * fit["mean"]
+        var += k * fit["std"] ** 2 + (k * fit["std"]) ** 2 / fit["n"]
+    workers = max(int(workers), 1)
+    p50 = mean / workers
+    p90 = (mean + Z_P90 * math.sqrt(var)) / workers
+    combo_fit = fits.get("combo_total")
+    return {
+        "symbols": len(symbols),
+        "combos_per_symbol": combos_per_symbol,
+        "total_tests": combos_per_symbol * len(symbols),
+        "cached_tests": combos_per_symbol * len(symbols) - remaining_tests,
+        "remaining_tests": remaining_tests,
+        "workers": workers,
+        "seconds_per_test": combo_fit["mean"] if combo_fit else DEFAULT_COMBO_SEC,
+        "samples": combo_fit["n"] if combo_fit else 0,
+        "p50_seconds": p50,
+        "p90_seconds": p90,
+    }
+
+
+def estimate_level(level: str, symbols, workers: int = 1, use_cache: bool = True, fits: dict = None) -> dict:
+    """estimate_run pour un niveau de test_calculator (combos déjà en cache déduits)."""
+    from test_calculator import TEST_LEVELS
+
+    config = TEST_LEVELS[level]
+    combos = [(a, r, v) for a in config['ATR_MULTIPLIERS'] for r in config['RR_VALUES'] for v in config['VOL_MULTIPLIERS']]
+    cached = cached_combo_counts(level, combos, symbols) if use_cache else None
+    return estimate_run(len(combos), symbols, cached, workers, fits)
+
+
+def describe(est: dict) -> str:
+    from test_calculator import format_time
+
+    source = f"{est['samples']} combos mesurés" if est['samples'] else f"{DEFAULT_COMBO_SEC:.0f}s/test par défaut"
+    return f"~{format_time(est['p50_seconds'])} (p90 {format_time(est['p90_seconds'])}, {source})"
+
+
+def main():
+    from test_calculator import ALL_SYMBOLS, TEST_LEVELS
+
+    parser = argparse.ArgumentParser(description="Estimation du temps de test à partir des timings mesurés")
+    parser.add_argument('--level', choices=list(TEST_LEVELS), default='FINE')
+    parser.add_argument('--symbols', nargs='*', help='Symboles spécifiques (ex: EURUSD GBPUSD)')
+    parser.add_argument('--workers', type=int, default=1, help='Nombre de navigateurs en parallèle')
+    parser.add_argument('--no-cache', action='store_true', help='Ne pas déduire les combos déjà testés')
+    args = parser.parse_args()
+
+    symbols = args.symbols if args.symbols else ALL_SYMBOLS
+    fits = fit_timings()
+    print("⏱️ DURÉES MESURÉES")
+    for label, fit in fits.items():
+        if fit is None:
+            print(f"   {label:14s} aucune mesure")
+        else:
+            print(f"   {label:14s} n={fit['n']:5d}  moy={fit['mean']:6.2f}s  p50={fit['p50']:6.2f}s  p90={fit['p90']:6.2f}s")
+    est = estimate_level(args.level, symbols, args.workers, not args.no_cache, fits)
+    print(f"\n📈 NIVEAU {args.level}: {est['total_tests']:,} tests, {est['cached_tests']:,} déjà en cache, "
+          f"{est['remaining_tests']:,} à faire")
+    print(f"⏱️ Temps restant estimé: {describe(est)}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,122 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Rapport de profilage d'un run à partir de la trace Chrome du runner (--trace).
+Usage: python trace_report.py tv_trace.json [--by symbol] [--top 20]
+"""
+
+import argparse
+import json
+
+import numpy as np
+import pandas as pd
+
+UNTRACKED = "(non chronométré)"
+
+
+def load_spans(path: str) -> pd.DataFrame:
+    """Une ligne par span : label, thread, start/end (s), dur (s) et le contexte (symbol, atr, rr, vol)."""
+    with open(path) as f:
+        events = json.load(f)["traceEvents"]
+    threads = {e["tid"]: e["args"]["name"] for e in events if e.get("ph") == "M" and e.get("name") == "thread_name"}
+    spans = [e for e in events if e.get("ph") == "X"]
+    df = pd.DataFrame({
+        "label": [e["name"] for e in spans],
+        "thread": [threads.get(e["tid"], str(e["tid"])) for e in spans],
+        "start": np.array([e["ts"] for e in spans], dtype=float) / 1e6,
+        "dur": np.array([e["dur"] for e in spans], dtype=float) / 1e6,
+    })
+    df["end"] = df["start"] + df["dur"]
+    ctx = pd.DataFrame([e.get("args") or {} for e in spans], index=df.index)
+    return pd.concat([df, ctx], axis=1)
+
+
+def add_self_time(df: pd.DataFrame) -> pd.DataFrame:
+    """self = durée du span moins celle de ses enfants directs (spans imbriqués du même thread)."""
+    df = df.sort_values(["thread", "start", "end"], ascending=[True, True, False]).reset_index(drop=True)
+    child = np.zeros(len(df))
+    depth = np.zeros(len(df), dtype=int)
+    start, end, dur = df["start"].to_numpy(), df["end"].to_numpy(), df["dur"].to_numpy()
+    for _, idx in df.groupby("thread", sort=False).indices.items():
+        stack = []
+        for i in idx:
+            while stack and end[stack[-1]] <= start[i] + 1e-9:
+                stack.pop()
+            if stack:
+                child[stack[-1]] += dur[i]
+            depth[i] = len(stack)
+            stack.append(i)
+    df["self"] = np.maximum(dur - child, 0.0)
+    df["depth"] = depth
+    return df
+
+
+def thread_breakdown(df: pd.DataFrame) -> pd.DataFrame:
+    """Par thread : durée couverte par la trace, temps dans des spans et reste non chronométré."""
+    g = df.groupby("thread")
+    out = pd.DataFrame({
+        "wall": g["end"].max() - g["start"].min(),
+        "tracked": df[df["depth"] == 0].groupby("thread")["dur"].sum(),
+    }).fillna(0.0)
+    out["untracked"] = (out["wall"] - out["tracked"]).clip(lower=0.0)
+    return out
+
+
+def label_breakdown(df: pd.DataFrame, walls: pd.DataFrame) -> pd.DataFrame:
+    """Par étape : temps propre (self) total, part du temps total des threads, moyenne et p90 par appel."""
+    g = df.groupby("label")
+    out = pd.DataFrame({
+        "n": g.size(),
+        "total": g["dur"].sum(),
+        "self": g["self"].sum(),
+        "avg": g["dur"].mean(),
+        "p90": g["dur"].quantile(0.9),
+    })
+    untracked = walls["untracked"].sum()
+    if untracked > 0:
+        out.loc[UNTRACKED] = [np.nan, untracked, untracked, np.nan, np.nan]
+    out["pct"] = out["self"] / walls["wall"].sum() * 100.0
+    return out.sort_values("self", ascending=False)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Rapport de profilage à partir d'une trace du runner (--trace)")
+    parser.add_argument('trace', nargs='?', default='tv_trace.json', help='Trace Chrome (défaut: tv_trace.json)')
+    parser.add_argument('--by', help='Ventiler le temps propre par clé de contexte (symbol, atr, rr, vol)')
+    parser.add_argument('--top', type=int, default=20, help='Nombre d\'étapes affichées (défaut: 20)')
+    args = parser.parse_args()
+
+    df = add_self_time(load_spans(args.trace))
+    if df.empty:
+        print(f"❌ Aucun span dans {args.trace}")
+        return
+    walls = thread_breakdown(df)
+    print(f"🧵 THREADS ({args.trace})")
+    for thread, row in walls.iterrows():
+        print(f"   {thread:18s} {row['wall']:9.1f}s  dans des spans {row['tracked']:9.1f}s  "
+              f"non chronométré {row['untracked']:8.1f}s")
+
+    labels = label_breakdown(df, walls)
+    print(f"\n⏱️ OÙ PASSE LE TEMPS (temps propre, hors sous-étapes)")
+    print(f"   {'étape':28s} {'n':>7s} {'propre':>10s} {'%':>6s} {'moy':>8s} {'p90':>8s}")
+    for label, row in labels.head(args.top).iterrows():
+        n = "" if pd.isna(row['n']) else f"{int(row['n']):,}"
+        avg = "" if pd.isna(row['avg']) else f"{row['avg']:.3f}"
+        p90 = "" if pd.isna(row['p90']) else f"{row['p90']:.3f}"
+        print(f"   {label:28s} {n:>7s} {row['self']:9.1f}s {row['pct']:5.1f}% {avg:>8s} {p90:>8s}")
+
+    if args.by:
+        if args.by not in df.columns:
+            print(f"\n❌ Clé de contexte inconnue: {args.by}")
+            return
+        top = labels.index[:6].drop(UNTRACKED, errors="ignore")
+        pivot = df[df["label"].isin(top)].pivot_table(index=args.by, columns="label", values="self",
+                                                       aggfunc="sum", fill_value=0.0)
+        pivot = pivot[[c for c in top if c in pivot.columns]]
+        pivot["total"] = pivot.sum(axis=1)
+        print(f"\n📊 TEMPS PROPRE PAR {args.by.upper()} (s)")
+        print(pivot.sort_values("total", ascending=False).head(args.top).round(1).to_string())
+
+
+if __name__ == "__main__":
+    main()
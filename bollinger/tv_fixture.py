@@ -0,0 +1,236 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Page locale imitant le graphique TradingView (mêmes libellés et même structure DOM que les XPaths
+du runner) pour mesurer test-selenium-single-thread.py hors ligne.
+Usage:
+    python tv_fixture.py serve [--port 8765] [--latency-ms 300] [--load-ms 500]
+    python tv_fixture.py bench --level COARSE --symbols EURUSD GBPUSD [--workers 2] [--latency-ms 300] [-- --wait fixed]
+"""
+
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+DEFAULT_PORT = 8765
+SNACKBAR_CLASS = "snackbarLayer-_MKqWk5g"  # même classe que le runner (--wait fixed)
+RUNNER = os.path.join(os.path.dirname(os.path.abspath(__file__)), "test-selenium-single-thread.py")
+
+# Structure reprise des XPaths du runner :
+#   //div[contains(text(),'ATR Stop Multiplier')]/parent::div/following-sibling::div//input
+#   //div[contains(text(),'Profit net')]/parent::div/following-sibling::div/div[3]
+PAGE = """<!doctype html>
+<html><head><meta charset="utf-8"><title>TradingView fixture</title>
+<style>
+body { font-family: sans-serif; margin: 0; }
+.row { display: flex; gap: 12px; padding: 4px 12px; }
+.title { width: 260px; }
+#dialog { position: fixed; top: 40px; right: 40px; background: #fff; border: 1px solid #999; padding: 8px; }
+.snackbarLayer-_MKqWk5g { position: fixed; bottom: 10px; left: 10px; background: #333; color: #fff; padding: 6px; }
+</style></head>
+<body>
+<div id="chart"><div class="row"><div class="title"><div>Symbol</div></div><div id="symbol"></div></div></div>
+<div id="report"></div>
+<script>
+const CONFIG = __CONFIG__;
+let symbol = (new URLSearchParams(location.search).get("symbol") || "PEPPERSTONE:EURUSD").split(":").pop();
+const state = {atr: 1.2, rr: 2.7, vol: 0.8};
+const INPUTS = [["atr", "ATR Stop Multiplier"], ["rr", "Base Risk/Reward Ratio"], ["vol", "Dynamic: Min Volatility Multiplier"]];
+let pending = null;
+
+// Métriques déterministes par (symbole, ATR, RR, Vol)
+function seed(text) {
+    let h = 2166136261;
+    for (let i = 0; i < text.length; i++) { h ^= text.charCodeAt(i); h = Math.imul(h, 16777619); }
+    return h >>> 0;
+}
+function rng(a) {
+    return () => {
+        a = (a + 0x6D2B79F5) >>> 0;
+        let t = Math.imul(a ^ (a >>> 15), 1 | a);
+        t = (t + Math.imul(t ^ (t >>> 7), 61 | t)) ^ t;
+        return ((t ^ (t >>> 14)) >>> 0) / 4294967296;
+    };
+}
+const num = (v, d) => Math.abs(v).toFixed(d).replace(".", ",").replace(/\\B(?=(\\d{3})+(?!\\d))/g, "\\u202f");
+const signed = (v, d) => (v < 0 ? "\\u2212" : "") + num(v, d);
+function metrics() {
+    const r = rng(seed([symbol, state.atr.toFixed(2), state.rr.toFixed(2), state.vol.toFixed(2)].join("|")));
+    const pf = 0.6 + r() * 1.8;
+    return {
+        net: (pf - 1) * 1000 * (0.5 + r()),
+        winRate: 20 + r() * 50,
+        dd: 1 + r() * 15,
+        trades: 20 + Math.floor(r() * 480),
+        pf: pf,
+    };
+}
+function row(label, values) {
+    return `<div class="row"><div class="title"><div>${label}</div></div><div class="values">${values}</div></div>`;
+}
+function renderReport() {
+    const m = metrics();
+    document.getElementById("report").innerHTML =
+        row("Profit net", `<div>${signed(m.net, 2)}</div><div>${signed(m.net / 100, 2)}%</div><div>${signed(m.net, 2)} USD</div>`) +
+        row("Total trades", `${m.trades}`) +
+        row("Profitable trades", `<div>${num(m.winRate, 2)}%</div><div>${Math.round(m.trades * m.winRate / 100)}/${m.trades}</div>`) +
+        row("Profit factor", `${num(m.pf, 3)}`) +
+        row("Drawdown max", `<div>${num(m.dd * 10, 2)} USD</div><div></div><div>${num(m.dd, 2)}%</div>`);
+}
+let computing = 0;  // rendus en attente (recalcul des inputs, chargement de symbole)
+function delay() { return CONFIG.latencyMs + Math.random() * CONFIG.jitterMs; }
+function showSnackbar() {
+    computing++;
+    if (!document.querySelector(".__SNACKBAR__")) {
+        const bar = document.createElement("div");
+        bar.className = "__SNACKBAR__";
+        bar.textContent = "Recalcul de la stratégie…";
+        document.body.appendChild(bar);
+    }
+}
+function renderDone() {
+    renderReport();
+    const bar = document.querySelector(".__SNACKBAR__");
+    if (--computing === 0 && bar) bar.remove();
+}
+function recompute() {
+    // Comme TradingView : snackbar pendant le calcul, puis rapport réécrit (même si identique).
+    // Une nouvelle modification remplace le recalcul des inputs encore en attente.
+    if (pending !== null) { clearTimeout(pending); computing--; }
+    showSnackbar();
+    pending = setTimeout(() => { pending = null; renderDone(); }, delay());
+}
+function loadSymbolReport() {
+    // Propre minuteur : une modification d'input faite entre-temps ne l'annule pas
+    showSnackbar();
+    setTimeout(renderDone, delay());
+}
+function openDialog() {
+    if (document.getElementById("dialog")) return;
+    const dialog = document.createElement("div");
+    dialog.id = "dialog";
+    dialog.innerHTML = INPUTS.map(([key, label]) =>
+        row(label, `<div><input type="text" inputmode="decimal" data-key="${key}" value="${state[key]}"></div>`)
+    ).join("") + `<button data-name="submit-button">OK</button>`;
+    document.body.appendChild(dialog);
+    for (const input of dialog.querySelectorAll("input")) {
+        input.addEventListener("change", () => {
+            const v = parseFloat(input.value.replace(",", "."));
+            if (!isNaN(v)) { state[input.dataset.key] = v; recompute(); }
+        });
+    }
+    dialog.querySelector("button").addEventListener("click", () => dialog.remove());
+}
+// Sous-ensemble de l'API du graphique utilisé par --symbol-switch inpage
+window.TradingViewApi = {
+    activeChart: () => ({
+        symbol: () => "PEPPERSTONE:" + symbol,
+        setSymbol: (ticker, callback) => {
+            symbol = ticker.split(":").pop();
+            document.getElementById("symbol").textContent = symbol;
+            setTimeout(() => { if (callback) callback(); loadSymbolReport(); }, CONFIG.loadMs);
+        },
+    }),
+};
+document.addEventListener("keydown", e => {
+    const mod = e.metaKey || e.ctrlKey;  // Keys.COMMAND = Meta (macOS) ; Ctrl accepté aussi
+    if (mod && e.key.toLowerCase() === "p") { e.preventDefault(); openDialog(); }
+    if (mod && e.key.toLowerCase() === "a" && e.target.tagName === "INPUT") { e.preventDefault(); e.target.select(); }
+}, true);
+document.getElementById("symbol").textContent = symbol;
+setTimeout(renderReport, CONFIG.loadMs);
+</script>
+</body></html>
+""".replace("__SNACKBAR__", SNACKBAR_CLASS)
+
+
+def make_handler(config: dict):
+    page = PAGE.replace("__CONFIG__", json.dumps(config)).encode("utf-8")
+
+    class FixtureHandler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            if not self.path.startswith("/chart"):
+                self.send_error(404)
+                return
+            self.send_response(200)
+            self.send_header("Content-Type", "text/html; charset=utf-8")
+            self.send_header("Content-Length", str(len(page)))
+            self.end_headers()
+            self.wfile.write(page)
+
+        def log_message(self, format, *args):
+            pass  # une requête par changement de symbole : pas de log
+
+    return FixtureHandler
+
+
+def start_server(port: int = DEFAULT_PORT, latency_ms: int = 300, jitter_ms: int = 0, load_ms: int = 500):
+    """Démarre la page en arrière-plan. Renvoie (server, url à passer au runner via --url)."""
+    config = {"latencyMs": latency_ms, "jitterMs": jitter_ms, "loadMs": load_ms}
+    server = ThreadingHTTPServer(("127.0.0.1", port), make_handler(config))
+    threading.Thread(target=server.serve_forever, name="tv-fixture", daemon=True).start()
+    return server, f"http://127.0.0.1:{server.server_address[1]}/chart/"
+
+
+def run_bench(url: str, level: str, symbols, workers: int, runner_args) -> dict:
+    """Lance le runner en Chrome headless contre la page, dans un dossier temporaire (aucun cache)."""
+    cmd = [sys.executable, RUNNER, "--url", url, "--headless", "--level", level,
+           "--workers", str(workers), "--symbols", *symbols, *runner_args]
+    with tempfile.TemporaryDirectory(prefix="tv-bench-") as tmp:
+        t0 = time.perf_counter()
+        proc = subprocess.run(cmd, cwd=tmp)
+        wall = time.perf_counter() - t0
+    return {"returncode": proc.returncode, "wall": wall}
+
+
+def main():
+    from test_calculator import TEST_LEVELS
+
+    parser = argparse.ArgumentParser(description="Page TradingView locale pour mesurer le runner hors ligne")
+    sub = parser.add_subparsers(dest='command', required=True)
+    for name, help_text in [('serve', 'Servir la page (Ctrl+C pour arrêter)'),
+                            ('bench', 'Mesurer le runner en Chrome headless contre la page')]:
+        p = sub.add_parser(name, help=help_text)
+        p.add_argument('--port', type=int, default=DEFAULT_PORT if name == 'serve' else 0,
+                       help='Port HTTP (bench: port libre par défaut)')
+        p.add_argument('--latency-ms', type=int, default=300, help='Durée du recalcul après une modification')
+        p.add_argument('--jitter-ms', type=int, default=0, help='Aléa ajouté au recalcul (0..jitter)')
+        p.add_argument('--load-ms', type=int, default=500, help='Délai avant affichage du rapport au chargement')
+        if name == 'bench':
+            p.add_argument('--level', choices=['COARSE', 'FINE'], default='COARSE')
+            p.add_argument('--symbols', nargs='+', default=['EURUSD'])
+            p.add_argument('--workers', type=int, default=1)
+    args, runner_args = parser.parse_known_args()
+    runner_args = [a for a in runner_args if a != '--']
+
+    server, url = start_server(args.port, args.latency_ms, args.jitter_ms, args.load_ms)
+    if args.command == 'serve':
+        print(f"🧪 Page de test sur {url} (recalcul {args.latency_ms} ms)")
+        print(f"   python3 test-selenium-single-thread.py --url {url} --headless --level COARSE --symbols EURUSD")
+        try:
+            threading.Event().wait()
+        except KeyboardInterrupt:
+            pass
+        server.shutdown()
+        return
+
+    config = TEST_LEVELS[args.level]
+    n_combos = len(config['ATR_MULTIPLIERS']) * len(config['RR_VALUES']) * len(config['VOL_MULTIPLIERS']) * len(args.symbols)
+    print(f"🧪 Bench {args.level}: {n_combos:,} combos, {args.workers} navigateur(s), recalcul {args.latency_ms} ms")
+    res = run_bench(url, args.level, args.symbols, args.workers, runner_args)
+    server.shutdown()
+    if res["returncode"] != 0:
+        print(f"❌ Le runner a échoué (code {res['returncode']})")
+        sys.exit(res["returncode"])
+    print(f"\n⚡ BENCH: {n_combos:,} combos en {res['wall']:.1f}s → {n_combos / res['wall']:.2f} combos/s "
+          f"(démarrage de Chrome compris)")
+
+
+if __name__ == "__main__":
+    main()